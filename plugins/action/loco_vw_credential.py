@@ -0,0 +1,106 @@
+# plugins/action/loco_vw_credential.py
+# Store a credential in Vaultwarden from the controller, without a process
+# per credential.
+#
+# Task arguments (same meaning as the credential_* variables of the
+# credentials role and the fields of a vw-credentials.py store request):
+#
+#   url, admin_token          Vaultwarden target (required)
+#   name                      Credential name (required)
+#   username, password, uri, notes
+#   folder                    Folder to file the credential in (created if missing)
+#   ignore_timestamps         Timestamps in notes are no change (default: true)
+#   socket                    Daemon socket; used when a daemon for this target
+#                             answers (default: none)
+#   metrics, metrics_textfile Run record outputs as in --metrics/--metrics-textfile
+#   connect_timeout, read_timeout, retries
+#                             HTTP deadlines and retries (script defaults)
+#   wait_ready                Poll /alive up to this many seconds first (default: 0)
+#   script                    Path to vw-credentials.py ($VW_CREDENTIALS_SCRIPT)
+#
+# Returns changed, action (created/updated/unchanged, or failed with msg) and
+# id. In check mode nothing is written and action is what a real run would do;
+# a rejected service-user login fails the task instead of re-registering it.
+#
+# vw-credentials.py is imported once per process; its shared_client() keeps
+# one logged-in client per (url, admin token). Ansible forks a worker per
+# task, so that client lives for one task only. One login per playbook run
+# comes from the daemon (daemon_start.yml), which runs on the controller as
+# the same user; without it, each task resumes the login from the script's
+# encrypted session and vault cache.
+
+from __future__ import annotations
+
+import os
+import sys
+
+from ansible.errors import AnsibleActionFail
+from ansible.module_utils.common.text.converters import to_text
+from ansible.module_utils.parsing.convert_bool import boolean
+from ansible.plugins.action import ActionBase
+
+MODULE_UTILS = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                            "..", "module_utils"))
+if MODULE_UTILS not in sys.path:
+    sys.path.append(MODULE_UTILS)
+from loco_vw import load_vw_credentials  # noqa: E402  (plugins/module_utils/loco_vw.py)
+
+FIELDS = ("username", "password", "uri", "notes")
+
+
+class ActionModule(ActionBase):
+
+    TRANSFERS_FILES = False
+    _VALID_ARGS = frozenset(("url", "admin_token", "name", "folder", "ignore_timestamps",
+                             "socket", "metrics", "metrics_textfile", "connect_timeout",
+                             "read_timeout", "retries", "wait_ready", "script") + FIELDS)
+
+    def run(self, tmp=None, task_vars=None):
+        result = super().run(tmp, task_vars)
+        args = self._task.args
+        for required in ("url", "admin_token", "name"):
+            if not args.get(required):
+                raise AnsibleActionFail(f"{required} is required")
+
+        request = {
+            "action": "store",
+            "url": args["url"],
+            "admin_token": args["admin_token"],
+            "name": to_text(args["name"]),
+            "folder": args.get("folder") or None,
+            "ignore_timestamps": boolean(args.get("ignore_timestamps", True), strict=False),
+            "check": bool(self._task.check_mode),
+        }
+        for field in FIELDS:
+            request[field] = to_text(args.get(field) or "")
+
+        vw = load_vw_credentials(args.get("script"))
+        vw.METRICS.destination = args.get("metrics") or None
+        vw.METRICS.textfile = args.get("metrics_textfile") or None
+        vw.configure_http(
+            float(args["connect_timeout"]) if args.get("connect_timeout") else None,
+            float(args["read_timeout"]) if args.get("read_timeout") else None,
+            int(args["retries"]) if args.get("retries") not in (None, "") else None,
+        )
+        vw.METRICS.reset("store")
+        status = "error"
+        try:
+            if float(args.get("wait_ready") or 0) > 0:
+                vw.wait_ready(request["url"], float(args["wait_ready"]))
+            served, stored = vw.forward(args.get("socket"), request)
+            if not served:
+                # Check mode only logs in: no service-user recovery either
+                client = vw.shared_client(request["url"], request["admin_token"],
+                                          recover=not request["check"])
+                stored = vw.execute(client, request)
+            status = "ok"
+        except Exception as e:
+            # Same text as the script's "ERROR:" line
+            result.update(failed=True, action="failed", msg=str(e))
+            return result
+        finally:
+            vw.METRICS.emit(status)
+
+        result.update(stored, name=request["name"],
+                      changed=stored["action"] in ("created", "updated"))
+        return result
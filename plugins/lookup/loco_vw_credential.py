@@ -0,0 +1,120 @@
+# plugins/lookup/loco_vw_credential.py
+# Read credentials stored by scripts/vw-credentials.py back from Vaultwarden.
+
+from __future__ import annotations
+
+DOCUMENTATION = r"""
+name: loco_vw_credential
+author: LocoCloud
+short_description: Read credentials from the LocoCloud Vaultwarden
+description:
+  - Returns the decrypted login fields (username, password, uri, notes, id,
+    name) of the Vaultwarden ciphers with the given names, as stored by
+    C(scripts/vw-credentials.py) and the credentials role.
+  - Runs on the controller and imports vw-credentials.py instead of starting
+    a process per lookup. All names of one call are resolved against a single
+    vault revision check.
+  - The logged-in client and the decrypted entries are kept in memory for the
+    rest of the controller process. Ansible runs every task in a forked
+    worker, so that is one task with all its loop items; across tasks the
+    encrypted session and vault cache of vw-credentials.py
+    (C(~/.cache/lococloud), C($VW_CREDENTIALS_CACHE_DIR)) avoids a new login.
+  - Only logs in. If the service user's login is rejected (e.g. the admin
+    token changed), the lookup fails; it never re-registers the user, which
+    would delete the stored credentials.
+options:
+  _terms:
+    description: Credential names, e.g. C("{{ kunde_name }} — PocketID Admin").
+    required: true
+  url:
+    description: Vaultwarden URL.
+    type: str
+    vars:
+      - name: vw_api_url
+  admin_token:
+    description: Vaultwarden admin token (the service user is derived from it).
+    type: str
+    vars:
+      - name: vw_admin_token
+  field:
+    description: Return only this field (e.g. C(password)) instead of the record.
+    type: str
+    choices: [username, password, uri, notes, id]
+  default:
+    description:
+      - Returned for names that do not exist. Without it a missing name fails
+        the lookup.
+    type: raw
+  script:
+    description: Path to vw-credentials.py.
+    type: path
+    env:
+      - name: VW_CREDENTIALS_SCRIPT
+"""
+
+EXAMPLES = r"""
+- name: Reuse the stored PocketID admin password
+  ansible.builtin.set_fact:
+    pocketid_admin_password: >-
+      {{ lookup('loco_vw_credential', kunde_name ~ ' — PocketID Admin',
+                field='password', default='') }}
+  no_log: true
+
+- name: Several credentials in one call
+  ansible.builtin.set_fact:
+    _admins: >-
+      {{ query('loco_vw_credential', kunde_name ~ ' — Nextcloud Admin',
+               kunde_name ~ ' — Paperless Admin') }}
+  no_log: true
+"""
+
+RETURN = r"""
+_raw:
+  description:
+    - One record per name (username, password, uri, notes, id, name), or the
+      requested field, or O(default) for missing names.
+  type: list
+  elements: raw
+"""
+
+import os
+import sys
+
+from ansible.errors import AnsibleLookupError
+from ansible.plugins.lookup import LookupBase
+
+MODULE_UTILS = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                            "..", "module_utils"))
+if MODULE_UTILS not in sys.path:
+    sys.path.append(MODULE_UTILS)
+from loco_vw import load_vw_credentials  # noqa: E402  (plugins/module_utils/loco_vw.py)
+
+
+class LookupModule(LookupBase):
+
+    def run(self, terms, variables=None, **kwargs):
+        self.set_options(var_options=variables, direct=kwargs)
+        url = self.get_option("url")
+        admin_token = self.get_option("admin_token")
+        if not url or not admin_token:
+            raise AnsibleLookupError("loco_vw_credential needs url and admin_token "
+                                     "(or vw_api_url and vw_admin_token)")
+        field = self.get_option("field")
+        default = self.get_option("default")
+
+        try:
+            vw = load_vw_credentials(self.get_option("script"))
+            client = vw.shared_client(url, admin_token, recover=False)
+            records = client.get_credentials([str(term) for term in terms])
+        except Exception as e:
+            raise AnsibleLookupError(f"Vaultwarden lookup failed: {e}") from e
+
+        results = []
+        for record in records:
+            if not record.pop("found"):
+                if default is None:
+                    raise AnsibleLookupError(f"no Vaultwarden credential named '{record['name']}'")
+                results.append(default)
+            else:
+                results.append(record[field] if field else record)
+        return results
@@ -0,0 +1,37 @@
+# plugins/module_utils/loco_vw.py
+# Shared by the loco_vw_credential action and lookup plugins: both import
+# scripts/vw-credentials.py instead of running it, and must end up with the
+# same module object (one shared_client() cache per controller process).
+#
+# Plain helper, not an Ansible module_utils for modules: controller-side
+# plugins outside a collection cannot import ansible.module_utils.<custom>,
+# so the plugins add this directory to sys.path themselves.
+
+from __future__ import annotations
+
+import importlib.util
+import os
+import sys
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                      "..", "..", "scripts", "vw-credentials.py")
+MODULE_NAME = "loco_vw_credentials"
+
+
+def load_vw_credentials(path=None):
+    """Import vw-credentials.py once per process, shared by all LocoCloud plugins.
+
+    path defaults to $VW_CREDENTIALS_SCRIPT, then the repository's copy.
+    """
+    module = sys.modules.get(MODULE_NAME)
+    if module is None:
+        path = path or os.environ.get("VW_CREDENTIALS_SCRIPT") or SCRIPT
+        spec = importlib.util.spec_from_file_location(MODULE_NAME, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[MODULE_NAME] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            del sys.modules[MODULE_NAME]
+            raise
+    return module
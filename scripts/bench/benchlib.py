@@ -0,0 +1,39 @@
+"""
+benchlib.py — Helpers shared by the benchmarks in scripts/bench/.
+
+Not a tool of its own; the bench scripts import it from their directory.
+"""
+
+import importlib.util
+import os
+import statistics
+
+DEFAULT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              "..", "vw-credentials.py")
+
+
+def load_script(path=DEFAULT_SCRIPT, module_name="vw_credentials_bench"):
+    """Import vw-credentials.py (not a valid module name) from a path."""
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list."""
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(timings, scale=1.0, digits=4):
+    """Mean/p50/p95/p99/max of a list of durations, multiplied by scale."""
+    timings = sorted(timings)
+    return {
+        "runs": len(timings),
+        "mean": round(statistics.mean(timings) * scale, digits),
+        "p50": round(percentile(timings, 50) * scale, digits),
+        "p95": round(percentile(timings, 95) * scale, digits),
+        "p99": round(percentile(timings, 99) * scale, digits),
+        "max": round(timings[-1] * scale, digits),
+    }
@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+crypto_bench.py — Known-answer checks and micro-benchmarks for the crypto
+primitives of vw-credentials.py, with a stored baseline.
+
+Every primitive is first checked against fixed vectors (FIPS 197,
+SP 800-38A, RFC 7914, RFC 5869) for every backend; a wrong answer fails
+the run before anything is timed. Then each primitive runs at the sizes
+the script actually sees — 16-byte names up to multi-KB notes — in a few
+interleaved rounds; the best round's median time per call is reported as
+ops/s, together with percentiles over all calls. Regressions are judged
+on speed relative to a reference loop timed alongside (see run_cases), so
+a busy host does not fail the run.
+
+    python3 scripts/bench/crypto_bench.py                    # check + compare
+    python3 scripts/bench/crypto_bench.py --update-baseline  # record this host
+    python3 scripts/bench/crypto_bench.py --only aes --backend python
+    python3 scripts/bench/crypto_bench.py --script /tmp/vw-old.py --no-baseline
+
+Exit status: 0 ok, 1 on a known-answer failure or when a case is more
+than --tolerance slower (relative to the reference loop) than the
+baseline. The baseline is
+host-specific; record it on the machine that runs the comparison.
+"""
+
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import time
+
+from benchlib import DEFAULT_SCRIPT, load_script, percentile, summarize
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "baseline.json")
+
+# Payload sizes: a credential name, a URI/password, a note, a long note.
+SIZES = (16, 256, 4096, 16384)
+
+
+def h(hexstr):
+    return bytes.fromhex(hexstr.replace(" ", ""))
+
+
+def log(message):
+    print(message, file=sys.stderr)
+
+
+# --- Known-Answer Vectors ---
+
+# FIPS 197, Appendix C.3 (AES-256, one block). CBC with a zero IV
+# encrypts the first block exactly like ECB.
+FIPS197_KEY = h("000102030405060708090a0b0c0d0e0f101112131415161718191a1b1c1d1e1f")
+FIPS197_PT = h("00112233445566778899aabbccddeeff")
+FIPS197_CT = h("8ea2b7ca516745bfeafc49904b496089")
+
+# NIST SP 800-38A, F.2.5 CBC-AES256.Encrypt (four blocks, no padding;
+# our CBC adds one PKCS#7 block, so only the prefix is compared).
+SP800_KEY = h("603deb1015ca71be2b73aef0857d7781 1f352c073b6108d72d9810a30914dff4")
+SP800_IV = h("000102030405060708090a0b0c0d0e0f")
+SP800_PT = h("6bc1bee22e409f96e93d7e117393172a ae2d8a571e03ac9c9eb76fac45af8e51"
+             "30c81c46a35ce411e5fbc1191a0a52ef f69f2445df4f9b17ad2b417be66c3710")
+SP800_CT = h("f58c4c04d6e5f1ba779eabfb5f7bfbd6 9cfc4e967edb808d679f777bc6702c7d"
+             "39f23369a9d9bacfa530e26304231461 b2eb05e2c39be9fcda6c19078c6a9d1b")
+
+# FIPS 197, Appendix A.3: expansion of SP800_KEY, words w[8] and w[59].
+KEY_EXPANSION_WORDS = {8: 0x9ba35411, 59: 0x706c631e}
+
+# RFC 7914, section 11 (PBKDF2-HMAC-SHA-256); first 32 bytes of dkLen 64,
+# which are the first PBKDF2 block and thus the dkLen 32 result.
+PBKDF2_VECTORS = [
+    (b"passwd", b"salt", 1,
+     h("55ac046e56e3089fec1691c22544b605f94185216dde0465e68b9d57c20dacbc")),
+    (b"Password", b"NaCl", 80000,
+     h("4ddcd8f60b98be21830cee5ef22701f9641a4418d04c0414aeff08876b34ab56")),
+]
+
+# RFC 5869, test cases 1 and 3 (HKDF-Expand step only).
+HKDF_VECTORS = [
+    (h("077709362c2e32df0ddc3f0dc47bba6390b6c73bb50f9c3122ec844ad7c2b3e5"),
+     h("f0f1f2f3f4f5f6f7f8f9"), 42,
+     h("3cb25f25faacd57a90434f64d0362f2a2d2d0a90cf1a5a4c5db02d56ecc4c5bf"
+       "34007208d5b887185865")),
+    (h("19ef24a32c717b167f33a91d6f648bdf96596776afdb6377ac434c1c293ccb04"),
+     b"", 42,
+     h("8da4e775a563c18f715f802a063c5a31b8a11f5c5ee1879ec3454e5f3c738d2d"
+       "9d201395faa4b61a96c8")),
+]
+
+# stretch_key has no published vector; this pins the output for the
+# master key 00..1f so that a change in the derivation cannot go unnoticed
+# (it would make every existing protected symmetric key undecryptable).
+STRETCH_KEY_VECTOR = (
+    bytes(range(32)),
+    h("17ce44ee5af405d62932af08c5813f78728cc1cb0b2176dab8b26548c110e26b"),
+    h("ca9ea5e747dcc8539ba33fa76ae0b087f65f1bfb6c771b6d45aef58ce64d1b66"),
+)
+
+
+def _der_integers(der):
+    """All INTEGER values of a DER blob, depth-first (enough for RSA keys)."""
+    values = []
+
+    def walk(buf, pos, end):
+        while pos < end:
+            tag = buf[pos]
+            length = buf[pos + 1]
+            pos += 2
+            if length & 0x80:
+                n = length & 0x7F
+                length = int.from_bytes(buf[pos:pos + n], "big")
+                pos += n
+            if tag == 0x02:
+                values.append(int.from_bytes(buf[pos:pos + length], "big"))
+            elif tag in (0x30, 0x04):  # SEQUENCE, OCTET STRING (PKCS#8 wrapper)
+                walk(buf, pos, pos + length)
+            pos += length
+
+    walk(der, 0, len(der))
+    return values
+
+
+def check_rsa(pub_der, priv_der):
+    # PKCS#8: version, [RSAPrivateKey: version, n, e, d, p, q, dp, dq, qinv]
+    ints = _der_integers(priv_der)
+    n, e, d, p, q = ints[2:7]
+    if n.bit_length() != 2048 or e != 65537 or p * q != n:
+        return False
+    m = int.from_bytes(b"loco known answer", "big")
+    return pow(pow(m, e, n), d, n) == m and n.to_bytes(256, "big") in pub_der
+
+
+def known_answers(vw, backends):
+    """Run every vector against every backend; return {check: "ok"|error}."""
+    results = {}
+
+    def check(name, fn):
+        try:
+            results[name] = "ok" if fn() else "wrong answer"
+        except Exception as e:
+            results[name] = f"error: {e}"
+
+    words = vw._key_expansion(SP800_KEY)
+    check("key_expansion/fips197-a3",
+          lambda: all(words[i] == w for i, w in KEY_EXPANSION_WORDS.items()))
+    for password, salt, iterations, dk in PBKDF2_VECTORS:
+        check(f"pbkdf2/rfc7914-{iterations}",
+              lambda: vw.pbkdf2(password, salt, iterations) == dk)
+    for i, (prk, info, length, okm) in enumerate(HKDF_VECTORS):
+        check(f"hkdf_expand/rfc5869-{(1, 3)[i]}",
+              lambda: vw.hkdf_expand(prk, info, length) == okm)
+    master_key, enc, mac = STRETCH_KEY_VECTOR
+    check("stretch_key/pinned", lambda: vw.stretch_key(master_key) == (enc, mac))
+
+    for name, backend in backends.items():
+        check(f"{name}/aes_cbc_encrypt/fips197-c3",
+              lambda: backend.aes_cbc_encrypt(FIPS197_PT, FIPS197_KEY, bytes(16))[:16]
+              == FIPS197_CT)
+        check(f"{name}/aes_cbc_encrypt/sp800-38a",
+              lambda: backend.aes_cbc_encrypt(SP800_PT, SP800_KEY, SP800_IV)[:64]
+              == SP800_CT)
+        check(f"{name}/aes_cbc_decrypt/sp800-38a",
+              lambda: backend.aes_cbc_decrypt(
+                  backend.aes_cbc_encrypt(SP800_PT, SP800_KEY, SP800_IV),
+                  SP800_KEY, SP800_IV) == SP800_PT)
+        check(f"{name}/decrypt_aes_cbc/sp800-38a",
+              lambda: _check_cipher_string(vw, name))
+        check(f"{name}/generate_rsa_2048/consistency",
+              lambda: check_rsa(*backend.generate_rsa_2048()))
+    return results
+
+
+def _check_cipher_string(vw, backend_name):
+    """Type-2 cipher string built from the SP 800-38A vector by hand."""
+    vw.set_crypto_backend(backend_name)
+    mac_key = bytes(range(32, 64))
+    padded = SP800_CT + vw.crypto_backend().aes_cbc_encrypt(
+        SP800_PT, SP800_KEY, SP800_IV)[64:]
+    mac = hmac.new(mac_key, SP800_IV + padded, hashlib.sha256).digest()
+
+    def cipher_string(mac):
+        return "2." + "|".join(
+            base64.b64encode(part).decode() for part in (SP800_IV, padded, mac))
+
+    if vw.decrypt_aes_cbc(cipher_string(mac), SP800_KEY, mac_key) != SP800_PT:
+        return False
+    try:
+        vw.decrypt_aes_cbc(cipher_string(bytes([mac[0] ^ 1]) + mac[1:]), SP800_KEY, mac_key)
+        return False
+    except ValueError:
+        pass
+    round_trip = vw.encrypt_aes_cbc(SP800_PT, SP800_KEY, mac_key)
+    return vw.decrypt_aes_cbc(round_trip, SP800_KEY, mac_key) == SP800_PT
+
+
+# --- Benchmarks ---
+
+def size_label(n):
+    return f"{n // 1024}KiB" if n >= 1024 and n % 1024 == 0 else f"{n}B"
+
+
+# Key generation searches for random primes, so single calls vary several
+# fold; it gets more runs (and its own reference timing, see run_cases).
+RSA_MIN_RUNS = 20
+
+
+def cases(vw, backends):
+    """Return [(key, backend, min_runs, fn)]; backend is selected before fn runs."""
+    key, iv = SP800_KEY, SP800_IV
+    enc_key, mac_key = bytes(range(32)), bytes(range(32, 64))
+    result = []
+
+    for name, backend in backends.items():
+        vw.set_crypto_backend(name)
+        for size in SIZES:
+            data = os.urandom(size)
+            ct = backend.aes_cbc_encrypt(data, key, iv)
+            cipher_string = vw.encrypt_aes_cbc(data, enc_key, mac_key)
+            label = size_label(size)
+            result += [
+                (f"{name}/aes_cbc_encrypt/{label}", name, None,
+                 lambda b=backend, d=data: b.aes_cbc_encrypt(d, key, iv)),
+                (f"{name}/aes_cbc_decrypt/{label}", name, None,
+                 lambda b=backend, c=ct: b.aes_cbc_decrypt(c, key, iv)),
+                (f"{name}/encrypt_aes_cbc/{label}", name, None,
+                 lambda d=data: vw.encrypt_aes_cbc(d, enc_key, mac_key)),
+                (f"{name}/decrypt_aes_cbc/{label}", name, None,
+                 lambda c=cipher_string: vw.decrypt_aes_cbc(c, enc_key, mac_key)),
+            ]
+        result.append((f"{name}/generate_rsa_2048/2048bit", name, RSA_MIN_RUNS,
+                       backend.generate_rsa_2048))
+
+    result += [
+        ("python/_key_expansion/32B", None, None, lambda: vw._key_expansion(key)),
+        ("any/pbkdf2/1it", None, None, lambda: vw.pbkdf2(enc_key, b"password", 1)),
+        (f"any/pbkdf2/{vw.KDF_ITERATIONS}it", None, None,
+         lambda: vw.pbkdf2(b"password", b"service@example", vw.KDF_ITERATIONS)),
+        ("any/hkdf_expand/32B", None, None, lambda: vw.hkdf_expand(key, b"enc", 32)),
+        ("any/hkdf_expand/64B", None, None, lambda: vw.hkdf_expand(key, b"enc", 64)),
+        ("any/stretch_key/32B", None, None, lambda: vw.stretch_key(key)),
+    ]
+    return result
+
+
+def sample(fn, min_time, min_runs, max_runs):
+    """Call fn until both min_time and min_runs are reached; return timings."""
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < max_runs and (
+            len(timings) < min_runs or time.perf_counter() - started < min_time):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+    return timings
+
+
+# Reference workload: a fixed pure-Python loop (table lookups, xor, mask,
+# like the AES rounds). How fast a shared host runs swings by 1.5x and more
+# between processes and within one; timing this loop right before every
+# sample and comparing the ratio, not raw ops/s, cancels most of it.
+_REFERENCE_TABLE = list(range(256))
+REFERENCE_TIME = 0.02
+
+
+def reference_loop():
+    x = 0
+    for i in range(2000):
+        x = (x ^ _REFERENCE_TABLE[i & 255]) + i & 0xFFFFFFFF
+    return x
+
+
+def reference_time():
+    return percentile(sorted(sample(reference_loop, REFERENCE_TIME, 10, 1000)), 50)
+
+
+def run_cases(vw, selected, rounds, min_time, min_runs, max_runs):
+    """Time every case in `rounds` interleaved passes.
+
+    Each case gets `ops_per_sec` (best round's median, as timeit's
+    best-of-N) and `relative`: calls per reference loop, the median over
+    rounds. Only `relative` is compared against the baseline. Cases with
+    their own run count are randomized (RSA) and take seconds per round,
+    so the reference loop is timed before each of their calls instead.
+    """
+    timings = {key: [] for key, _, _, _ in selected}
+    medians = {key: [] for key, _, _, _ in selected}
+    relative = {key: [] for key, _, _, _ in selected}
+    for round_no in range(rounds):
+        for key, backend, case_runs, fn in selected:
+            if backend:
+                vw.set_crypto_backend(backend)
+                vw.crypto_backend()  # probe outside the timed calls
+            if round_no == 0:
+                fn()  # warm-up: tables, ctypes prototypes, allocator
+            runs = -(-max(min_runs, case_runs or 0) // rounds)
+            if case_runs:
+                t = []
+                for _ in range(runs):
+                    reference = reference_time()
+                    t += sample(fn, 0, 1, 1)
+                    relative[key].append(reference / t[-1])
+            else:
+                reference = reference_time()
+                t = sample(fn, min_time / rounds, runs, max_runs)
+                relative[key].append(reference / percentile(sorted(t), 50))
+            timings[key] += t
+            medians[key].append(percentile(sorted(t), 50))
+        log(f"round {round_no + 1}/{rounds} done")
+    results = {}
+    for key, values in timings.items():
+        stats = summarize(values, scale=1e6, digits=1)  # microseconds
+        stats = {f"{k}_us" if k != "runs" else k: v for k, v in stats.items()}
+        stats["ops_per_sec"] = round(1 / min(medians[key]), 2)
+        stats["relative"] = float(f"{statistics.median(relative[key]):.5g}")
+        results[key] = stats
+    return results
+
+
+# --- Baseline ---
+
+def host_info(backends):
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "backends": {name: b.describe() for name, b in backends.items()},
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Cases whose relative speed fell more than `tolerance` below baseline."""
+    regressions = []
+    for key, stats in results.items():
+        reference = baseline.get(key)
+        if not reference:
+            continue
+        ratio = stats["relative"] / reference
+        stats["vs_baseline"] = round(ratio, 3)
+        if ratio < 1 - tolerance:
+            regressions.append({"case": key, "relative": stats["relative"],
+                                "baseline": reference, "ratio": round(ratio, 3)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crypto known-answer checks and benchmarks")
+    parser.add_argument("--script", default=DEFAULT_SCRIPT, help="vw-credentials.py to load")
+    parser.add_argument("--backend", choices=("all", "python", "libcrypto"), default="all",
+                        help="Backends to check and time (default: all available)")
+    parser.add_argument("--only", default="",
+                        help="Regex; time only cases whose key matches (e.g. 'aes|rsa')")
+    parser.add_argument("--min-time", type=float, default=0.6,
+                        help="Seconds to spend per case, over all rounds (default: 0.6)")
+    parser.add_argument("--rounds", type=int,
+                        help="Interleaved passes (default: 3, 7 with --update-baseline)")
+    parser.add_argument("--min-runs", type=int, default=5, help="Calls per case at least")
+    parser.add_argument("--max-runs", type=int, default=100000, help="Calls per case at most")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--no-baseline", action="store_true", help="Do not compare")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Write this run's ops/s as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.35,
+                        help="Allowed drop in relative speed before failing "
+                             "(default: 0.35, i.e. about 1.5x slower fails)")
+    args = parser.parse_args()
+
+    vw = load_script(args.script)
+    backends = {}
+    if args.backend in ("all", "python"):
+        backends["python"] = vw.PythonCrypto()
+    if args.backend in ("all", "libcrypto"):
+        try:
+            backends["libcrypto"] = vw.LibcryptoCrypto()
+        except OSError as e:
+            if args.backend == "libcrypto":
+                raise RuntimeError(f"libcrypto backend unavailable: {e}") from e
+            log(f"WARNING: libcrypto unavailable ({e}), skipping")
+
+    kat = known_answers(vw, backends)
+    report = {"script": os.path.abspath(args.script), "host": host_info(backends),
+              "known_answers": kat}
+    failed = [name for name, result in kat.items() if result != "ok"]
+    if failed:
+        report["status"] = "known-answer failure"
+        print(json.dumps(report, indent=2))
+        return 1
+
+    only = re.compile(args.only) if args.only else None
+    selected = [case for case in cases(vw, backends) if not only or only.search(case[0])]
+    # A baseline is compared against many later runs; give it more rounds.
+    rounds = args.rounds or (7 if args.update_baseline else 3)
+    results = run_cases(vw, selected, rounds, args.min_time,
+                        args.min_runs, args.max_runs)
+    report["results"] = results
+
+    regressions = []
+    if args.update_baseline:
+        baseline = {"relative": {}, "ops_per_sec": {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline.update(json.load(f))
+        for field in ("relative", "ops_per_sec"):
+            baseline[field].update({k: v[field] for k, v in results.items()})
+            baseline[field] = dict(sorted(baseline[field].items()))
+        baseline["host"] = report["host"]
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2)
+            f.write("\n")
+        report["baseline"] = "updated"
+    elif not args.no_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline.get("relative", {}), args.tolerance)
+        report["baseline"] = os.path.abspath(args.baseline)
+        report["regressions"] = regressions
+
+    report["status"] = "regression" if regressions else "ok"
+    print(json.dumps(report, indent=2))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except Exception as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
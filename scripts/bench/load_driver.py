@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+load_driver.py — Replay a customer onboarding against a Vaultwarden (by
+default the in-process mock) and report throughput and latency.
+
+Each customer gets --credentials admin logins ("<kunde> — <App> Admin", in
+a folder named after the customer), written the way the Ansible roles do:
+
+    store    one vw-credentials.py process per credential (store.yml)
+    import   one process per customer with all its records (queue.yml +
+             flush.yml)
+
+Up to --forks processes run at once, like Ansible forks. With --daemon
+the run goes through a warm `--action serve` daemon (daemon_start.yml).
+Every run starts from an empty server and cache; the service user is set
+up before timing starts. The report counts both sides: the client's own
+metrics records and the mock's per-route request counters.
+
+    python3 scripts/bench/load_driver.py --customers 10 --credentials 4 --forks 5
+    python3 scripts/bench/load_driver.py --vault-sizes 0,1000,5000 --mode import
+    python3 scripts/bench/load_driver.py --daemon --latency-ms 20 --replays 2
+    python3 scripts/bench/load_driver.py --url http://vw.test:8080 --admin-token ...
+
+Prints one JSON object per run (vault size x replay) to stdout.
+"""
+
+import argparse
+import concurrent.futures
+import itertools
+import json
+import os
+import secrets
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from benchlib import DEFAULT_SCRIPT, summarize
+from mock_vaultwarden import SEED_APPS, MockVaultwarden, start_in_thread
+
+
+def control(url, path, payload=None):
+    """Call a /_mock/ control endpoint; returns the decoded JSON."""
+    data = None if payload is None else json.dumps(payload).encode()
+    req = urllib.request.Request(f"{url}/_mock/{path}", data=data,
+                                 method="GET" if payload is None else "POST",
+                                 headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=600) as resp:
+        return json.loads(resp.read() or b"null")
+
+
+def onboarding(customers, credentials, prefix="Last-Kunde"):
+    """Records per customer, as playbooks/onboard-customer.yml produces them."""
+    plan = []
+    for c in range(customers):
+        kunde = f"{prefix} {c:04d}"
+        records = []
+        for i in range(credentials):
+            app = SEED_APPS[i % len(SEED_APPS)]
+            records.append({
+                "name": f"{kunde} — {app} Admin" + (f" {i}" if i >= len(SEED_APPS) else ""),
+                "username": "admin",
+                "password": secrets.token_urlsafe(24),
+                "uri": f"https://{app.lower().replace(' ', '-')}.kunde{c}.example",
+                "notes": f"Erstellt: {time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}",
+                "ignore_timestamps": True,
+                "folder": kunde,
+            })
+        plan.append(records)
+    return plan
+
+
+class Runner:
+    """Runs vw-credentials.py processes against one server and cache dir."""
+
+    def __init__(self, args, url, workdir):
+        self.args = args
+        self.url = url
+        self.workdir = workdir
+        self.env = dict(os.environ, VW_CREDENTIALS_CACHE_DIR=os.path.join(workdir, "cache"))
+        self.socket = os.path.join(workdir, "vw.sock") if args.daemon else None
+        self._seq = itertools.count(1)  # next() is atomic; jobs run in threads
+
+    def invoke(self, request):
+        """Run one process; return its timing, exit code and metrics record."""
+        seq = next(self._seq)
+        path = os.path.join(self.workdir, f"req-{seq}.json")
+        metrics = os.path.join(self.workdir, f"metrics-{seq}.jsonl")
+        with open(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+            json.dump(dict(request, url=self.url, admin_token=self.args.admin_token), f)
+        cmd = [sys.executable, self.args.script, "--from-file", path, "--metrics", metrics]
+        if self.socket:
+            cmd += ["--socket", self.socket]
+        t0 = time.perf_counter()
+        proc = subprocess.run(cmd, capture_output=True, text=True, env=self.env)
+        elapsed = time.perf_counter() - t0
+        record = {}
+        if os.path.exists(metrics):
+            with open(metrics) as f:
+                lines = f.read().splitlines()
+            record = json.loads(lines[-1]) if lines else {}
+        return {"seconds": elapsed, "rc": proc.returncode, "stdout": proc.stdout,
+                "stderr": proc.stderr[-500:], "metrics": record}
+
+    def daemon(self, action):
+        cmd = [sys.executable, self.args.script, "--url", self.url,
+               "--admin-token", self.args.admin_token, "--socket", self.socket,
+               "--action", action]
+        if action == "serve":
+            cmd += ["--detach", "--idle-timeout", "600"]
+        subprocess.run(cmd, check=True, capture_output=True, text=True, env=self.env)
+
+
+def run_once(args, url, vault_size, replay, runner, plan):
+    """Replay `plan` once; return the report for this run."""
+    if args.mode == "store":
+        jobs = [dict(record, action="store") for records in plan for record in records]
+    else:
+        jobs = [{"action": "import", "records": records} for records in plan]
+    credentials = sum(len(records) for records in plan)
+
+    if args.mock:
+        control(url, "reset", {})
+    t0 = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(args.forks) as pool:
+        results = list(pool.map(runner.invoke, jobs))
+    wall = time.perf_counter() - t0
+
+    actions = {}
+    failures = []
+    for result in results:
+        if result["rc"] != 0:
+            failures.append(result["stderr"].strip().splitlines()[-1:] or ["?"])
+            continue
+        for line in result["stdout"].splitlines():
+            action = json.loads(line).get("action", "?")
+            actions[action] = actions.get(action, 0) + 1
+
+    client_http = {}
+    for result in results:
+        for key, value in result["metrics"].get("http", {}).items():
+            client_http[key] = client_http.get(key, 0) + value
+    report = {
+        "vault_size": vault_size,
+        "replay": replay,
+        "mode": args.mode + ("+daemon" if args.daemon else ""),
+        "customers": len(plan),
+        "credentials": credentials,
+        "forks": args.forks,
+        "processes": len(jobs),
+        "wall_seconds": round(wall, 3),
+        "credentials_per_sec": round(credentials / wall, 2),
+        "process_seconds": summarize([r["seconds"] for r in results]),
+        "actions": actions,
+        "failures": len(failures),
+        "client_http": client_http,
+    }
+    if failures:
+        report["failure_samples"] = failures[:3]
+    if args.mock:
+        report["server"] = control(url, "stats")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Onboarding load test for vw-credentials.py")
+    parser.add_argument("--url", help="Vaultwarden to test (default: in-process mock)")
+    parser.add_argument("--admin-token", default="bench-admin-token")
+    parser.add_argument("--script", default=DEFAULT_SCRIPT, help="vw-credentials.py to run")
+    parser.add_argument("--customers", type=int, default=5)
+    parser.add_argument("--credentials", type=int, default=4, help="Per customer")
+    parser.add_argument("--forks", type=int, default=5, help="Concurrent processes")
+    parser.add_argument("--mode", choices=("store", "import"), default="store")
+    parser.add_argument("--daemon", action="store_true", help="Run through a warm daemon")
+    parser.add_argument("--replays", type=int, default=1,
+                        help="Replay the same onboarding N times (2nd+: all unchanged)")
+    parser.add_argument("--vault-sizes", default="0",
+                        help="Comma-separated pre-seeded vault sizes, mock only (default: 0)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Mock latency")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Mock latency jitter")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.vault_sizes.split(",") if s.strip()]
+    args.mock = not args.url
+    if args.mock:
+        mock = MockVaultwarden(args.admin_token, args.latency_ms, args.jitter_ms,
+                               script=args.script)
+        _, url = start_in_thread(mock)
+    else:
+        if sizes != [0]:
+            parser.error("--vault-sizes needs the built-in mock (omit --url)")
+        url = args.url.rstrip("/")
+
+    for size in sizes:
+        workdir = tempfile.mkdtemp(prefix="vw-load-")
+        runner = Runner(args, url, workdir)
+        try:
+            t0 = time.perf_counter()
+            if args.mock:
+                mock.reset(state=True)
+                if size:
+                    mock.seed(size, folders=max(1, size // len(SEED_APPS)))
+            setup = runner.invoke({"action": "setup"})
+            if setup["rc"] != 0:
+                raise RuntimeError(f"setup failed: {setup['stderr'].strip()}")
+            if args.daemon:
+                runner.daemon("serve")
+            setup_seconds = time.perf_counter() - t0
+            plan = onboarding(args.customers, args.credentials)
+            for replay in range(1, args.replays + 1):
+                report = run_once(args, url, size, replay, runner, plan)
+                report["setup_seconds"] = round(setup_seconds, 3)
+                print(json.dumps(report), flush=True)
+        finally:
+            if args.daemon:
+                runner.daemon("shutdown")
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
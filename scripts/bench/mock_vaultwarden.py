@@ -0,0 +1,696 @@
+#!/usr/bin/env python3
+"""
+mock_vaultwarden.py — Local Vaultwarden stand-in for load tests of
+vw-credentials.py.
+
+Implements exactly the endpoints VaultwardenClient calls (admin login and
+user list, prelogin, the three registration flows, token grants, sync,
+ciphers, import, move, folders, key rotation and password change) with
+in-memory state. It checks auth like
+Vaultwarden, but not crypto: cipher strings are stored as sent.
+
+    python3 scripts/bench/mock_vaultwarden.py --port 18222 --admin-token tok \\
+        --latency-ms 5 --seed-ciphers 5000
+    python3 scripts/vw-credentials.py --url http://127.0.0.1:18222 \\
+        --admin-token tok --action setup
+
+Failure modes of real servers can be switched on at start or at runtime:
+
+    --signups-disabled      registration answers "Registration not allowed
+                            or user already exists" (SIGNUPS_ALLOWED=false)
+    --sso-only              password grants answer "SSO sign-in is
+                            required" (SSO_ONLY=true)
+    --register-flow FLOW    which registration endpoint exists: legacy
+                            (/api/accounts/register), identity (1.27-1.33)
+                            or finish (1.34+ send-verification-email/finish)
+    --inject "ROUTE=STATUS[@RATE]"
+                            answer ROUTE (as in /_mock/stats, e.g.
+                            "GET /admin/users" or "POST /api/ciphers") with
+                            STATUS, for a fraction RATE of requests
+
+Control endpoints (no auth):
+
+    GET  /_mock/stats            requests per route, connections
+    POST /_mock/reset            zero the counters; ?state=1 also drops all
+                                 users and vaults
+    POST /_mock/config           JSON: latency_ms, jitter_ms, signups,
+                                 sso_only, register_flow, inject
+    POST /_mock/seed             JSON {"ciphers": N, "folders": K}: fill the
+                                 service user's vault (created if missing)
+
+Seeded ciphers are encrypted like the client would, with the service
+user's key (derived from the admin token as vw-credentials.py does), so
+the client really decrypts thousands of names.
+"""
+
+import argparse
+import collections
+import json
+import random
+import re
+import socket
+import sys
+import threading
+import time
+import urllib.parse
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchlib import DEFAULT_SCRIPT, load_script
+
+REGISTER_FLOWS = ("legacy", "identity", "finish")
+REGISTER_BLOCKED = "Registration not allowed or user already exists"
+
+# Applications a LocoCloud customer typically gets, for seeded names.
+SEED_APPS = ("PocketID", "Tinyauth", "Nextcloud", "Paperless", "Vaultwarden",
+             "Gitea", "Grafana", "Uptime Kuma")
+
+
+def _now_iso(ts=None):
+    t = time.time() if ts is None else ts
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(t)) + f".{int(t % 1 * 1e6):06d}Z"
+
+
+def parse_inject(spec):
+    """"POST /api/ciphers=409@0.1" -> {"route", "status", "rate"}."""
+    route, _, rest = spec.rpartition("=")
+    status, _, rate = rest.partition("@")
+    if not route or not status.isdigit():
+        raise ValueError(f"Bad --inject {spec!r}, expected ROUTE=STATUS[@RATE]")
+    return {"route": route.strip(), "status": int(status), "rate": float(rate or 1)}
+
+
+# --- Server State ---
+
+class MockVaultwarden:
+    """In-memory Vaultwarden: accounts, one vault per account, counters."""
+
+    # (method, path regex, handler, stats route). Order matters: specific
+    # /api/ciphers/... paths before the {id} catch-all.
+    ROUTES = [
+        ("POST", r"/admin", "admin_login", None),
+        ("GET", r"/admin/users", "admin_users", None),
+        ("POST", r"/admin/users/([^/]+)/delete", "admin_delete", "POST /admin/users/{id}/delete"),
+        ("GET", r"/admin/diagnostics/config", "admin_config", None),
+        ("POST", r"/api/accounts/prelogin", "prelogin", None),
+        ("POST", r"/identity/accounts/prelogin", "prelogin", None),
+        ("POST", r"/api/accounts/register", "register_legacy", None),
+        ("POST", r"/identity/accounts/register", "register_identity", None),
+        ("POST", r"/identity/accounts/register/send-verification-email",
+         "register_verification", None),
+        ("POST", r"/identity/accounts/register/finish", "register_finish", None),
+        ("POST", r"/identity/connect/token", "token", None),
+        ("GET", r"/alive", "alive", None),
+        ("GET", r"/api/accounts/revision-date", "revision_date", None),
+        ("GET", r"/api/users/([^/]+)/public-key", "public_key", "GET /api/users/{id}/public-key"),
+        ("POST", r"/api/accounts/key-management/rotate-user-account-keys", "rotate_keys", None),
+        ("POST", r"/api/accounts/key", "rotate_key_legacy", None),
+        ("POST", r"/api/accounts/password", "change_password", None),
+        ("GET", r"/api/sync", "sync", None),
+        ("GET", r"/api/ciphers", "list_ciphers", None),
+        ("POST", r"/api/ciphers", "create_cipher", None),
+        ("POST", r"/api/ciphers/import", "import_ciphers", None),
+        ("PUT", r"/api/ciphers/move", "move_ciphers", None),
+        ("POST", r"/api/ciphers/move", "move_ciphers", None),
+        ("GET", r"/api/ciphers/([^/]+)", "get_cipher", "GET /api/ciphers/{id}"),
+        ("PUT", r"/api/ciphers/([^/]+)", "update_cipher", "PUT /api/ciphers/{id}"),
+        ("POST", r"/api/folders", "create_folder", None),
+        ("PUT", r"/api/folders/([^/]+)", "update_folder", "PUT /api/folders/{id}"),
+    ]
+
+    def __init__(self, admin_token, latency_ms=0.0, jitter_ms=0.0, signups=True,
+                 sso_only=False, register_flow="identity", inject=(), script=DEFAULT_SCRIPT):
+        self.admin_token = admin_token
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.signups = signups
+        self.sso_only = sso_only
+        self.register_flow = register_flow
+        self.inject = list(inject)
+        self.script = script
+        self.lock = threading.Lock()
+        self._routes = [(m, re.compile(p + r"/?\Z"), h, r or f"{m} {p}")
+                        for m, p, h, r in self.ROUTES]
+        self._vw = None
+        self.reset(state=True)
+
+    def reset(self, state=False):
+        with self.lock:
+            self.requests = collections.Counter()
+            self.statuses = collections.Counter()
+            self.connections = 0
+            if state:
+                self.users = {}      # email -> account
+                self.vaults = {}     # email -> {"revision", "ciphers", "folders"}
+                self.tokens = {}     # access token -> email
+                self.refresh = {}    # refresh token -> email
+                self.admin_sessions = set()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "requests": dict(sorted(self.requests.items())),
+                "statuses": {str(k): v for k, v in sorted(self.statuses.items())},
+                "total": sum(self.requests.values()),
+                "connections": self.connections,
+                "users": len(self.users),
+                "ciphers": sum(len(v["ciphers"]) for v in self.vaults.values()),
+            }
+
+    def configure(self, options):
+        with self.lock:
+            for key in ("latency_ms", "jitter_ms"):
+                if key in options:
+                    setattr(self, key, float(options[key]))
+            for key in ("signups", "sso_only"):
+                if key in options:
+                    setattr(self, key, bool(options[key]))
+            if "register_flow" in options:
+                if options["register_flow"] not in REGISTER_FLOWS:
+                    raise ValueError(f"register_flow must be one of {REGISTER_FLOWS}")
+                self.register_flow = options["register_flow"]
+            if "inject" in options:
+                self.inject = [parse_inject(s) if isinstance(s, str) else s
+                               for s in options["inject"]]
+
+    # --- Dispatch ---
+
+    def dispatch(self, method, path, query, headers, body):
+        """Return (status, json_body, extra_headers)."""
+        for route_method, pattern, handler, route in self._routes:
+            if route_method != method:
+                continue
+            match = pattern.match(path)
+            if match:
+                break
+        else:
+            route, handler, match = f"{method} <unknown>", None, None
+        delay = self.latency_ms + random.uniform(0, self.jitter_ms)
+        if delay:
+            time.sleep(delay / 1000)
+        with self.lock:
+            self.requests[route] += 1
+            for rule in self.inject:
+                if rule["route"] == route and random.random() < rule["rate"]:
+                    return self._count(rule["status"], {"message": f"injected {rule['status']}"})
+            if not handler:
+                return self._count(404, {"message": f"no route {method} {path}"})
+            ctx = {"query": query, "headers": headers, "body": body}
+            return self._count(*getattr(self, "h_" + handler)(ctx, *match.groups()))
+
+    def _count(self, status, payload=None, headers=None):
+        self.statuses[status] += 1
+        return status, payload, headers
+
+    def _bearer_user(self, ctx):
+        auth = ctx["headers"].get("Authorization", "")
+        return self.tokens.get(auth[len("Bearer "):]) if auth.startswith("Bearer ") else None
+
+    def _admin_ok(self, ctx):
+        cookie = ctx["headers"].get("Cookie", "")
+        return any(f"VW_ADMIN={sid}" in cookie for sid in self.admin_sessions)
+
+    def _bump(self, email):
+        vault = self.vaults[email]
+        vault["revision"] = max(vault["revision"] + 1, int(time.time() * 1000))
+        return vault
+
+    # --- Admin ---
+
+    def h_admin_login(self, ctx):
+        if (ctx["body"] or {}).get("token") != self.admin_token:
+            return 401, {"message": "Invalid admin token"}
+        sid = uuid.uuid4().hex
+        self.admin_sessions.add(sid)
+        return 303, None, {"Set-Cookie": f"VW_ADMIN={sid}; Path=/admin; HttpOnly",
+                           "Location": "/admin"}
+
+    def h_admin_users(self, ctx):
+        if not self._admin_ok(ctx):
+            return 401, {"message": "Unauthorized"}
+        return 200, [{"id": u["id"], "email": email, "object": "user"}
+                     for email, u in self.users.items()]
+
+    def h_admin_delete(self, ctx, user_id):
+        if not self._admin_ok(ctx):
+            return 401, {"message": "Unauthorized"}
+        for email, user in list(self.users.items()):
+            if user["id"] == user_id:
+                del self.users[email]
+                self.vaults.pop(email, None)
+                self._logout(email)
+                return 200, None
+        return 404, {"message": "User doesn't exist"}
+
+    def h_admin_config(self, ctx):
+        if not self._admin_ok(ctx):
+            return 401, {"message": "Unauthorized"}
+        return 200, {"signups_allowed": self.signups, "sso_only": self.sso_only}
+
+    # --- Accounts ---
+
+    def h_prelogin(self, ctx):
+        user = self.users.get(((ctx["body"] or {}).get("email") or "").lower())
+        return 200, {"kdf": 0, "kdfIterations": user["kdfIterations"] if user else 600000,
+                     "kdfMemory": None, "kdfParallelism": None}
+
+    def _register(self, flow, body):
+        if self.register_flow != flow:
+            return 404, {"message": "Not found"}
+        email = (body.get("email") or "").lower()
+        if not self.signups or email in self.users:
+            return 400, {"message": REGISTER_BLOCKED}
+        self.add_user(email, body["masterPasswordHash"], body["key"],
+                      body["keys"]["encryptedPrivateKey"], body.get("kdfIterations", 600000),
+                      body["keys"].get("publicKey"))
+        return 200, None
+
+    def h_register_legacy(self, ctx):
+        return self._register("legacy", ctx["body"] or {})
+
+    def h_register_identity(self, ctx):
+        return self._register("identity", ctx["body"] or {})
+
+    def h_register_verification(self, ctx):
+        if self.register_flow != "finish":
+            return 404, {"message": "Not found"}
+        if not self.signups:
+            return 400, {"message": REGISTER_BLOCKED}
+        return 200, uuid.uuid4().hex  # mail disabled: token in the body
+
+    def h_register_finish(self, ctx):
+        return self._register("finish", ctx["body"] or {})
+
+    def add_user(self, email, master_hash, key, private_key, iterations=600000,
+                 public_key=None):
+        self.users[email] = {"id": str(uuid.uuid4()), "hash": master_hash, "key": key,
+                             "privateKey": private_key, "publicKey": public_key,
+                             "kdfIterations": iterations}
+        self.vaults[email] = {"revision": int(time.time() * 1000), "ciphers": {}, "folders": {}}
+
+    def h_token(self, ctx):
+        body = ctx["body"] or {}
+        if body.get("grant_type") == "password":
+            email = (body.get("username") or "").lower()
+            user = self.users.get(email)
+            if self.sso_only:
+                return 400, {"error": "invalid_grant",
+                             "error_description": "SSO sign-in is required"}
+            if not user or user["hash"] != body.get("password"):
+                return 400, {"error": "invalid_grant",
+                             "error_description": "Username or password is incorrect. Try again"}
+        elif body.get("grant_type") == "refresh_token":
+            email = self.refresh.pop(body.get("refresh_token"), None)
+            user = self.users.get(email)
+            if not user:
+                return 400, {"error": "invalid_grant"}
+        else:
+            return 400, {"error": "unsupported_grant_type"}
+        access, refresh = uuid.uuid4().hex, uuid.uuid4().hex
+        self.tokens[access] = email
+        self.refresh[refresh] = email
+        return 200, {"access_token": access, "refresh_token": refresh, "expires_in": 7200,
+                     "token_type": "Bearer", "Key": user["key"],
+                     "PrivateKey": user["privateKey"], "Kdf": 0,
+                     "KdfIterations": user["kdfIterations"]}
+
+    def h_alive(self, ctx):
+        return 200, _now_iso()
+
+    # --- Vault (bearer auth) ---
+
+    def _vault(self, ctx):
+        email = self._bearer_user(ctx)
+        return (email, self.vaults[email]) if email in self.vaults else (None, None)
+
+    def h_revision_date(self, ctx):
+        email, vault = self._vault(ctx)
+        if not vault:
+            return 401, {"message": "Unauthorized"}
+        return 200, vault["revision"]
+
+    def h_sync(self, ctx):
+        email, vault = self._vault(ctx)
+        if not vault:
+            return 401, {"message": "Unauthorized"}
+        user = self.users[email]
+        return 200, {"ciphers": list(vault["ciphers"].values()),
+                     "folders": list(vault["folders"].values()),
+                     "profile": {"id": user["id"], "email": email, "key": user["key"],
+                                 "privateKey": user["privateKey"]},
+                     "object": "sync"}
+
+    def h_public_key(self, ctx, user_id):
+        if not self._bearer_user(ctx):
+            return 401, {"message": "Unauthorized"}
+        for user in self.users.values():
+            if user["id"] == user_id:
+                return 200, {"userId": user_id, "publicKey": user["publicKey"],
+                             "object": "userKey"}
+        return 404, {"message": "User doesn't exist"}
+
+    def _logout(self, email):
+        """Security stamp reset: every token of the account stops working."""
+        for table in (self.tokens, self.refresh):
+            for tok in [t for t, e in table.items() if e == email]:
+                del table[tok]
+
+    def _rotate(self, ctx, master_hash, key, private_key, public_key, ciphers, folders):
+        """Replace key and all ciphers/folders, as Vaultwarden's key rotation."""
+        email, vault = self._vault(ctx)
+        if not vault:
+            return 401, {"message": "Unauthorized"}
+        user = self.users[email]
+        if master_hash != user["hash"]:
+            return 400, {"message": "Invalid password"}
+        if public_key is not None and public_key != user["publicKey"]:
+            return 400, {"message": "Changing the asymmetric keypair is not possible"}
+        if {c.get("id") for c in ciphers} != set(vault["ciphers"]):
+            return 400, {"message": "All existing ciphers must be included in the rotation"}
+        if {f.get("id") for f in folders} != set(vault["folders"]):
+            return 400, {"message": "All existing folders must be included in the rotation"}
+        for cipher in ciphers:
+            current = vault["ciphers"][cipher["id"]]
+            if cipher.get("lastKnownRevisionDate") != current["revisionDate"]:
+                return 400, {"message": "The client copy of this cipher is out of date. "
+                                        "Resync the client and try again."}
+        for cipher in ciphers:
+            data = {k: v for k, v in cipher.items() if k != "lastKnownRevisionDate"}
+            self._store_cipher(vault, data, cipher["id"])
+        for folder in folders:
+            self._store_folder(vault, folder.get("name", ""), folder["id"])
+        user.update(key=key, privateKey=private_key)
+        self._bump(email)
+        self._logout(email)
+        return 200, None
+
+    def h_rotate_keys(self, ctx):
+        body = ctx["body"] or {}
+        unlock = body.get("accountUnlockData", {}).get("masterPasswordUnlockData", {})
+        keys = body.get("accountKeys", {})
+        data = body.get("accountData", {})
+        if unlock.get("masterKeyAuthenticationHash") != body.get("oldMasterKeyAuthenticationHash"):
+            return 400, {"message": "Changing the master password during key rotation "
+                                    "is not supported"}
+        return self._rotate(ctx, body.get("oldMasterKeyAuthenticationHash"),
+                            unlock.get("masterKeyEncryptedUserKey"),
+                            keys.get("userKeyEncryptedAccountPrivateKey"),
+                            keys.get("accountPublicKey"),
+                            data.get("ciphers", []), data.get("folders", []))
+
+    def h_rotate_key_legacy(self, ctx):
+        body = ctx["body"] or {}
+        return self._rotate(ctx, body.get("masterPasswordHash"), body.get("key"),
+                            body.get("privateKey"), None,
+                            body.get("ciphers", []), body.get("folders", []))
+
+    def h_change_password(self, ctx):
+        email, vault = self._vault(ctx)
+        if not vault:
+            return 401, {"message": "Unauthorized"}
+        body = ctx["body"] or {}
+        user = self.users[email]
+        if body.get("masterPasswordHash") != user["hash"]:
+            return 400, {"message": "Invalid password"}
+        user.update(hash=body.get("newMasterPasswordHash"), key=body.get("key"))
+        self._logout(email)
+        return 200, None
+
+    def h_list_ciphers(self, ctx):
+        email, vault = self._vault(ctx)
+        if not vault:
+            return 401, {"message": "Unauthorized"}
+        return 200, {"data": list(vault["ciphers"].values()), "object": "list"}
+
+    def _store_cipher(self, vault, data, cipher_id=None):
+        cipher = dict(data, id=cipher_id or str(uuid.uuid4()), object="cipherDetails",
+                      revisionDate=_now_iso())
+        vault["ciphers"][cipher["id"]] = cipher
+        return cipher
+
+    def h_create_cipher(self, ctx):
+        email, vault = self._vault(ctx)
+        if not vault:
+            return 401, {"message": "Unauthorized"}
+        self._bump(email)
+        return 200, self._store_cipher(vault, ctx["body"] or {})
+
+    def h_get_cipher(self, ctx, cipher_id):
+        email, vault = self._vault(ctx)
+        if not vault:
+            return 401, {"message": "Unauthorized"}
+        if cipher_id not in vault["ciphers"]:
+            return 404, {"message": "Cipher doesn't exist"}
+        return 200, vault["ciphers"][cipher_id]
+
+    def h_update_cipher(self, ctx, cipher_id):
+        email, vault = self._vault(ctx)
+        if not vault:
+            return 401, {"message": "Unauthorized"}
+        if cipher_id not in vault["ciphers"]:
+            return 404, {"message": "Cipher doesn't exist"}
+        self._bump(email)
+        return 200, self._store_cipher(vault, ctx["body"] or {}, cipher_id)
+
+    def h_import_ciphers(self, ctx):
+        email, vault = self._vault(ctx)
+        if not vault:
+            return 401, {"message": "Unauthorized"}
+        body = ctx["body"] or {}
+        folder_ids = []
+        for folder in body.get("folders", []):
+            if folder.get("id") in vault["folders"]:
+                folder_ids.append(folder["id"])
+            else:
+                folder_ids.append(self._store_folder(vault, folder.get("name", ""))["id"])
+        relations = {r["key"]: folder_ids[r["value"]]
+                     for r in body.get("folderRelationships", [])}
+        for i, cipher in enumerate(body.get("ciphers", [])):
+            self._store_cipher(vault, dict(cipher, folderId=relations.get(i)))
+        self._bump(email)
+        return 200, None
+
+    def h_move_ciphers(self, ctx):
+        email, vault = self._vault(ctx)
+        if not vault:
+            return 401, {"message": "Unauthorized"}
+        body = ctx["body"] or {}
+        for cipher_id in body.get("ids", []):
+            if cipher_id in vault["ciphers"]:
+                vault["ciphers"][cipher_id]["folderId"] = body.get("folderId")
+        self._bump(email)
+        return 200, None
+
+    def _store_folder(self, vault, name, folder_id=None):
+        folder = {"id": folder_id or str(uuid.uuid4()), "name": name,
+                  "revisionDate": _now_iso(), "object": "folder"}
+        vault["folders"][folder["id"]] = folder
+        return folder
+
+    def h_create_folder(self, ctx):
+        email, vault = self._vault(ctx)
+        if not vault:
+            return 401, {"message": "Unauthorized"}
+        self._bump(email)
+        return 200, self._store_folder(vault, (ctx["body"] or {}).get("name", ""))
+
+    def h_update_folder(self, ctx, folder_id):
+        email, vault = self._vault(ctx)
+        if not vault:
+            return 401, {"message": "Unauthorized"}
+        if folder_id not in vault["folders"]:
+            return 404, {"message": "Folder doesn't exist"}
+        self._bump(email)
+        return 200, self._store_folder(vault, (ctx["body"] or {}).get("name", ""), folder_id)
+
+    # --- Seeding ---
+
+    def seed(self, ciphers, folders=0):
+        """Add `ciphers` login ciphers (in `folders` folders) for the service user.
+
+        Creates the service user the way vw-credentials.py registers it if
+        it does not exist yet; the crypto runs outside the lock.
+        """
+        vw = self._vw = self._vw or load_script(self.script, "vw_credentials_mock")
+        email = vw.SERVICE_EMAIL
+        # The password the client derives from the admin token
+        password = vw.VaultwardenClient("http://mock.invalid", self.admin_token,
+                                        cache_dir=None).service_password
+        master_key = vw.make_master_key(password, email)
+        with self.lock:
+            user = self.users.get(email)
+        if user:
+            enc_key, mac_key = vw.stretch_key(master_key)
+            sym_key = vw.decrypt_aes_cbc(user["key"], enc_key, mac_key)
+        else:
+            sym_key, protected = vw.make_sym_key(master_key)
+            public_key, private_key = vw.make_rsa_keys(sym_key)
+            with self.lock:
+                self.add_user(email, vw.make_master_password_hash(password, master_key),
+                              protected, private_key, vw.KDF_ITERATIONS, public_key)
+
+        def enc(text):
+            return vw.encrypt_string(text, sym_key)
+
+        now = time.time()
+        folder_objs = [{"id": str(uuid.uuid4()), "name": enc(f"Seed-Kunde {i:04d}"),
+                        "revisionDate": _now_iso(now), "object": "folder"}
+                       for i in range(folders)]
+        cipher_objs = []
+        for i in range(ciphers):
+            customer, app = divmod(i, len(SEED_APPS))
+            age = random.uniform(0, 365 * 86400)  # spread over the last year
+            cipher_objs.append({
+                "id": str(uuid.uuid4()), "type": 1, "object": "cipherDetails",
+                "name": enc(f"Seed-Kunde {customer:04d} — {SEED_APPS[app]} Admin"),
+                "notes": enc(f"Erstellt: {_now_iso(now - age)}"),
+                "folderId": folder_objs[customer % folders]["id"] if folders else None,
+                "favorite": False, "revisionDate": _now_iso(now - age),
+                "login": {"username": enc("admin"), "password": enc(uuid.uuid4().hex),
+                          "uris": [{"uri": enc(f"https://{SEED_APPS[app].lower()}"
+                                               f".seed{customer}.example"), "match": None}],
+                          "totp": None},
+            })
+        with self.lock:
+            vault = self._bump(email)
+            vault["folders"].update((f["id"], f) for f in folder_objs)
+            vault["ciphers"].update((c["id"], c) for c in cipher_objs)
+            return {"ciphers": len(vault["ciphers"]), "folders": len(vault["folders"])}
+
+
+# --- HTTP Front End ---
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, as Vaultwarden
+    server_version = "mock-vaultwarden"
+    mock = None  # set by make_server()
+
+    def setup(self):
+        super().setup()
+        # BaseHTTPRequestHandler writes headers and body separately; without
+        # NODELAY, Nagle plus the client's delayed ACK adds ~40 ms to every
+        # response, which would swamp what the load test tries to measure.
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.mock.lock:
+            self.mock.connections += 1
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+    def _read_body(self, form):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        if not raw:
+            return None
+        if form and "form" in self.headers.get("Content-Type", ""):
+            return dict(urllib.parse.parse_qsl(raw.decode()))
+        return json.loads(raw)
+
+    def _handle(self, method):
+        url = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        control = url.path.startswith("/_mock/")
+        try:
+            body = self._read_body(form=not control)  # control: always JSON
+            if control:
+                status, payload, headers = self._control(method, url.path, query, body)
+            else:
+                status, payload, headers = self.mock.dispatch(
+                    method, url.path, query, self.headers, body)
+        except Exception as e:
+            status, payload, headers = 500, {"message": f"mock error: {e}"}, None
+        data = b"" if payload is None else json.dumps(payload).encode()
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _control(self, method, path, query, body):
+        if path == "/_mock/stats":
+            return 200, self.mock.stats(), None
+        if path == "/_mock/reset" and method == "POST":
+            self.mock.reset(state=query.get("state") == "1")
+            return 200, {"status": "reset"}, None
+        if path == "/_mock/config" and method == "POST":
+            self.mock.configure(body or {})
+            return 200, {"status": "ok"}, None
+        if path == "/_mock/seed" and method == "POST":
+            body = body or {}
+            return 200, self.mock.seed(int(body.get("ciphers", 0)),
+                                       int(body.get("folders", 0))), None
+        return 404, {"message": f"no control route {method} {path}"}, None
+
+
+def make_server(mock, host="127.0.0.1", port=0):
+    """Bind a threading HTTP server for `mock`; port 0 picks a free one."""
+    handler = type("BoundHandler", (Handler,), {"mock": mock})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_thread(mock, host="127.0.0.1", port=0):
+    """Serve `mock` from a daemon thread; return (server, base_url)."""
+    server = make_server(mock, host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Vaultwarden stand-in for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18222, help="0 picks a free port")
+    parser.add_argument("--admin-token", required=True)
+    parser.add_argument("--latency-ms", type=float, default=0.0,
+                        help="Added to every response (default: 0)")
+    parser.add_argument("--jitter-ms", type=float, default=0.0,
+                        help="Uniform random extra latency on top (default: 0)")
+    parser.add_argument("--signups-disabled", action="store_true")
+    parser.add_argument("--sso-only", action="store_true")
+    parser.add_argument("--register-flow", choices=REGISTER_FLOWS, default="identity")
+    parser.add_argument("--inject", action="append", default=[], metavar="ROUTE=STATUS[@RATE]")
+    parser.add_argument("--seed-ciphers", type=int, default=0,
+                        help="Pre-seed the service user's vault with this many ciphers")
+    parser.add_argument("--seed-folders", type=int, default=0)
+    parser.add_argument("--script", default=DEFAULT_SCRIPT,
+                        help="vw-credentials.py used for seeding crypto")
+    args = parser.parse_args()
+
+    mock = MockVaultwarden(
+        args.admin_token, args.latency_ms, args.jitter_ms,
+        signups=not args.signups_disabled, sso_only=args.sso_only,
+        register_flow=args.register_flow,
+        inject=[parse_inject(s) for s in args.inject], script=args.script,
+    )
+    if args.seed_ciphers:
+        mock.seed(args.seed_ciphers, args.seed_folders)
+    server = make_server(mock, args.host, args.port)
+    print(json.dumps({"url": f"http://{args.host}:{server.server_address[1]}",
+                      "users": len(mock.users)}), flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
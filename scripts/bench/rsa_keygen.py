@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+rsa_keygen.py — Benchmark the pure-Python RSA-2048 key generation of
+vw-credentials.py (the fallback used when libcrypto is not loadable).
+
+Loads the script from a path, so two revisions can be compared:
+
+    git show HEAD~1:scripts/vw-credentials.py > /tmp/vw-old.py
+    python3 scripts/bench/rsa_keygen.py --script /tmp/vw-old.py --runs 50
+    python3 scripts/bench/rsa_keygen.py --runs 50
+
+Prints one JSON object with per-key timings in seconds.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from benchlib import DEFAULT_SCRIPT, load_script, summarize
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pure-Python RSA-2048 keygen")
+    parser.add_argument("--script", default=DEFAULT_SCRIPT, help="vw-credentials.py to load")
+    parser.add_argument("--runs", type=int, default=30, help="Keys to generate")
+    args = parser.parse_args()
+
+    vw = load_script(args.script)
+    keygen = getattr(vw, "_py_generate_rsa_2048", None) or vw.generate_rsa_2048
+    timings = []
+    for _ in range(args.runs):
+        t0 = time.perf_counter()
+        keygen()
+        timings.append(time.perf_counter() - t0)
+    print(json.dumps(dict(summarize(timings), script=os.path.abspath(args.script))))
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
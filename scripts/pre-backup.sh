@@ -47,4 +47,23 @@ done
 # Cleanup old dumps (keep last 3)
 find "${DUMP_DIR}" -name "*.sql" -mtime +3 -delete 2>/dev/null || true
 
+# Vaultwarden service vault: encrypted export, one file per folder; only
+# folders changed since the last run are rewritten (restic dedups the rest).
+# Runs when VW_EXPORT_URL is set, e.g. http://127.0.0.1:8222 on the master.
+VW_SCRIPT="${VW_CREDENTIALS_SCRIPT:-$(dirname "$0")/vw-credentials.py}"
+VW_TOKEN_FILE="${VW_ADMIN_TOKEN_FILE:-/root/.loco-vaultwarden-token}"
+if [ -n "${VW_EXPORT_URL:-}" ] && [ -f "${VW_SCRIPT}" ] && [ -r "${VW_TOKEN_FILE}" ]; then
+  echo "[pre-backup] Exporting Vaultwarden service vault..."
+  VW_START=$(date +%s)
+  # Request encoded by json.dumps (not printf): any character in URL, token
+  # or path stays valid JSON, and the token never appears in argv
+  python3 -c 'import json, sys
+print(json.dumps({"url": sys.argv[1], "admin_token": open(sys.argv[2]).read().strip(),
+                  "action": "export", "export_dir": sys.argv[3]}))' \
+    "${VW_EXPORT_URL}" "${VW_TOKEN_FILE}" "${DUMP_DIR}/vaultwarden" \
+    | python3 "${VW_SCRIPT}" --from-file /dev/stdin --wait-ready 60 --metrics syslog || \
+    echo "[pre-backup] WARNING: Vaultwarden export failed"
+  echo "[pre-backup] Vaultwarden export took $(( $(date +%s) - VW_START ))s"
+fi
+
 echo "[pre-backup] DB dumps completed at $(date)"
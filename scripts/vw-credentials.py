@@ -8,11 +8,51 @@ client-side encryption, and cipher creation.
 Uses a deterministic service user derived from the admin token.
 No manual interaction required.
 
-Dependencies: Python 3.8+ (stdlib only — no external packages)
+Dependencies: Python 3.8+ (stdlib only — no external packages).
+OpenSSL's libcrypto is used through ctypes for AES and RSA keygen when
+present (see --crypto-backend); otherwise pure-Python code is used.
 
 Usage:
     python3 vw-credentials.py --from-file /tmp/request.json
 
+    # Batch: JSON array, JSONL or {"url": ..., "records": [...]}.
+    # One login and one cipher download; prints one JSON result per record.
+    python3 vw-credentials.py --from-file /tmp/requests.jsonl
+
+    # Same records with "action": "import": new ciphers in one request
+    python3 vw-credentials.py --from-file /tmp/requests.jsonl --action import
+
+    # Daemon: log in once, serve store/get/list on a 0600 Unix socket.
+    # Other runs with --socket are forwarded to it (local run if none).
+    python3 vw-credentials.py --from-file /tmp/serve.json \
+        --action serve --socket /run/lococloud/vw-credentials.sock --detach
+    python3 vw-credentials.py --from-file /tmp/request.json \
+        --socket /run/lococloud/vw-credentials.sock
+
+    # Read back: {"action": "get", "names": [...]} -> one record per name
+    python3 vw-credentials.py --from-file /tmp/request.json --action get
+
+    # Preflight (read-only): service user, login, KDF, SIGNUPS_ALLOWED, SSO_ONLY
+    python3 vw-credentials.py --url http://127.0.0.1:8222 --admin-token <token> \
+        --action status
+
+    # Admin token changed: re-key the service user and keep its vault
+    # ({"admin_token": <old>, "new_admin_token": <new>}; --check: dry run)
+    python3 vw-credentials.py --from-file /tmp/request.json --action rotate
+
+    # Backup: encrypted per-folder export, rewriting only changed folders;
+    # read back (no server needed) with --action read-export
+    python3 vw-credentials.py --from-file /tmp/request.json --action export \
+        --export-dir /opt/backups/dumps/vaultwarden
+
+    # Same credential in several vaults at once (one thread per target):
+    # {"action": "store", "name": ..., "targets": [{"url": ..., "admin_token": ...}, ...]}
+    python3 vw-credentials.py --from-file /tmp/request.json --target-policy any
+
+    # Audit: stream matching ciphers as JSONL while they are decrypted
+    python3 vw-credentials.py --from-file /tmp/request.json --action list \
+        --format jsonl --name-prefix "Kunde — " --modified-since 2025-01-01
+
     python3 vw-credentials.py \
         --url http://127.0.0.1:8222 \
         --admin-token <token> \
@@ -24,16 +64,161 @@ Usage:
 
 import argparse
 import base64
+import calendar
+import contextlib
+import fcntl
+import functools
+import gzip
 import hashlib
 import hmac
 import http.client
 import json
+import logging
 import os
+import random
+import re
+import socket
 import struct
 import sys
-import urllib.error
+import threading
+import time
 import urllib.parse
-import urllib.request
+
+log = logging.getLogger("vw-credentials")
+
+
+# --- Instrumentation ---
+# Per-run phase durations and HTTP counters. A run (one CLI invocation, or
+# one daemon request) ends with one JSON line (--metrics) and optionally a
+# node-exporter textfile (--metrics-textfile) that Alloy's unix exporter
+# collects. Phases: admin_login, prelogin, kdf, token, revision_check,
+# cipher_fetch, decrypt, reencrypt, rsa_keygen, write, daemon. They may
+# nest (decrypt runs inside cipher_fetch) and repeat; a phase's value is
+# the sum of its occurrences. With several targets (--from-file "targets")
+# phases of the concurrent threads add up, so they can exceed the run's
+# duration.
+
+
+class RunMetrics:
+    def __init__(self):
+        self.destination = None  # "stderr", "syslog" or a JSONL file path
+        self.textfile = None
+        self._lock = threading.Lock()
+        self.reset("")
+
+    def reset(self, action):
+        self.action = action
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        self.phases = {}
+        self.http = {"requests": 0, "connections": 0, "bytes_sent": 0,
+                     "bytes_received": 0, "errors": 0, "retries": 0}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            with self._lock:
+                self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def timed(self, name):
+        """Decorator: account every call of the function to phase name."""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.phase(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def http_request(self, sent, received, status):
+        with self._lock:
+            self.http["requests"] += 1
+            self.http["bytes_sent"] += sent
+            self.http["bytes_received"] += received
+            if status >= 400:
+                self.http["errors"] += 1
+
+    def count(self, name):
+        """Increment an HTTP counter (connections, retries)."""
+        with self._lock:
+            self.http[name] += 1
+
+    def record(self, status):
+        return {
+            "ts": round(self.started, 3),
+            "action": self.action,
+            "status": status,
+            "duration": round(time.perf_counter() - self._t0, 4),
+            "phases": {k: round(v, 4) for k, v in sorted(self.phases.items())},
+            "http": dict(self.http),
+            "crypto_backend": _crypto.name if _crypto else None,
+        }
+
+    def emit(self, status):
+        """Write the run record to the configured outputs; never raises."""
+        if not self.destination and not self.textfile:
+            return
+        record = self.record(status)
+        try:
+            line = json.dumps(record, sort_keys=True)
+            if self.destination == "stderr":
+                print(line, file=sys.stderr)
+            elif self.destination == "syslog":
+                import syslog
+                syslog.openlog("vw-credentials", 0, syslog.LOG_USER)
+                syslog.syslog(syslog.LOG_INFO, line)
+            elif self.destination:
+                with open(self.destination, "a") as f:
+                    f.write(line + "\n")
+            if self.textfile:
+                self._write_textfile(record)
+        except OSError as e:
+            log.warning(f"metrics not written: {e}")
+
+    def _write_textfile(self, record):
+        """Node-exporter textfile with the last run per action.
+
+        Samples of other actions are carried over from the existing file,
+        so store, list and setup runs do not overwrite each other.
+        """
+        action = record["action"]
+        label = f'action="{action}"'
+        samples = [
+            f'vw_credentials_run_seconds{{{label},status="{record["status"]}"}} {record["duration"]}',
+            f'vw_credentials_last_run_timestamp_seconds{{{label},status="{record["status"]}"}} '
+            f'{record["ts"]}',
+        ]
+        for name, seconds in record["phases"].items():
+            samples.append(f'vw_credentials_phase_seconds{{{label},phase="{name}"}} {seconds}')
+        for name, value in record["http"].items():
+            samples.append(f'vw_credentials_http_{name}{{{label}}} {value}')
+        try:
+            with open(self.textfile) as f:
+                samples += [line.rstrip("\n") for line in f
+                            if line.startswith("vw_credentials_") and label not in line]
+        except FileNotFoundError:
+            pass
+        samples.sort()
+        lines, current = [], None
+        for sample in samples:
+            name = sample.split("{", 1)[0]
+            if name != current:
+                lines.append(f"# TYPE {name} gauge")
+                current = name
+            lines.append(sample)
+        os.makedirs(os.path.dirname(self.textfile) or ".", exist_ok=True)
+        tmp = f"{self.textfile}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, self.textfile)
+
+
+METRICS = RunMetrics()
 
 
 # --- Pure-Python AES-256-CBC (no external dependencies) ---
@@ -70,23 +255,35 @@ def _xtime(a):
     return ((a << 1) ^ 0x11B) & 0xFF if a & 0x80 else (a << 1) & 0xFF
 
 
-def _mix_single(a):
-    t = a[0] ^ a[1] ^ a[2] ^ a[3]
-    u = a[0]
-    a[0] ^= _xtime(a[0] ^ a[1]) ^ t
-    a[1] ^= _xtime(a[1] ^ a[2]) ^ t
-    a[2] ^= _xtime(a[2] ^ a[3]) ^ t
-    a[3] ^= _xtime(a[3] ^ u) ^ t
+def _gmul(a, b):
+    p = 0
+    while b:
+        if b & 1:
+            p ^= a
+        a = _xtime(a)
+        b >>= 1
+    return p
+
+
+def _ror8(w):
+    return ((w >> 8) | (w << 24)) & 0xFFFFFFFF
 
 
-def _inv_mix_single(a):
-    u = _xtime(_xtime(a[0] ^ a[2]))
-    v = _xtime(_xtime(a[1] ^ a[3]))
-    a[0] ^= u; a[1] ^= v; a[2] ^= u; a[3] ^= v
-    _mix_single(a)
+# T-tables: SubBytes + ShiftRows + MixColumns folded into four 256-entry
+# lookups of 32-bit words per direction (state columns are big-endian words).
+_TE0 = [(_xtime(s) << 24) | (s << 16) | (s << 8) | (_xtime(s) ^ s) for s in _SBOX]
+_TD0 = [(_gmul(s, 14) << 24) | (_gmul(s, 9) << 16) | (_gmul(s, 13) << 8) | _gmul(s, 11)
+        for s in _INV_SBOX]
+_TE1 = [_ror8(w) for w in _TE0]
+_TE2 = [_ror8(w) for w in _TE1]
+_TE3 = [_ror8(w) for w in _TE2]
+_TD1 = [_ror8(w) for w in _TD0]
+_TD2 = [_ror8(w) for w in _TD1]
+_TD3 = [_ror8(w) for w in _TD2]
 
 
 def _key_expansion(key: bytes):
+    """FIPS 197 key expansion, returned as a flat list of 32-bit words."""
     nk = len(key) // 4
     nr = nk + 6
     w = list(struct.unpack(f">{nk}I", key))
@@ -100,58 +297,77 @@ def _key_expansion(key: bytes):
             t = ((_SBOX[(t >> 24)] << 24) | (_SBOX[(t >> 16) & 0xFF] << 16) |
                  (_SBOX[(t >> 8) & 0xFF] << 8) | _SBOX[t & 0xFF])
         w.append(w[i - nk] ^ t)
-    rk = []
-    for r in range(nr + 1):
-        rk.append(struct.pack(">4I", *w[4*r:4*r+4]))
-    return rk
-
-
-def _aes_encrypt_block(block: bytes, round_keys) -> bytes:
-    s = bytearray(a ^ b for a, b in zip(block, round_keys[0]))
-    nr = len(round_keys) - 1
-    for r in range(1, nr + 1):
-        # SubBytes
-        for i in range(16):
-            s[i] = _SBOX[s[i]]
-        # ShiftRows
-        s[1], s[5], s[9], s[13] = s[5], s[9], s[13], s[1]
-        s[2], s[6], s[10], s[14] = s[10], s[14], s[2], s[6]
-        s[3], s[7], s[11], s[15] = s[15], s[3], s[7], s[11]
-        # MixColumns (skip on last round)
-        if r < nr:
-            for c in range(4):
-                col = [s[4*c], s[4*c+1], s[4*c+2], s[4*c+3]]
-                _mix_single(col)
-                s[4*c], s[4*c+1], s[4*c+2], s[4*c+3] = col
-        # AddRoundKey
-        rk = round_keys[r]
-        for i in range(16):
-            s[i] ^= rk[i]
-    return bytes(s)
-
-
-def _aes_decrypt_block(block: bytes, round_keys) -> bytes:
-    s = bytearray(a ^ b for a, b in zip(block, round_keys[-1]))
-    nr = len(round_keys) - 1
-    for r in range(nr - 1, -1, -1):
-        # InvShiftRows
-        s[1], s[5], s[9], s[13] = s[13], s[1], s[5], s[9]
-        s[2], s[6], s[10], s[14] = s[10], s[14], s[2], s[6]
-        s[3], s[7], s[11], s[15] = s[7], s[11], s[15], s[3]
-        # InvSubBytes
-        for i in range(16):
-            s[i] = _INV_SBOX[s[i]]
-        # AddRoundKey
-        rk = round_keys[r]
-        for i in range(16):
-            s[i] ^= rk[i]
-        # InvMixColumns (skip on round 0)
-        if r > 0:
-            for c in range(4):
-                col = [s[4*c], s[4*c+1], s[4*c+2], s[4*c+3]]
-                _inv_mix_single(col)
-                s[4*c], s[4*c+1], s[4*c+2], s[4*c+3] = col
-    return bytes(s)
+    return w
+
+
+@functools.lru_cache(maxsize=32)
+def _key_schedule(key: bytes):
+    """Expanded (encrypt, decrypt) round keys, computed once per key.
+
+    The decryption schedule is for the equivalent inverse cipher: round
+    keys in reverse order, InvMixColumns applied to all but the first
+    and last.
+    """
+    ek = _key_expansion(key)
+    nr = len(ek) // 4 - 1
+    dk = []
+    for r in range(nr, -1, -1):
+        for w in ek[4 * r:4 * r + 4]:
+            if 0 < r < nr:
+                w = (_TD0[_SBOX[w >> 24]] ^ _TD1[_SBOX[(w >> 16) & 0xFF]] ^
+                     _TD2[_SBOX[(w >> 8) & 0xFF]] ^ _TD3[_SBOX[w & 0xFF]])
+            dk.append(w)
+    return tuple(ek), tuple(dk)
+
+
+def _aes_encrypt_block(s0, s1, s2, s3, rk):
+    """Encrypt one block given as four big-endian column words."""
+    te0, te1, te2, te3, sbox = _TE0, _TE1, _TE2, _TE3, _SBOX
+    s0 ^= rk[0]; s1 ^= rk[1]; s2 ^= rk[2]; s3 ^= rk[3]
+    k = 4
+    for _ in range(len(rk) // 4 - 2):
+        t0 = te0[s0 >> 24] ^ te1[(s1 >> 16) & 0xFF] ^ te2[(s2 >> 8) & 0xFF] ^ te3[s3 & 0xFF] ^ rk[k]
+        t1 = te0[s1 >> 24] ^ te1[(s2 >> 16) & 0xFF] ^ te2[(s3 >> 8) & 0xFF] ^ te3[s0 & 0xFF] ^ rk[k + 1]
+        t2 = te0[s2 >> 24] ^ te1[(s3 >> 16) & 0xFF] ^ te2[(s0 >> 8) & 0xFF] ^ te3[s1 & 0xFF] ^ rk[k + 2]
+        t3 = te0[s3 >> 24] ^ te1[(s0 >> 16) & 0xFF] ^ te2[(s1 >> 8) & 0xFF] ^ te3[s2 & 0xFF] ^ rk[k + 3]
+        s0, s1, s2, s3 = t0, t1, t2, t3
+        k += 4
+    # Final round: SubBytes + ShiftRows only
+    return (
+        ((sbox[s0 >> 24] << 24) | (sbox[(s1 >> 16) & 0xFF] << 16) |
+         (sbox[(s2 >> 8) & 0xFF] << 8) | sbox[s3 & 0xFF]) ^ rk[k],
+        ((sbox[s1 >> 24] << 24) | (sbox[(s2 >> 16) & 0xFF] << 16) |
+         (sbox[(s3 >> 8) & 0xFF] << 8) | sbox[s0 & 0xFF]) ^ rk[k + 1],
+        ((sbox[s2 >> 24] << 24) | (sbox[(s3 >> 16) & 0xFF] << 16) |
+         (sbox[(s0 >> 8) & 0xFF] << 8) | sbox[s1 & 0xFF]) ^ rk[k + 2],
+        ((sbox[s3 >> 24] << 24) | (sbox[(s0 >> 16) & 0xFF] << 16) |
+         (sbox[(s1 >> 8) & 0xFF] << 8) | sbox[s2 & 0xFF]) ^ rk[k + 3],
+    )
+
+
+def _aes_decrypt_block(s0, s1, s2, s3, dk):
+    """Decrypt one block given as four big-endian column words."""
+    td0, td1, td2, td3, isbox = _TD0, _TD1, _TD2, _TD3, _INV_SBOX
+    s0 ^= dk[0]; s1 ^= dk[1]; s2 ^= dk[2]; s3 ^= dk[3]
+    k = 4
+    for _ in range(len(dk) // 4 - 2):
+        t0 = td0[s0 >> 24] ^ td1[(s3 >> 16) & 0xFF] ^ td2[(s2 >> 8) & 0xFF] ^ td3[s1 & 0xFF] ^ dk[k]
+        t1 = td0[s1 >> 24] ^ td1[(s0 >> 16) & 0xFF] ^ td2[(s3 >> 8) & 0xFF] ^ td3[s2 & 0xFF] ^ dk[k + 1]
+        t2 = td0[s2 >> 24] ^ td1[(s1 >> 16) & 0xFF] ^ td2[(s0 >> 8) & 0xFF] ^ td3[s3 & 0xFF] ^ dk[k + 2]
+        t3 = td0[s3 >> 24] ^ td1[(s2 >> 16) & 0xFF] ^ td2[(s1 >> 8) & 0xFF] ^ td3[s0 & 0xFF] ^ dk[k + 3]
+        s0, s1, s2, s3 = t0, t1, t2, t3
+        k += 4
+    # Final round: InvShiftRows + InvSubBytes only
+    return (
+        ((isbox[s0 >> 24] << 24) | (isbox[(s3 >> 16) & 0xFF] << 16) |
+         (isbox[(s2 >> 8) & 0xFF] << 8) | isbox[s1 & 0xFF]) ^ dk[k],
+        ((isbox[s1 >> 24] << 24) | (isbox[(s0 >> 16) & 0xFF] << 16) |
+         (isbox[(s3 >> 8) & 0xFF] << 8) | isbox[s2 & 0xFF]) ^ dk[k + 1],
+        ((isbox[s2 >> 24] << 24) | (isbox[(s1 >> 16) & 0xFF] << 16) |
+         (isbox[(s0 >> 8) & 0xFF] << 8) | isbox[s3 & 0xFF]) ^ dk[k + 2],
+        ((isbox[s3 >> 24] << 24) | (isbox[(s2 >> 16) & 0xFF] << 16) |
+         (isbox[(s1 >> 8) & 0xFF] << 8) | isbox[s0 & 0xFF]) ^ dk[k + 3],
+    )
 
 
 def _pkcs7_pad(data: bytes, block_size: int = 16) -> bytes:
@@ -168,32 +384,58 @@ def _pkcs7_unpad(data: bytes) -> bytes:
     return data[:-pad_len]
 
 
-def aes_cbc_encrypt(data: bytes, key: bytes, iv: bytes) -> bytes:
-    rk = _key_expansion(key)
+def _py_aes_cbc_encrypt(data: bytes, key: bytes, iv: bytes) -> bytes:
+    rk, _ = _key_schedule(bytes(key))
     data = _pkcs7_pad(data)
-    out = bytearray()
-    prev = iv
-    for i in range(0, len(data), 16):
-        block = bytes(a ^ b for a, b in zip(data[i:i+16], prev))
-        prev = _aes_encrypt_block(block, rk)
-        out.extend(prev)
-    return bytes(out)
+    words = struct.unpack(f">{len(data) // 4}I", data)
+    out = []
+    p0, p1, p2, p3 = struct.unpack(">4I", iv)
+    for i in range(0, len(words), 4):
+        p0, p1, p2, p3 = _aes_encrypt_block(
+            words[i] ^ p0, words[i + 1] ^ p1, words[i + 2] ^ p2, words[i + 3] ^ p3, rk
+        )
+        out += (p0, p1, p2, p3)
+    return struct.pack(f">{len(out)}I", *out)
 
 
-def aes_cbc_decrypt(data: bytes, key: bytes, iv: bytes) -> bytes:
-    rk = _key_expansion(key)
-    out = bytearray()
-    prev = iv
-    for i in range(0, len(data), 16):
-        block = data[i:i+16]
-        dec = _aes_decrypt_block(block, rk)
-        out.extend(bytes(a ^ b for a, b in zip(dec, prev)))
-        prev = block
-    return _pkcs7_unpad(bytes(out))
+def _py_aes_cbc_decrypt(data: bytes, key: bytes, iv: bytes) -> bytes:
+    if not data or len(data) % 16:
+        raise ValueError("Ciphertext length is not a multiple of the block size")
+    _, dk = _key_schedule(bytes(key))
+    words = struct.unpack(f">{len(data) // 4}I", data)
+    out = []
+    p0, p1, p2, p3 = struct.unpack(">4I", iv)
+    for i in range(0, len(words), 4):
+        c0, c1, c2, c3 = words[i:i + 4]
+        d0, d1, d2, d3 = _aes_decrypt_block(c0, c1, c2, c3, dk)
+        out += (d0 ^ p0, d1 ^ p1, d2 ^ p2, d3 ^ p3)
+        p0, p1, p2, p3 = c0, c1, c2, c3
+    return _pkcs7_unpad(struct.pack(f">{len(out)}I", *out))
 
 
 # --- Pure-Python RSA-2048 Key Generation ---
 
+def _small_primes(limit):
+    sieve = bytearray([1]) * limit
+    sieve[0] = sieve[1] = 0
+    for i in range(2, int(limit ** 0.5) + 1):
+        if sieve[i]:
+            sieve[i * i::i] = bytes(len(range(i * i, limit, i)))
+    return [i for i in range(3, limit) if sieve[i]]
+
+
+# Odd primes for trial division. Up to 2^13 removes ~88% of odd candidates
+# before the first modular exponentiation.
+_SMALL_PRIMES = _small_primes(1 << 13)
+
+# Miller-Rabin rounds for random 1024-bit candidates: FIPS 186-4 table C.2
+# (error <= 2^-100 for the primes of an RSA-2048 key)
+_MR_ROUNDS_1024 = 5
+
+# Candidates examined per sieve window (offsets from an odd random start)
+_SIEVE_WINDOW = 4096
+
+
 def _is_probable_prime(n, k=20):
     if n < 2: return False
     if n == 2 or n == 3: return True
@@ -201,8 +443,9 @@ def _is_probable_prime(n, k=20):
     r, d = 0, n - 1
     while d % 2 == 0:
         r += 1; d //= 2
-    for _ in range(k):
-        a = 2 + int.from_bytes(os.urandom(8), "big") % (n - 3)
+    for i in range(k):
+        # Base 2 first: cheapest witness, rejects almost every composite
+        a = 2 if i == 0 else 2 + int.from_bytes(os.urandom(8), "big") % (n - 3)
         x = pow(a, d, n)
         if x == 1 or x == n - 1: continue
         for _ in range(r - 1):
@@ -213,15 +456,43 @@ def _is_probable_prime(n, k=20):
     return True
 
 
-def _gen_prime(bits):
+def _gen_prime(bits, e=65537):
+    """Random prime of exactly bits bits with gcd(e, p - 1) == 1.
+
+    The top two bits are set so that the product of two such primes has
+    exactly 2*bits bits. Candidates are taken from a window of odd numbers
+    after a random start; members divisible by a small prime are struck
+    out first, the survivors go to Miller-Rabin in order.
+    """
+    rounds = _MR_ROUNDS_1024 if bits >= 1024 else 20
     while True:
-        p = int.from_bytes(os.urandom(bits // 8), "big")
-        p |= (1 << (bits - 1)) | 1
-        if _is_probable_prime(p):
-            return p
+        start = int.from_bytes(os.urandom(bits // 8), "big")
+        start |= (3 << (bits - 2)) | 1
+        # composite[k] -> start + 2k has a small factor
+        composite = bytearray(_SIEVE_WINDOW)
+        for sp in _SMALL_PRIMES:
+            # First k with start + 2k == 0 (mod sp); 2 is invertible mod sp
+            k = (-start * ((sp + 1) // 2)) % sp
+            composite[k::sp] = b"\x01" * len(range(k, _SIEVE_WINDOW, sp))
+        for k in range(_SIEVE_WINDOW):
+            if composite[k]:
+                continue
+            p = start + 2 * k
+            if p.bit_length() != bits:
+                break
+            if p % e == 1:
+                continue  # e must be invertible mod p - 1 (e is prime)
+            if _is_probable_prime(p, rounds):
+                return p
 
 
 def _modinv(a, m):
+    try:
+        return pow(a, -1, m)  # Python 3.8+
+    except ValueError:
+        raise ValueError("No modular inverse") from None
+    except TypeError:
+        pass  # older runtime without negative exponents
     g, x, _ = _extended_gcd(a, m)
     if g != 1:
         raise ValueError("No modular inverse")
@@ -229,21 +500,26 @@ def _modinv(a, m):
 
 
 def _extended_gcd(a, b):
-    if a == 0:
-        return b, 0, 1
-    g, x, y = _extended_gcd(b % a, a)
-    return g, y - (b // a) * x, x
+    """Iterative extended Euclid: (g, x, y) with a*x + b*y == g."""
+    x0, y0, x1, y1 = 1, 0, 0, 1
+    while b:
+        q, a, b = a // b, b, a % b
+        x0, x1 = x1, x0 - q * x1
+        y0, y1 = y1, y0 - q * y1
+    return a, x0, y0
 
 
 def _int_to_bytes(n, length):
     return n.to_bytes(length, "big")
 
 
-def generate_rsa_2048():
+def _py_generate_rsa_2048():
     """Generate RSA-2048 keypair, return (pub_der, priv_der) in DER format."""
     e = 65537
-    p = _gen_prime(1024)
-    q = _gen_prime(1024)
+    p = _gen_prime(1024, e)
+    q = _gen_prime(1024, e)
+    while q == p:
+        q = _gen_prime(1024, e)
     n = p * q
     phi = (p - 1) * (q - 1)
     d = _modinv(e, phi)
@@ -305,6 +581,203 @@ def generate_rsa_2048():
     return pub_der, priv_der
 
 
+# --- Crypto Backends ---
+# The pure-Python primitives above always work. When OpenSSL's libcrypto
+# is loadable via ctypes (every Debian host ships libcrypto.so.3), AES-CBC
+# and RSA keygen run natively instead. No pip dependency either way.
+
+class PythonCrypto:
+    name = "python"
+
+    def __init__(self):
+        self.aes_cbc_encrypt = _py_aes_cbc_encrypt
+        self.aes_cbc_decrypt = _py_aes_cbc_decrypt
+        self.generate_rsa_2048 = _py_generate_rsa_2048
+
+    def describe(self):
+        return {"name": self.name, "aes": "python", "rsa": "python"}
+
+
+class LibcryptoCrypto:
+    """AES-CBC and RSA keygen through OpenSSL's EVP API (via ctypes).
+
+    Raises OSError if libcrypto cannot be loaded or fails its self-test.
+    RSA keygen needs the OpenSSL 3 EVP_PKEY_CTX_set_rsa_keygen_bits()
+    function; without it, keygen falls back to the pure-Python code.
+    """
+    name = "libcrypto"
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+        self._ct = ctypes
+        path = ctypes.util.find_library("crypto") or "libcrypto.so.3"
+        lib = ctypes.CDLL(path)
+        vp, ip, cp = ctypes.c_void_p, ctypes.c_int, ctypes.c_char_p
+        try:
+            for fn, res, args in (
+                ("EVP_CIPHER_CTX_new", vp, []),
+                ("EVP_CIPHER_CTX_free", None, [vp]),
+                ("EVP_aes_128_cbc", vp, []),
+                ("EVP_aes_192_cbc", vp, []),
+                ("EVP_aes_256_cbc", vp, []),
+                ("EVP_CipherInit_ex", ip, [vp, vp, vp, cp, cp, ip]),
+                ("EVP_CipherUpdate", ip, [vp, cp, ctypes.POINTER(ip), cp, ip]),
+                ("EVP_CipherFinal_ex", ip, [vp, cp, ctypes.POINTER(ip)]),
+                ("OpenSSL_version", cp, [ip]),
+            ):
+                getattr(lib, fn).restype = res
+                getattr(lib, fn).argtypes = args
+        except AttributeError as e:
+            raise OSError(f"{path}: missing symbol ({e})") from e
+        self._lib = lib
+        self._ciphers = {16: lib.EVP_aes_128_cbc(), 24: lib.EVP_aes_192_cbc(),
+                         32: lib.EVP_aes_256_cbc()}
+        self.version = lib.OpenSSL_version(0).decode()
+        # Known-answer self-test (FIPS 197 C.3) before trusting the binding
+        key = bytes(range(32))
+        ct = self.aes_cbc_encrypt(bytes.fromhex("00112233445566778899aabbccddeeff"),
+                                  key, bytes(16))
+        if ct[:16].hex() != "8ea2b7ca516745bfeafc49904b496089":
+            raise OSError(f"{path}: AES self-test failed")
+        self.rsa_native = self._bind_rsa()
+        if not self.rsa_native:
+            self.generate_rsa_2048 = _py_generate_rsa_2048
+
+    def _bind_rsa(self):
+        ct, lib = self._ct, self._lib
+        vp, ip = ct.c_void_p, ct.c_int
+        try:
+            for fn, res, args in (
+                ("EVP_PKEY_CTX_new_id", vp, [ip, vp]),
+                ("EVP_PKEY_CTX_free", None, [vp]),
+                ("EVP_PKEY_keygen_init", ip, [vp]),
+                ("EVP_PKEY_CTX_set_rsa_keygen_bits", ip, [vp, ip]),
+                ("EVP_PKEY_keygen", ip, [vp, ct.POINTER(vp)]),
+                ("EVP_PKEY_free", None, [vp]),
+                ("i2d_PUBKEY", ip, [vp, ct.POINTER(vp)]),
+                ("EVP_PKEY2PKCS8", vp, [vp]),
+                ("i2d_PKCS8_PRIV_KEY_INFO", ip, [vp, ct.POINTER(vp)]),
+                ("PKCS8_PRIV_KEY_INFO_free", None, [vp]),
+            ):
+                getattr(lib, fn).restype = res
+                getattr(lib, fn).argtypes = args
+        except AttributeError:
+            return False
+        return True
+
+    def describe(self):
+        return {"name": self.name, "version": self.version, "aes": "libcrypto",
+                "rsa": "libcrypto" if self.rsa_native else "python"}
+
+    def _cbc(self, data, key, iv, encrypt):
+        ct, lib = self._ct, self._lib
+        cipher = self._ciphers.get(len(key))
+        if cipher is None or len(iv) != 16:
+            raise ValueError("Invalid AES key or IV length")
+        ctx = lib.EVP_CIPHER_CTX_new()
+        if not ctx:
+            raise MemoryError("EVP_CIPHER_CTX_new failed")
+        try:
+            out = ct.create_string_buffer(len(data) + 32)
+            n1, n2 = ct.c_int(0), ct.c_int(0)
+            if (lib.EVP_CipherInit_ex(ctx, cipher, None, bytes(key), bytes(iv), int(encrypt)) != 1
+                    or lib.EVP_CipherUpdate(ctx, out, ct.byref(n1), bytes(data), len(data)) != 1):
+                raise ValueError("EVP cipher operation failed")
+            final = ct.cast(ct.addressof(out) + n1.value, ct.c_char_p)
+            if lib.EVP_CipherFinal_ex(ctx, final, ct.byref(n2)) != 1:
+                # Decrypt: bad padding or truncated ciphertext
+                raise ValueError("Invalid PKCS7 padding")
+            return out.raw[:n1.value + n2.value]
+        finally:
+            lib.EVP_CIPHER_CTX_free(ctx)
+
+    def aes_cbc_encrypt(self, data: bytes, key: bytes, iv: bytes) -> bytes:
+        return self._cbc(data, key, iv, True)
+
+    def aes_cbc_decrypt(self, data: bytes, key: bytes, iv: bytes) -> bytes:
+        return self._cbc(data, key, iv, False)
+
+    def _i2d(self, fn, obj):
+        ct = self._ct
+        n = fn(obj, None)
+        if n <= 0:
+            raise RuntimeError("DER encoding failed")
+        buf = ct.create_string_buffer(n)
+        ptr = ct.c_void_p(ct.addressof(buf))
+        fn(obj, ct.byref(ptr))
+        return buf.raw[:n]
+
+    def generate_rsa_2048(self):
+        """Same output format as the pure-Python path: (SPKI DER, PKCS#8 DER)."""
+        ct, lib = self._ct, self._lib
+        ctx = lib.EVP_PKEY_CTX_new_id(6, None)  # EVP_PKEY_RSA
+        pkey = ct.c_void_p()
+        p8 = None
+        try:
+            if (not ctx or lib.EVP_PKEY_keygen_init(ctx) != 1
+                    or lib.EVP_PKEY_CTX_set_rsa_keygen_bits(ctx, 2048) <= 0
+                    or lib.EVP_PKEY_keygen(ctx, ct.byref(pkey)) != 1):
+                raise RuntimeError("libcrypto RSA key generation failed")
+            pub_der = self._i2d(lib.i2d_PUBKEY, pkey)
+            p8 = lib.EVP_PKEY2PKCS8(pkey)
+            if not p8:
+                raise RuntimeError("libcrypto PKCS#8 conversion failed")
+            priv_der = self._i2d(lib.i2d_PKCS8_PRIV_KEY_INFO, p8)
+            return pub_der, priv_der
+        finally:
+            if p8:
+                lib.PKCS8_PRIV_KEY_INFO_free(p8)
+            if pkey:
+                lib.EVP_PKEY_free(pkey)
+            if ctx:
+                lib.EVP_PKEY_CTX_free(ctx)
+
+
+CRYPTO_BACKENDS = ("auto", "libcrypto", "python")
+_crypto = None
+_crypto_choice = os.environ.get("VW_CRYPTO_BACKEND", "auto")
+
+
+def set_crypto_backend(choice: str):
+    """Select "auto" (libcrypto if usable), "libcrypto" or "python"."""
+    global _crypto, _crypto_choice
+    if choice not in CRYPTO_BACKENDS:
+        raise ValueError(f"Unknown crypto backend: {choice}")
+    _crypto, _crypto_choice = None, choice
+
+
+def crypto_backend():
+    """Return the active backend, probing libcrypto on first use."""
+    global _crypto
+    if _crypto is None:
+        if _crypto_choice in ("auto", "libcrypto"):
+            try:
+                _crypto = LibcryptoCrypto()
+            except OSError as e:
+                if _crypto_choice == "libcrypto":
+                    raise RuntimeError(f"libcrypto backend unavailable: {e}") from e
+                log.info(f"libcrypto unavailable ({e}), using pure Python")
+        if _crypto is None:
+            _crypto = PythonCrypto()
+        log.debug(f"crypto backend: {_crypto.describe()}")
+    return _crypto
+
+
+def aes_cbc_encrypt(data: bytes, key: bytes, iv: bytes) -> bytes:
+    return crypto_backend().aes_cbc_encrypt(data, key, iv)
+
+
+def aes_cbc_decrypt(data: bytes, key: bytes, iv: bytes) -> bytes:
+    return crypto_backend().aes_cbc_decrypt(data, key, iv)
+
+
+@METRICS.timed("rsa_keygen")
+def generate_rsa_2048():
+    """Generate RSA-2048 keypair, return (pub_der, priv_der) in DER format."""
+    return crypto_backend().generate_rsa_2048()
+
+
 # --- Bitwarden Crypto Protocol ---
 
 SERVICE_EMAIL = "loco-automation@localhost"
@@ -326,6 +799,7 @@ def hkdf_expand(key: bytes, info: bytes, length: int) -> bytes:
     return okm[:length]
 
 
+@METRICS.timed("kdf")
 def make_master_key(password: str, email: str, kdf=0, iterations=KDF_ITERATIONS,
                     memory=None, parallelism=None) -> bytes:
     if kdf == 1 and memory and parallelism:
@@ -415,10 +889,387 @@ def encrypt_string(text: str, sym_key: bytes) -> str:
     return encrypt_aes_cbc(text.encode(), enc_key, mac_key)
 
 
+# --- Bulk Decryption ---
+# Decrypting every name of a large vault is CPU-bound (pure-Python AES), so
+# it can be spread over worker processes. Each worker receives the key once
+# (pool initializer) and then batches of cipher strings.
+
+PARALLEL_MIN_ITEMS = 512  # below this, pool start-up costs more than it saves
+
+_worker_key = None
+
+
+def _init_decrypt_worker(sym_key):
+    global _worker_key
+    _worker_key = sym_key
+
+
+def _decrypt_batch(cipher_strings, sym_key=None):
+    """Decrypt cipher strings to text; None for empty or undecryptable."""
+    key = sym_key or _worker_key
+    out = []
+    for cs in cipher_strings:
+        try:
+            out.append(decrypt_aes_cbc(cs, key[:32], key[32:]).decode() if cs else None)
+        except Exception:
+            out.append(None)
+    return out
+
+
+def _reencrypt_batch(cipher_strings, keys=None):
+    """Decrypt with the old key and encrypt again with the new one.
+
+    Unlike _decrypt_batch, an undecryptable string raises: a rotation must
+    not turn it into something no key can read.
+    """
+    old, new = keys or _worker_key
+    return [encrypt_aes_cbc(decrypt_aes_cbc(cs, old[:32], old[32:]), new[:32], new[32:])
+            for cs in cipher_strings]
+
+
+def _map_batches(batch_fn, items, key, workers):
+    """batch_fn(items, key) over all items, preserving order.
+
+    workers: 1 = in-process, N > 1 = N worker processes, 0 = auto (all
+    cores, but only for at least PARALLEL_MIN_ITEMS items).
+    """
+    items = list(items)
+    if workers == 0:
+        workers = (os.cpu_count() or 1) if len(items) >= PARALLEL_MIN_ITEMS else 1
+    if workers <= 1 or len(items) < 2:
+        return batch_fn(items, key)
+    import concurrent.futures
+    import multiprocessing
+    # A few batches per worker keeps them busy without per-item overhead
+    size = max(1, -(-len(items) // (workers * 4)))
+    batches = [items[i:i + size] for i in range(0, len(items), size)]
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("fork"),
+        initializer=_init_decrypt_worker, initargs=(key,),
+    ) as pool:
+        return [out for batch in pool.map(batch_fn, batches) for out in batch]
+
+
+@METRICS.timed("decrypt")
+def decrypt_strings(cipher_strings, sym_key, workers=0):
+    """Decrypt many cipher strings, preserving order (workers: see _map_batches)."""
+    return _map_batches(_decrypt_batch, cipher_strings, sym_key, workers)
+
+
+@METRICS.timed("reencrypt")
+def reencrypt_strings(cipher_strings, old_key, new_key, workers=0):
+    """Move many cipher strings from old_key to new_key, preserving order."""
+    return _map_batches(_reencrypt_batch, cipher_strings, (old_key, new_key), workers)
+
+
+# --- Encrypted Local State ---
+# Small JSON documents kept between runs (session tokens, indexes). Always
+# encrypted as a Bitwarden cipher string, written 0600 and guarded by an
+# flock so that concurrent Ansible forks do not clobber each other.
+
+CACHE_DIR = os.environ.get(
+    "VW_CREDENTIALS_CACHE_DIR", os.path.expanduser("~/.cache/lococloud")
+)
+# Local cap on refresh-token reuse; Vaultwarden itself does not report one.
+REFRESH_TOKEN_MAX_AGE = 30 * 24 * 3600
+
+
+def derive_state_keys(secret: bytes, purpose: bytes):
+    """Derive an (enc_key, mac_key) pair for local state from a secret."""
+    return stretch_key(hmac.new(purpose, secret, hashlib.sha256).digest())
+
+
+class EncryptedStateFile:
+    def __init__(self, path: str, enc_key: bytes, mac_key: bytes, lock_path=None):
+        self.path = path
+        self.enc_key = enc_key
+        self.mac_key = mac_key
+        self.lock_path = lock_path or path + ".lock"
+
+    @contextlib.contextmanager
+    def locked(self):
+        """Hold an exclusive lock on the state file (sidecar .lock file)."""
+        os.makedirs(os.path.dirname(self.lock_path), mode=0o700, exist_ok=True)
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield self
+        finally:
+            os.close(fd)
+
+    def load(self):
+        """Return the stored document, or None if missing or unreadable."""
+        try:
+            with open(self.path) as f:
+                raw = decrypt_aes_cbc(f.read().strip(), self.enc_key, self.mac_key)
+            return json.loads(raw)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, data):
+        os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+        blob = encrypt_aes_cbc(json.dumps(data).encode(), self.enc_key, self.mac_key)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(blob)
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+# --- HTTP Transport ---
+
+CONNECT_TIMEOUT = 10  # seconds to establish TCP (+ TLS)
+READ_TIMEOUT = 60     # seconds to wait for a response once connected
+HTTP_RETRIES = 4      # extra attempts on connection errors, 429 and 5xx
+RETRY_BACKOFF = 0.5   # first backoff ceiling in seconds, doubled per attempt
+RETRY_BACKOFF_MAX = 8.0
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Statuses that mean the server did not process the request: safe to
+# repeat even for a POST
+RETRY_STATUSES_ANY_METHOD = (429, 503)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "PUT", "DELETE", "OPTIONS")
+
+
+def configure_http(connect_timeout=None, read_timeout=None, retries=None):
+    """Set the defaults for transports created afterwards (CLI options)."""
+    global CONNECT_TIMEOUT, READ_TIMEOUT, HTTP_RETRIES
+    if connect_timeout is not None:
+        CONNECT_TIMEOUT = connect_timeout
+    if read_timeout is not None:
+        READ_TIMEOUT = read_timeout
+    if retries is not None:
+        HTTP_RETRIES = retries
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Seconds to wait before retry number attempt (1-based): full jitter.
+
+    A numeric Retry-After from the server wins, capped at RETRY_BACKOFF_MAX.
+    """
+    if retry_after:
+        try:
+            return min(max(float(retry_after), 0.0), RETRY_BACKOFF_MAX)
+        except ValueError:
+            pass  # HTTP-date form: ignore
+    return random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF * 2 ** (attempt - 1)))
+
+
+class _ConnectFailed(Exception):
+    """The connection could not be opened; nothing was sent."""
+
+
+class HTTPTransport:
+    """Keep-alive HTTP(S) connections with a minimal cookie jar.
+
+    One persistent http.client connection per (scheme, host, port), shared
+    by admin and API calls, so a store cycle pays one TCP/TLS handshake
+    instead of one per request. Redirects are not followed: the admin
+    login's VW_ADMIN cookie arrives on a 303, which is exactly what we
+    need to see. Responses may be gzip-encoded.
+    """
+
+    # Errors meaning a reused keep-alive connection was closed by the server
+    # before it read our request; safe to retry once on a fresh connection.
+    _STALE = (http.client.RemoteDisconnected, http.client.CannotSendRequest,
+              ConnectionResetError, BrokenPipeError)
+
+    def __init__(self, connect_timeout=None, read_timeout=None, retries=None):
+        self.connect_timeout = CONNECT_TIMEOUT if connect_timeout is None else connect_timeout
+        self.read_timeout = READ_TIMEOUT if read_timeout is None else read_timeout
+        self.retries = HTTP_RETRIES if retries is None else retries
+        self._conns = {}
+        self.cookies = {}  # (host, name) -> (path, value)
+
+    def _connection(self, scheme, host, port):
+        key = (scheme, host, port)
+        conn = self._conns.get(key)
+        if conn is not None:
+            return conn, True
+        if scheme == "https":
+            import ssl
+            conn = http.client.HTTPSConnection(
+                host, port, timeout=self.connect_timeout,
+                context=ssl.create_default_context(),
+            )
+        else:
+            conn = http.client.HTTPConnection(host, port, timeout=self.connect_timeout)
+        try:
+            conn.connect()
+        except OSError as e:
+            raise _ConnectFailed(e) from e
+        conn.sock.settimeout(self.read_timeout)
+        # Small request/response pairs on a kept-alive connection: do not let
+        # Nagle hold a segment back waiting for the peer's delayed ACK
+        conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        METRICS.count("connections")
+        self._conns[key] = conn
+        return conn, False
+
+    def _drop(self, key):
+        conn = self._conns.pop(key, None)
+        if conn is not None:
+            conn.close()
+
+    def close(self):
+        for key in list(self._conns):
+            self._drop(key)
+
+    def request(self, method, url, body=None, headers=None, retries=None):
+        """Send a request; return (status, headers, body bytes).
+
+        Connection errors, 429 and 5xx are retried up to `retries` times
+        (default: self.retries) with exponential backoff and full jitter.
+        A request that may have reached the server is only repeated if its
+        method is idempotent; any method is repeated when the connection
+        could not be opened or the answer was 429/503. After the last
+        attempt the error is raised or the response returned as usual.
+        """
+        retries = self.retries if retries is None else retries
+        idempotent = method in IDEMPOTENT_METHODS
+        for attempt in range(1, retries + 2):
+            retry_after = None
+            try:
+                status, resp_headers, data = self._request(method, url, body, headers)
+            except _ConnectFailed as e:
+                if attempt > retries:
+                    raise e.__cause__
+                reason = str(e.__cause__)
+            except (OSError, http.client.HTTPException) as e:
+                if not idempotent or attempt > retries:
+                    raise
+                reason = str(e) or type(e).__name__
+            else:
+                if (attempt > retries or status not in RETRY_STATUSES
+                        or not (idempotent or status in RETRY_STATUSES_ANY_METHOD)):
+                    return status, resp_headers, data
+                reason = f"HTTP {status}"
+                retry_after = resp_headers.get("Retry-After")
+            delay = backoff_delay(attempt, retry_after)
+            METRICS.count("retries")
+            log.info(f"{method} {urllib.parse.urlsplit(url).path}: {reason}; "
+                     f"retry {attempt}/{retries} in {delay:.2f}s")
+            time.sleep(delay)
+
+    def _request(self, method, url, body, headers):
+        parsed = urllib.parse.urlsplit(url)
+        key = (parsed.scheme, parsed.hostname, parsed.port)
+        target = parsed.path or "/"
+        if parsed.query:
+            target += "?" + parsed.query
+        hdrs = {"Accept-Encoding": "gzip", "Connection": "keep-alive"}
+        hdrs.update(headers or {})
+        cookie = self._cookie_header(parsed.hostname, target)
+        if cookie:
+            hdrs["Cookie"] = cookie
+        for attempt in (1, 2):
+            conn, reused = self._connection(*key)
+            try:
+                conn.request(method, target, body=body, headers=hdrs)
+                resp = conn.getresponse()
+                data = resp.read()
+                break
+            except self._STALE:
+                self._drop(key)
+                if not reused or attempt == 2:
+                    raise
+            except Exception:
+                self._drop(key)
+                raise
+        METRICS.http_request(len(body or b""), len(data), resp.status)
+        if resp.will_close:
+            self._drop(key)
+        if resp.getheader("Content-Encoding", "").lower() == "gzip":
+            data = gzip.decompress(data)
+        for set_cookie in resp.headers.get_all("Set-Cookie") or []:
+            self._store_cookie(parsed.hostname, set_cookie)
+        return resp.status, resp.headers, data
+
+    def _store_cookie(self, host, set_cookie):
+        parts = [p.strip() for p in set_cookie.split(";")]
+        name, _, value = parts[0].partition("=")
+        path = "/"
+        for attr in parts[1:]:
+            if attr.lower().startswith("path="):
+                path = attr[5:] or "/"
+        self.cookies[(host, name)] = (path, value)
+
+    def _cookie_header(self, host, target):
+        return "; ".join(
+            f"{name}={value}" for (h, name), (path, value) in self.cookies.items()
+            if h == host and target.startswith(path)
+        )
+
+    def cookie(self, url, name):
+        entry = self.cookies.get((urllib.parse.urlsplit(url).hostname, name))
+        return entry[1] if entry else None
+
+
+@METRICS.timed("wait_ready")
+def wait_ready(url, timeout, transport=None):
+    """Poll GET {url}/alive until Vaultwarden answers 200; return seconds waited.
+
+    Right after a container (re)start the port may accept connections
+    before the API works, so this checks the HTTP answer, not the port.
+    Raises RuntimeError once timeout seconds have passed.
+    """
+    transport = transport or HTTPTransport()
+    alive = f"{url.rstrip('/')}/alive"
+    t0 = time.monotonic()
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            status, _, _ = transport.request("GET", alive, retries=0)
+            if status == 200:
+                waited = time.monotonic() - t0
+                if attempt > 1:
+                    log.info(f"Vaultwarden ready after {waited:.1f}s")
+                return waited
+            last = f"HTTP {status}"
+        except (OSError, http.client.HTTPException) as e:
+            last = str(e) or type(e).__name__
+        remaining = timeout - (time.monotonic() - t0)
+        if remaining <= 0:
+            raise RuntimeError(f"Vaultwarden at {url} not ready after {timeout:g}s: {last}")
+        log.debug(f"waiting for {alive}: {last}")
+        time.sleep(min(backoff_delay(attempt) + 0.1, 2.0, remaining))
+
+
 # --- Vaultwarden Client ---
 
+class VaultwardenHTTPError(RuntimeError):
+    """Non-2xx response. Subclasses RuntimeError so callers that match on
+    the message keep working; `status` allows matching on the code."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def is_auth_failure(error):
+    """True if a token request was rejected because of the credentials.
+
+    "SSO sign-in is required" is not an auth failure: the password is fine,
+    the server refuses password logins. Deleting the user would not help;
+    preflight.yml handles it by toggling SSO_ONLY.
+    """
+    return (isinstance(error, VaultwardenHTTPError)
+            and error.status in (400, 401)
+            and "sso sign-in is required" not in str(error).lower())
+
+
+# Layout of the cached vault document; older cache files are re-synced
+VAULT_FORMAT = 2
+
+
 class VaultwardenClient:
-    def __init__(self, url: str, admin_token: str):
+    def __init__(self, url: str, admin_token: str, cache_dir=CACHE_DIR):
         self.url = url.rstrip("/")
         self.admin_token = admin_token
         self.service_password = hashlib.sha256(
@@ -427,6 +1278,31 @@ class VaultwardenClient:
         self.access_token = None
         self.sym_key = None
         self.admin_cookie = None
+        self.transport = HTTPTransport()
+        self._admin_users = None
+        self._vault = None
+        self._vault_state = None
+        self._vault_depth = 0
+        self._vault_dirty = False
+        self._credentials = {}  # cipher id -> (revisionDate, decrypted fields)
+        self.workers = 0  # bulk decryption processes, see decrypt_strings()
+        self.cache_dir = cache_dir
+        # State file names: fingerprint of (url, admin token)
+        self.fingerprint = hashlib.sha256(
+            f"{self.url}\n{admin_token}".encode()
+        ).hexdigest()[:16]
+        self.session = None
+        if cache_dir:
+            # Session content key: derived from the admin token alone
+            enc_key, mac_key = derive_state_keys(
+                admin_token.encode(), b"loco-session-cache"
+            )
+            self.session = EncryptedStateFile(
+                self._state_path("session"), enc_key, mac_key
+            )
+
+    def _state_path(self, kind):
+        return os.path.join(self.cache_dir, f"vw-{kind}-{self.fingerprint}.json")
 
     def _http(self, method, path, data=None, headers=None, form=False):
         url = f"{self.url}/{path.lstrip('/')}"
@@ -439,120 +1315,91 @@ class VaultwardenClient:
             else:
                 body = json.dumps(data).encode()
                 hdrs.setdefault("Content-Type", "application/json")
-        req = urllib.request.Request(url, data=body, headers=hdrs, method=method)
+        status, _, raw = self.transport.request(method, url, body, hdrs)
+        content = raw.decode(errors="replace")
+        if status >= 400:
+            raise VaultwardenHTTPError(status, f"HTTP {status} {method} {url}: {content}")
+        if not content or not content.strip():
+            return None
         try:
-            resp = urllib.request.urlopen(req)
-            content = resp.read().decode()
-            if not content or not content.strip():
-                return None
-            try:
-                return json.loads(content)
-            except (json.JSONDecodeError, ValueError):
-                return None
-        except urllib.error.HTTPError as e:
-            content = e.read().decode() if e.fp else ""
-            raise RuntimeError(f"HTTP {e.code} {method} {url}: {content}") from e
+            return json.loads(content)
+        except (json.JSONDecodeError, ValueError):
+            return None
 
+    @METRICS.timed("admin_login")
     def admin_login(self):
-        """Login to admin panel. Uses http.client to capture Set-Cookie
-        from 302/303 redirects (urllib follows redirects and loses cookies)."""
-        parsed = urllib.parse.urlparse(self.url)
-        if parsed.scheme == "https":
-            import ssl
-            conn = http.client.HTTPSConnection(
-                parsed.hostname, parsed.port,
-                context=ssl._create_unverified_context(),
-            )
-        else:
-            conn = http.client.HTTPConnection(parsed.hostname, parsed.port)
-        body = urllib.parse.urlencode({"token": self.admin_token})
-        conn.request(
-            "POST", "/admin", body=body,
-            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        """Login to admin panel. The VW_ADMIN cookie is set on the 303
+        redirect, which the transport does not follow; its cookie jar then
+        sends the cookie with every /admin request."""
+        status, _, _ = self.transport.request(
+            "POST", f"{self.url}/admin",
+            urllib.parse.urlencode({"token": self.admin_token}).encode(),
+            {"Content-Type": "application/x-www-form-urlencoded"},
         )
-        resp = conn.getresponse()
-        resp.read()  # consume body
-        for val in resp.getheader("Set-Cookie", "").split(","):
-            if "VW_ADMIN" in val:
-                self.admin_cookie = val.split(";")[0].strip()
-                break
-        conn.close()
+        value = self.transport.cookie(self.url, "VW_ADMIN")
+        self.admin_cookie = f"VW_ADMIN={value}" if value else None
         if not self.admin_cookie:
             raise RuntimeError(
-                f"Admin login failed (HTTP {resp.status}): no VW_ADMIN cookie. "
+                f"Admin login failed (HTTP {status}): no VW_ADMIN cookie. "
                 "Check admin token."
             )
 
     def admin_request(self, method, path, data=None):
         if not self.admin_cookie:
             self.admin_login()
-        url = f"{self.url}/admin/{path.lstrip('/')}"
-        hdrs = {"Cookie": self.admin_cookie}
-        body = None
-        if data is not None:
-            body = json.dumps(data).encode()
-            hdrs["Content-Type"] = "application/json"
-        req = urllib.request.Request(url, data=body, headers=hdrs, method=method)
         try:
-            resp = urllib.request.urlopen(req)
-            content = resp.read().decode()
-            if not content or not content.strip():
-                return None
-            try:
-                return json.loads(content)
-            except (json.JSONDecodeError, ValueError):
+            return self._http(method, f"/admin/{path.lstrip('/')}", data)
+        except VaultwardenHTTPError as e:
+            if e.status == 409:
                 return None
-        except urllib.error.HTTPError as e:
-            content = e.read().decode() if e.fp else ""
-            if e.code == 409:
-                return None
-            raise RuntimeError(f"HTTP {e.code} admin {method} {path}: {content}") from e
+            raise
 
-    def check_user_exists(self, email):
-        """Check if a user already exists via admin JSON API.
+    def find_user(self, email):
+        """Return the admin API record for a user (by email), or None.
 
         Uses GET /admin/users (returns JSON), NOT /admin/users/overview
-        (which returns HTML and cannot be parsed as JSON).
+        (which returns HTML and cannot be parsed as JSON). The list is
+        fetched at most once per client and shared by check_user_exists()
+        and delete_user(); it grows with every account on the server.
         """
-        try:
+        if self._admin_users is None:
             users = self.admin_request("GET", "users")
-            if isinstance(users, list):
-                for user in users:
-                    user_email = user.get("Email", user.get("email", ""))
-                    if user_email.lower() == email.lower():
-                        return True
+            if not isinstance(users, list):
+                log.debug(f"/admin/users returned non-list: {str(users)[:200]}")
+                return None
+            self._admin_users = users
+        for user in self._admin_users:
+            user_email = user.get("Email", user.get("email", ""))
+            if user_email.lower() == email.lower():
+                return user
+        return None
+
+    def check_user_exists(self, email):
+        """Check if a user already exists via admin JSON API."""
+        try:
+            return self.find_user(email) is not None
         except Exception:
-            pass
-        return False
+            return False
 
     def delete_user(self, email):
-        """Delete a user via admin API (by email).
-
-        Uses GET /admin/users (JSON), NOT /admin/users/overview (HTML).
-        """
+        """Delete a user via admin API (by email)."""
         try:
-            users = self.admin_request("GET", "users")
-            print(f"DEBUG: users type={type(users).__name__}, "
-                  f"is_list={isinstance(users, list)}", file=sys.stderr)
-            if isinstance(users, list):
-                for user in users:
-                    user_email = user.get("Email", user.get("email", ""))
-                    user_id = user.get("Id", user.get("id", ""))
-                    if user_email.lower() == email.lower() and user_id:
-                        print(f"DEBUG: Deleting user {user_email} id={user_id}",
-                              file=sys.stderr)
-                        try:
-                            self.admin_request("POST", f"users/{user_id}/delete")
-                            print("DEBUG: POST /delete succeeded", file=sys.stderr)
-                            return True
-                        except RuntimeError as e:
-                            print(f"DEBUG: delete failed: {e}", file=sys.stderr)
-                            return False
-            else:
-                print(f"DEBUG: /admin/users returned non-list: {str(users)[:200]}",
-                      file=sys.stderr)
+            user = self.find_user(email)
+            user_id = user.get("Id", user.get("id", "")) if user else ""
+            if not user_id:
+                log.debug(f"delete_user: {email} not found")
+                return False
+            log.debug(f"Deleting user {email} id={user_id}")
+            try:
+                self.admin_request("POST", f"users/{user_id}/delete")
+                log.debug("POST /delete succeeded")
+                self._admin_users = None
+                return True
+            except RuntimeError as e:
+                log.warning(f"delete failed: {e}")
+                return False
         except Exception as e:
-            print(f"DEBUG: delete_user exception: {e}", file=sys.stderr)
+            log.warning(f"delete_user exception: {e}")
         return False
 
     def _try_register(self, reg_data):
@@ -569,24 +1416,27 @@ class VaultwardenClient:
         we always try ALL endpoints.
         """
         last_error = None
+        errors = []
 
         # 1) /identity/accounts/register (Vaultwarden 1.27-1.33)
         try:
             self._http("POST", "/identity/accounts/register", reg_data)
-            print("DEBUG: register via /identity/accounts/register OK", file=sys.stderr)
+            log.debug("register via /identity/accounts/register OK")
             return True
         except RuntimeError as e:
-            print(f"DEBUG: /identity/accounts/register: {e}", file=sys.stderr)
+            log.debug(f"/identity/accounts/register: {e}")
             last_error = e
+            errors.append(e)
 
         # 2) /api/accounts/register (legacy path, older Vaultwarden)
         try:
             self._http("POST", "/api/accounts/register", reg_data)
-            print("DEBUG: register via /api/accounts/register OK", file=sys.stderr)
+            log.debug("register via /api/accounts/register OK")
             return True
         except RuntimeError as e:
-            print(f"DEBUG: /api/accounts/register: {e}", file=sys.stderr)
+            log.debug(f"/api/accounts/register: {e}")
             last_error = e
+            errors.append(e)
 
         # 3) New flow: send-verification-email + finish (Vaultwarden 1.34+)
         # When mail is disabled, send-verification-email returns the token
@@ -603,27 +1453,30 @@ class VaultwardenClient:
                 email_token = resp.get("token", resp.get("Token", ""))
             elif isinstance(resp, str) and resp:
                 email_token = resp
-            print(f"DEBUG: send-verification-email OK, token={'set' if email_token else 'empty'}",
-                  file=sys.stderr)
+            log.debug(f"send-verification-email OK, token={'set' if email_token else 'empty'}")
         except RuntimeError as e:
-            print(f"DEBUG: send-verification-email: {e}", file=sys.stderr)
+            log.debug(f"send-verification-email: {e}")
             # Continue — try finish anyway
 
         reg_data_finish = dict(reg_data)
         reg_data_finish["emailVerificationToken"] = email_token
         try:
             self._http("POST", "/identity/accounts/register/finish", reg_data_finish)
-            print("DEBUG: register/finish OK", file=sys.stderr)
+            log.debug("register/finish OK")
             return True
         except RuntimeError as e:
-            print(f"DEBUG: register/finish: {e}", file=sys.stderr)
+            log.debug(f"register/finish: {e}")
             last_error = e
+            errors.append(e)
 
         # All registration endpoints failed.
         # Do NOT treat "Registration not allowed or user already exists" as
         # success — the error message is deliberately ambiguous and usually
         # means signups are disabled, not that the user actually exists.
         # The caller (ensure_service_user) verifies user existence separately.
+        # All endpoint errors go to stderr: store.yml looks for "Registration
+        # not allowed" there, which need not be in the last one.
+        log.warning("registration failed: " + " | ".join(str(e) for e in errors))
         raise last_error or RuntimeError("All registration endpoints failed")
 
     def _register_service_user(self):
@@ -642,6 +1495,7 @@ class VaultwardenClient:
         If a stale user exists from a previous failed invite/register
         attempt, we detect it via the admin API and delete it first.
         """
+        self._drop_session()  # any cached session belongs to the old user
         master_key = make_master_key(self.service_password, SERVICE_EMAIL)
         master_hash = make_master_password_hash(self.service_password, master_key)
         sym_key_raw, sym_key_encrypted = make_sym_key(master_key)
@@ -658,8 +1512,7 @@ class VaultwardenClient:
             "kdfParallelism": None,
             "keys": {"publicKey": pub_key, "encryptedPrivateKey": priv_key_encrypted},
         }
-        print(f"DEBUG: registering with kdf=0 iterations={KDF_ITERATIONS}",
-              file=sys.stderr)
+        log.debug(f"registering with kdf=0 iterations={KDF_ITERATIONS}")
 
         try:
             self._try_register(reg_data)
@@ -669,53 +1522,60 @@ class VaultwardenClient:
             if "already exists" not in error_msg:
                 raise
             # User exists from a previous failed attempt — delete and retry
-            print("DEBUG: user may exist from previous attempt, deleting",
-                  file=sys.stderr)
+            log.debug("user may exist from previous attempt, deleting")
             deleted = self.delete_user(SERVICE_EMAIL)
             if not deleted:
                 raise RuntimeError(
                     f"Registration failed (user exists) and could not "
                     f"delete stale user. Original error: {e}"
                 )
-            print("DEBUG: stale user deleted, retrying registration",
-                  file=sys.stderr)
+            log.debug("stale user deleted, retrying registration")
             self._try_register(reg_data)
 
     def ensure_service_user(self):
+        """Make sure the service user exists and we are logged in as it.
+
+        Login first: in steady state the (cached) login simply works and
+        the admin panel is never touched. Only an authentication failure
+        (user missing, or admin token changed since registration) falls
+        through to the admin API to delete and re-register the user.
+        """
+        try:
+            self.login()
+            log.debug("service user login OK")
+            return
+        except VaultwardenHTTPError as e:
+            if not is_auth_failure(e):
+                raise
+            login_error = e
+            log.info(f"service user login FAILED: {e}")
+
+        self._drop_session()
         self.admin_login()
-        print(f"DEBUG: admin_login OK, cookie={'set' if self.admin_cookie else 'MISSING'}",
-              file=sys.stderr)
+        log.debug(f"admin_login OK, cookie={'set' if self.admin_cookie else 'MISSING'}")
 
         user_exists = self.check_user_exists(SERVICE_EMAIL)
-        print(f"DEBUG: user_exists={user_exists}", file=sys.stderr)
+        log.debug(f"user_exists={user_exists}")
 
         if user_exists:
-            # User exists — verify we can log in. If password doesn't match
-            # (e.g. admin token changed since last run), delete and recreate.
-            try:
-                self.login()
-                print("DEBUG: existing user login OK", file=sys.stderr)
-                return  # login works, nothing to do
-            except RuntimeError as e:
-                print(f"DEBUG: existing user login FAILED: {e}", file=sys.stderr)
-                deleted = self.delete_user(SERVICE_EMAIL)
-                print(f"DEBUG: delete_user result={deleted}", file=sys.stderr)
-                self.access_token = None
-                self.sym_key = None
-                if not deleted:
-                    raise RuntimeError(
-                        f"Cannot log in as service user and cannot delete it either. "
-                        f"Login error: {e}"
-                    )
+            # User exists but its password no longer matches (e.g. admin
+            # token changed since last run) — delete and recreate.
+            deleted = self.delete_user(SERVICE_EMAIL)
+            log.debug(f"delete_user result={deleted}")
+            if not deleted:
+                raise RuntimeError(
+                    f"Cannot log in as service user and cannot delete it either. "
+                    f"Login error: {login_error}"
+                )
 
-        print("DEBUG: calling _register_service_user", file=sys.stderr)
+        log.info("registering service user")
         self._register_service_user()
 
         # Verify the freshly created user can log in
-        print("DEBUG: verifying login after registration", file=sys.stderr)
+        log.debug("verifying login after registration")
         try:
             self.login()
-            print("DEBUG: post-registration login OK", file=sys.stderr)
+            log.info("post-registration login OK")
         except RuntimeError as e:
             # Get prelogin info for diagnostics
             try:
@@ -727,39 +1587,143 @@ class VaultwardenClient:
                 f"prelogin={kdf_info}, error={e}"
             )
 
+    def ensure_login(self):
+        """Log in as the service user without any recovery.
+
+        For callers that only read: a rejected login raises instead of
+        deleting and re-registering the user as ensure_service_user() does,
+        which would cost the very vault they came to read.
+        """
+        try:
+            self._check_login()
+        except VaultwardenHTTPError as e:
+            if not is_auth_failure(e):
+                raise
+            raise VaultwardenHTTPError(
+                e.status, f"Service user login rejected, not re-registering it for a "
+                          f"read (admin token changed? see --action rotate): {e}"
+            ) from e
+
+    def status(self):
+        """Read-only facts about the service user and the server settings.
+
+        Never registers, deletes or writes anything on the server: prelogin
+        for the KDF parameters, a (cached) login checked with one revision
+        request, and the admin diagnostics config for SIGNUPS_ALLOWED and
+        SSO_ONLY. needs_recovery tells whether ensure_service_user() would
+        need those settings toggled; unknown settings count as blocking,
+        a rejected admin token does not (toggling cannot fix that).
+        """
+        kdf = self.prelogin(SERVICE_EMAIL)
+        facts = {
+            "url": self.url,
+            "service_user": None,
+            "login_ok": False,
+            "login_error": None,
+            "kdf": {
+                "type": kdf.get("kdf", kdf.get("Kdf", 0)),
+                "iterations": kdf.get("kdfIterations", kdf.get("KdfIterations")),
+                "memory": kdf.get("kdfMemory", kdf.get("KdfMemory")),
+                "parallelism": kdf.get("kdfParallelism", kdf.get("KdfParallelism")),
+            },
+            "signups_allowed": None,
+            "sso_only": None,
+            "admin_error": None,
+        }
+        try:
+            self._check_login()
+            facts["login_ok"] = facts["service_user"] = True
+        except RuntimeError as e:
+            facts["login_error"] = str(e)
+        try:
+            self.admin_login()
+        except RuntimeError as e:
+            facts["admin_error"] = str(e)
+        else:
+            try:
+                config = self.admin_request("GET", "diagnostics/config")
+            except RuntimeError as e:
+                log.info(f"diagnostics config unavailable: {e}")
+                config = None
+            if isinstance(config, dict):
+                facts["signups_allowed"] = config.get("signups_allowed")
+                # Builds without SSO support have no sso_only setting at all
+                facts["sso_only"] = bool(config.get("sso_only", False))
+            if not facts["login_ok"]:
+                facts["service_user"] = self.check_user_exists(SERVICE_EMAIL)
+        facts["needs_recovery"] = (
+            not facts["login_ok"] and facts["admin_error"] is None
+            and (facts["sso_only"] is not False or facts["signups_allowed"] is not True)
+        )
+        return facts
+
+    def _check_login(self):
+        """Log in and prove the token with one request; retry a stale cache once."""
+        for attempt in (1, 2):
+            self.login()
+            try:
+                self._http("GET", "/api/accounts/revision-date",
+                           headers={"Authorization": f"Bearer {self.access_token}"})
+                return
+            except VaultwardenHTTPError as e:
+                if e.status != 401 or attempt == 2:
+                    raise
+                self._drop_session()
+
+    @METRICS.timed("prelogin")
     def prelogin(self, email):
         """Query server for KDF parameters before login."""
         try:
             resp = self._http("POST", "/api/accounts/prelogin", {"email": email})
             if resp:
-                print(f"DEBUG: prelogin /api response: {resp}", file=sys.stderr)
+                log.debug(f"prelogin /api response: {resp}")
                 return resp
         except RuntimeError as e:
-            print(f"DEBUG: prelogin /api failed: {e}", file=sys.stderr)
+            log.debug(f"prelogin /api failed: {e}")
         try:
             resp = self._http("POST", "/identity/accounts/prelogin", {"email": email})
             if resp:
-                print(f"DEBUG: prelogin /identity response: {resp}", file=sys.stderr)
+                log.debug(f"prelogin /identity response: {resp}")
                 return resp
         except RuntimeError as e:
-            print(f"DEBUG: prelogin /identity failed: {e}", file=sys.stderr)
-        print(f"DEBUG: prelogin fallback to defaults kdf=0 iter={KDF_ITERATIONS}",
-              file=sys.stderr)
+            log.debug(f"prelogin /identity failed: {e}")
+        log.debug(f"prelogin fallback to defaults kdf=0 iter={KDF_ITERATIONS}")
         return {"kdf": 0, "kdfIterations": KDF_ITERATIONS}
 
     def login(self):
+        """Log in as the service user.
+
+        Reuses the cached session when possible: a still-valid access token
+        costs nothing, an expired one is renewed with the refresh_token
+        grant. Only when both fail does the password login (prelogin +
+        full KDF) run. The cache lock is held throughout, so concurrent
+        forks wait for one login instead of each running the KDF.
+        """
+        lock = self.session.locked() if self.session else contextlib.nullcontext()
+        with lock:
+            if self._resume_session():
+                return
+            resp = self._password_login()
+            self._save_session(resp)
+
+    def _kdf_params(self):
+        """The service user's KDF parameters as make_master_key() takes them."""
         kdf_info = self.prelogin(SERVICE_EMAIL)
-        kdf_type = kdf_info.get("kdf", kdf_info.get("Kdf", 0))
-        kdf_iter = kdf_info.get("kdfIterations", kdf_info.get("KdfIterations", KDF_ITERATIONS))
-        kdf_mem = kdf_info.get("kdfMemory", kdf_info.get("KdfMemory"))
-        kdf_par = kdf_info.get("kdfParallelism", kdf_info.get("KdfParallelism"))
-        print(f"DEBUG: login with kdf={kdf_type} iter={kdf_iter} mem={kdf_mem} par={kdf_par}",
-              file=sys.stderr)
-        master_key = make_master_key(
-            self.service_password, SERVICE_EMAIL,
-            kdf=kdf_type, iterations=kdf_iter,
-            memory=kdf_mem, parallelism=kdf_par,
-        )
+        return {
+            "kdf": kdf_info.get("kdf", kdf_info.get("Kdf", 0)),
+            "iterations": kdf_info.get("kdfIterations",
+                                       kdf_info.get("KdfIterations", KDF_ITERATIONS)),
+            "memory": kdf_info.get("kdfMemory", kdf_info.get("KdfMemory")),
+            "parallelism": kdf_info.get("kdfParallelism", kdf_info.get("KdfParallelism")),
+        }
+
+    def _password_login(self, master_key=None):
+        """Password grant; master_key skips prelogin and KDF if already known."""
+        if master_key is None:
+            kdf = self._kdf_params()
+            log.debug(f"login with kdf={kdf['kdf']} iter={kdf['iterations']} "
+                      f"mem={kdf['memory']} par={kdf['parallelism']}")
+            master_key = make_master_key(self.service_password, SERVICE_EMAIL, **kdf)
         master_hash = make_master_password_hash(self.service_password, master_key)
         token_data = {
             "grant_type": "password",
@@ -771,44 +1735,377 @@ class VaultwardenClient:
             "deviceIdentifier": "loco-ansible-automation",
             "deviceName": "LocoCloud Ansible",
         }
-        resp = self._http("POST", "/identity/connect/token", token_data, form=True)
+        with METRICS.phase("token"):
+            resp = self._http("POST", "/identity/connect/token", token_data, form=True)
         self.access_token = resp["access_token"]
         enc_sym_key = resp.get("key", resp.get("Key", ""))
         if enc_sym_key:
             enc_key, mac_key = stretch_key(master_key)
             self.sym_key = decrypt_aes_cbc(enc_sym_key, enc_key, mac_key)
+        return resp
+
+    def _resume_session(self):
+        """Restore tokens and key from the session cache. Caller holds the lock."""
+        if not self.session:
+            return False
+        cached = self.session.load()
+        if not cached or not cached.get("sym_key"):
+            return False
+        now = time.time()
+        sym_key = base64.b64decode(cached["sym_key"])
+        if cached.get("access_expires", 0) > now + 60:
+            self.access_token = cached["access_token"]
+            self.sym_key = sym_key
+            log.debug("session cache: access token reused")
+            return True
+        if not cached.get("refresh_token") or cached.get("refresh_expires", 0) <= now:
+            return False
+        try:
+            with METRICS.phase("token"):
+                resp = self._http("POST", "/identity/connect/token", {
+                    "grant_type": "refresh_token",
+                    "client_id": "cli",
+                    "refresh_token": cached["refresh_token"],
+                }, form=True)
+        except RuntimeError as e:
+            log.info(f"session cache: refresh failed: {e}")
+            self.session.clear()
+            return False
+        self.access_token = resp["access_token"]
+        self.sym_key = sym_key
+        resp.setdefault("refresh_token", cached["refresh_token"])
+        self._save_session(resp, refresh_expires=cached["refresh_expires"])
+        log.debug("session cache: access token refreshed")
+        return True
+
+    def _save_session(self, token_resp, refresh_expires=None):
+        if not self.session or not self.sym_key:
+            return
+        now = time.time()
+        self.session.save({
+            "access_token": self.access_token,
+            "access_expires": now + int(token_resp.get("expires_in", 0)),
+            "refresh_token": token_resp.get("refresh_token"),
+            "refresh_expires": refresh_expires or now + REFRESH_TOKEN_MAX_AGE,
+            "sym_key": base64.b64encode(self.sym_key).decode(),
+        })
+
+    def _drop_session(self):
+        """Forget the current login, in memory and on disk."""
+        self.access_token = None
+        self.sym_key = None
+        self._vault = None
+        self._vault_state = None
+        if self.session:
+            with self.session.locked():
+                self.session.clear()
 
     def api_request(self, method, path, data=None):
+        if method == "GET":
+            return self._api_request(method, path, data)
+        with METRICS.phase("write"):
+            return self._api_request(method, path, data)
+
+    def _api_request(self, method, path, data=None):
         if not self.access_token:
             self.login()
-        hdrs = {"Authorization": f"Bearer {self.access_token}"}
-        return self._http(method, path, data, hdrs)
+        try:
+            return self._http(method, path, data,
+                              {"Authorization": f"Bearer {self.access_token}"})
+        except VaultwardenHTTPError as e:
+            if e.status != 401:
+                raise
+            # Cached token rejected (server restarted with a new signing
+            # key): log in again and retry once
+            self._relogin()
+            return self._http(method, path, data,
+                              {"Authorization": f"Bearer {self.access_token}"})
+
+    def _relogin(self):
+        """Replace a rejected access token with a password login.
+
+        Never deletes or re-registers the user: that is for the explicit
+        ensure_service_user() at the start of a write, not for a request in
+        the middle of one. Inside vault() the view stays valid as long as
+        the key is the same; a different key means the account was
+        re-created meanwhile and its cipher ids are gone, so fail instead
+        of writing against them.
+        """
+        sym_key = self.sym_key
+        self.access_token = None
+        lock = self.session.locked() if self.session else contextlib.nullcontext()
+        with lock:
+            if self.session:
+                self.session.clear()
+            self._save_session(self._password_login())
+        if self.sym_key != sym_key:
+            if self._vault_depth:
+                raise RuntimeError("Service user was re-created during this operation "
+                                   "(vault key changed); nothing more was written, run again")
+            self._vault = None
+            self._vault_state = None
+
+    # Vault cache: the service user's ciphers and folders as returned by
+    # /api/sync, plus an HMAC(name) -> cipher id index, persisted between
+    # runs next to the session cache. The account revision date decides
+    # whether it is still current: unchanged -> no download at all,
+    # changed -> one /api/sync. Names never reach the disk in plaintext;
+    # the file is encrypted with keys derived from the vault's symmetric
+    # key. A view is only ever saved with the revision it was synced at.
+    # After a write it goes stale when the vault() block ends, because not
+    # every writer takes the file lock (the daemon, --no-session-cache runs,
+    # other controllers, the web UI). The lock only keeps processes sharing
+    # the cache from syncing and saving it at the same time.
+
+    @contextlib.contextmanager
+    def vault(self):
+        """Hold a current view of the vault (re-entrant).
+
+        On entry the cache is validated against the server revision. If we
+        wrote anything, the view is marked stale on exit: the server's
+        revision after our writes may already include another writer's
+        cipher that the view lacks, so the next entry syncs again.
+        """
+        if self._vault_depth:
+            self._vault_depth += 1
+            try:
+                yield self._vault
+            finally:
+                self._vault_depth -= 1
+            return
+        state = self._vault_file()
+        with state.locked() if state else contextlib.nullcontext():
+            self._vault_depth = 1
+            try:
+                self._refresh_vault(state)
+                yield self._vault
+                if self._vault_dirty:
+                    self._vault["revision"] = None
+            finally:
+                self._vault_depth = 0
+                self._vault_dirty = False
+
+    def _vault_file(self):
+        if self._vault_state is None and self.cache_dir and self.sym_key:
+            enc_key, mac_key = derive_state_keys(self.sym_key, b"loco-vault-cache")
+            self._vault_state = EncryptedStateFile(
+                self._state_path("vault"), enc_key, mac_key
+            )
+        return self._vault_state
+
+    @METRICS.timed("revision_check")
+    def revision_date(self):
+        return self.api_request("GET", "/api/accounts/revision-date")
+
+    def _refresh_vault(self, state):
+        revision = self.revision_date()
+        if self._vault and self._vault.get("revision") == revision:
+            return
+        if not state:
+            # No cache file (--no-session-cache, daemon): memory only
+            self._vault = self._sync_vault(revision)
+            return
+        cached = state.load()
+        if (cached and cached.get("revision") == revision
+                and cached.get("format") == VAULT_FORMAT):
+            log.debug("vault cache current, no download")
+            self._vault = cached
+            return
+        log.debug(f"vault revision changed ({(cached or {}).get('revision')} -> "
+                  f"{revision}), syncing")
+        self._vault = self._sync_vault(revision)
+        state.save(self._vault)
+
+    def _sync_vault(self, revision):
+        """Download ciphers and folders with one /api/sync and index names."""
+        with METRICS.phase("cipher_fetch"):
+            resp = self.api_request("GET", "/api/sync?excludeDomains=true") or {}
+        ciphers = resp.get("ciphers", resp.get("Ciphers")) or []
+        folders = resp.get("folders", resp.get("Folders")) or []
+        vault = {"format": VAULT_FORMAT, "revision": revision, "ciphers": {},
+                 "folders": {}, "names": {}, "folder_names": {}}
+        folder_names = decrypt_strings([_name_of(f) for f in folders], self.sym_key)
+        for folder, name in zip(folders, folder_names):
+            folder_id = _id_of(folder)
+            vault["folders"][folder_id] = folder
+            if name is not None:
+                vault["folder_names"].setdefault(self._name_mac(name), folder_id)
+        names = decrypt_strings([_name_of(c) for c in ciphers], self.sym_key,
+                                self.workers)
+        for cipher, name in zip(ciphers, names):
+            cipher_id = _id_of(cipher)
+            vault["ciphers"][cipher_id] = cipher
+            if name is not None:
+                # First cipher with a given name wins (as a linear scan would)
+                vault["names"].setdefault(self._name_mac(name), cipher_id)
+        return vault
+
+    def _name_mac(self, name):
+        key = hmac.new(self.sym_key, b"loco-cipher-name", hashlib.sha256).digest()
+        return hmac.new(key, name.encode(), hashlib.sha256).hexdigest()
+
+    def _record_cipher(self, name, cipher):
+        """Put a cipher we just wrote into the vault view (caller holds it)."""
+        cipher_id = _id_of(cipher)
+        self._vault["ciphers"][cipher_id] = cipher
+        self._vault["names"].setdefault(self._name_mac(name), cipher_id)
+        self._vault_dirty = True
 
     def list_ciphers(self):
-        resp = self.api_request("GET", "/api/ciphers")
-        return resp.get("data", []) if resp else []
+        with self.vault() as vault:
+            return list(vault["ciphers"].values())
+
+    def iter_ciphers(self, name_prefix="", folder=None, modified_since=None,
+                     limit=None, chunk_size=64):
+        """Yield {"id", "name", "folderId", "revisionDate"} per matching cipher.
+
+        Folder and modified_since (ISO-8601; a date means its midnight UTC)
+        are checked on the stored metadata, so non-matching ciphers are
+        never decrypted. Names are decrypted chunk_size at a time: the first
+        record is ready at once and nothing grows with the vault but the
+        vault view itself. chunk_size None decrypts all candidates in one
+        go (with worker processes for large vaults, see decrypt_strings).
+        Undecryptable names read "(encrypted)" and never match a name_prefix.
+        """
+        since = _parse_timestamp(modified_since) if modified_since else None
+        if since is None and modified_since:
+            raise ValueError(f"modified_since is not an ISO-8601 date: {modified_since}")
+        with self.vault() as vault:
+            folder_id = None
+            if folder:
+                found = self.find_folder(folder)
+                if not found:
+                    return iter(())
+                folder_id = _id_of(found)
+            # Snapshot the matches: the vault lock is not held while the
+            # caller (maybe a slow pipe) consumes the records.
+            candidates = [
+                c for c in vault["ciphers"].values()
+                if (folder_id is None or _folder_of(c) == folder_id)
+                and (since is None or (_parse_timestamp(_revision_of(c)) or 0) >= since)
+            ]
+        return self._decrypt_listing(candidates, name_prefix, limit, chunk_size)
+
+    def _decrypt_listing(self, ciphers, name_prefix, limit, chunk_size):
+        count = 0
+        chunk_size = chunk_size or max(1, len(ciphers))
+        for start in range(0, len(ciphers), chunk_size):
+            batch = ciphers[start:start + chunk_size]
+            workers = self.workers if len(batch) >= PARALLEL_MIN_ITEMS else 1
+            names = decrypt_strings([_name_of(c) for c in batch], self.sym_key, workers)
+            for cipher, name in zip(batch, names):
+                if name_prefix and (name is None or not name.startswith(name_prefix)):
+                    continue
+                yield {"id": _id_of(cipher), "name": "(encrypted)" if name is None else name,
+                       "folderId": _folder_of(cipher), "revisionDate": _revision_of(cipher)}
+                count += 1
+                if limit and count >= limit:
+                    return
 
     def find_cipher(self, name: str):
         if not self.sym_key:
             return None
-        for cipher in self.list_ciphers():
-            enc_name = cipher.get("name", "")
-            if not enc_name:
-                continue
-            try:
-                dec_name = decrypt_aes_cbc(
-                    enc_name, self.sym_key[:32], self.sym_key[32:]
-                ).decode()
-                if dec_name == name:
-                    return cipher
-            except Exception:
-                continue
-        return None
+        with self.vault() as vault:
+            cipher_id = vault["names"].get(self._name_mac(name))
+            return vault["ciphers"].get(cipher_id) if cipher_id else None
+
+    def get_credential(self, name: str):
+        """Return the decrypted login fields of the cipher called name, or None.
+
+        Decrypted fields are kept per cipher until its revisionDate changes.
+        """
+        cipher = self.find_cipher(name)
+        if not cipher:
+            return None
+        cipher_id, revision = _id_of(cipher), _revision_of(cipher)
+        cached = self._credentials.get(cipher_id)
+        if cached and revision and cached[0] == revision:
+            fields = cached[1]
+        else:
+            fields = self._login_fields(cipher)
+            self._credentials[cipher_id] = (revision, fields)
+        return dict(fields, id=cipher_id, name=name)
 
-    def store_credential(self, name, username, password, uri="", notes=""):
+    def get_credentials(self, names):
+        """Look up several names against one vault revision check.
+
+        Returns one record per name, in order, with "found" set; missing
+        names carry only name and found.
+        """
+        results = []
+        with self.vault():
+            for name in names:
+                credential = self.get_credential(name)
+                results.append(dict(credential, found=True) if credential
+                               else {"name": name, "found": False})
+        return results
+
+    def _login_fields(self, cipher):
+        """Decrypted username, password, first URI and notes of a cipher."""
+        login = cipher.get("login", cipher.get("Login")) or {}
+        uris = login.get("uris", login.get("Uris")) or []
+        uri = uris[0].get("uri", uris[0].get("Uri")) if uris else None
+        return {
+            "username": self._decrypt_field(login.get("username", login.get("Username"))),
+            "password": self._decrypt_field(login.get("password", login.get("Password"))),
+            "uri": self._decrypt_field(uri),
+            "notes": self._decrypt_field(cipher.get("notes", cipher.get("Notes"))),
+        }
+
+    def _decrypt_field(self, value):
+        if not value:
+            return ""
+        return decrypt_aes_cbc(value, self.sym_key[:32], self.sym_key[32:]).decode()
+
+    def store_credential(self, name, username, password, uri="", notes="",
+                         ignore_timestamps=False, folder=None, check=False):
+        """Create or update the login called name.
+
+        An existing cipher whose decrypted fields already match is left
+        alone (action "unchanged", no write, no new server revision). With
+        ignore_timestamps, ISO-8601 timestamps in the notes do not count as
+        a difference, so "Deployed: <date>" notes keep their first value.
+        folder names the folder to file the cipher in (created if missing);
+        without it an existing cipher stays where it is. With check nothing
+        is written; the result is the action a real run would report.
+        """
         if not self.sym_key:
             raise RuntimeError("Not logged in or no encryption key")
+        with self.vault():
+            return self._store_credential(name, username, password, uri, notes,
+                                          ignore_timestamps, folder, check)
+
+    def _store_credential(self, name, username, password, uri, notes,
+                          ignore_timestamps=False, folder=None, check=False):
         existing = self.find_cipher(name)
+        new_folder = False
+        if not folder:
+            folder_id = _folder_of(existing) if existing else None
+        elif check:
+            found = self.find_folder(folder)
+            folder_id, new_folder = (_id_of(found), False) if found else (None, True)
+        else:
+            folder_id = self._ensure_folder(folder)["id"]
+        if (existing and not new_folder and _folder_of(existing) == folder_id
+                and self._matches(existing, username, password, uri, notes,
+                                  ignore_timestamps)):
+            return {"action": "unchanged", "id": _id_of(existing)}
+        if check:
+            return {"action": "updated" if existing else "created",
+                    "id": _id_of(existing) if existing else None}
+        cipher_data = self._cipher_data(name, username, password, uri, notes, folder_id)
+        if existing:
+            cipher_id = _id_of(existing)
+            resp = self.api_request("PUT", f"/api/ciphers/{cipher_id}", cipher_data)
+            self._record_cipher(name, resp or dict(cipher_data, id=cipher_id))
+            return {"action": "updated", "id": cipher_id}
+        else:
+            resp = self.api_request("POST", "/api/ciphers", cipher_data)
+            self._record_cipher(name, resp)
+            return {"action": "created", "id": _id_of(resp)}
+
+    def _cipher_data(self, name, username, password, uri, notes, folder_id=None):
+        """Encrypt a login into the request body of POST/PUT /api/ciphers."""
         enc_name = encrypt_string(name, self.sym_key)
         enc_username = encrypt_string(username, self.sym_key) if username else None
         enc_password = encrypt_string(password, self.sym_key) if password else None
@@ -816,8 +2113,9 @@ class VaultwardenClient:
         uris = None
         if uri:
             uris = [{"uri": encrypt_string(uri, self.sym_key), "match": None}]
-        cipher_data = {
+        return {
             "type": 1,
+            "folderId": folder_id,
             "name": enc_name,
             "notes": enc_notes,
             "login": {
@@ -828,13 +2126,993 @@ class VaultwardenClient:
             },
             "favorite": False,
         }
+
+    def _matches(self, cipher, username, password, uri, notes, ignore_timestamps):
+        try:
+            current = self._login_fields(cipher)
+        except Exception:
+            return False  # undecryptable: overwrite
+        wanted = {"username": username or "", "password": password or "",
+                  "uri": uri or "", "notes": notes or ""}
+        if ignore_timestamps:
+            current["notes"] = _TIMESTAMP_RE.sub("<timestamp>", current["notes"])
+            wanted["notes"] = _TIMESTAMP_RE.sub("<timestamp>", wanted["notes"])
+        return current == wanted
+
+    def store_credentials(self, records):
+        """Store many credentials with one login and one vault check.
+
+        Returns one result per record, in input order. A failing record
+        does not abort the batch; its result carries action "failed".
+        """
+        results = []
+        with self.vault():
+            for record in records:
+                name = record.get("name", "")
+                try:
+                    if not name:
+                        raise ValueError("record has no name")
+                    result = self._store_credential(
+                        name, record.get("username", ""), record.get("password", ""),
+                        record.get("uri", ""), record.get("notes", ""),
+                        record.get("ignore_timestamps", False), record.get("folder"),
+                    )
+                except Exception as e:
+                    result = {"action": "failed", "error": str(e)}
+                results.append(dict(result, name=name))
+        return results
+
+    def import_credentials(self, records):
+        """Create all new records with one POST /api/ciphers/import.
+
+        Records whose name already exists (or repeats within the set) go
+        through the normal update path. The import response carries no ids,
+        so the vault is re-synced once afterwards. Servers without the
+        endpoint (404/405) get one POST per cipher instead. Returns one
+        result per record like store_credentials().
+        """
+        results = [None] * len(records)
+        with self.vault():
+            fresh, seen = [], set()
+            for pos, record in enumerate(records):
+                name = record.get("name", "")
+                if not name:
+                    results[pos] = {"action": "failed", "error": "record has no name",
+                                    "name": name}
+                elif name in seen or self.find_cipher(name):
+                    continue  # store_credentials() below
+                else:
+                    seen.add(name)
+                    fresh.append(pos)
+            if fresh:
+                try:
+                    self._import([records[pos] for pos in fresh])
+                except VaultwardenHTTPError as e:
+                    if e.status not in (404, 405):
+                        raise
+                    log.warning(f"/api/ciphers/import unavailable (HTTP {e.status}), "
+                                "storing one by one")
+                else:
+                    for pos in fresh:
+                        cipher = self.find_cipher(records[pos]["name"])
+                        results[pos] = {"action": "created", "id": _id_of(cipher or {}),
+                                        "name": records[pos]["name"]}
+            rest = [pos for pos in range(len(records)) if results[pos] is None]
+            for pos, result in zip(rest, self.store_credentials([records[p] for p in rest])):
+                results[pos] = result
+        return results
+
+    def _import(self, records):
+        folders, folder_index, relationships = [], {}, []
+        ciphers = []
+        for record in records:
+            folder = record.get("folder")
+            if folder:
+                if folder not in folder_index:
+                    existing = self.find_folder(folder)
+                    entry = {"name": encrypt_string(folder, self.sym_key)}
+                    if existing:
+                        entry["id"] = _id_of(existing)  # server reuses the folder
+                    folder_index[folder] = len(folders)
+                    folders.append(entry)
+                relationships.append({"key": len(ciphers), "value": folder_index[folder]})
+            ciphers.append(self._cipher_data(
+                record["name"], record.get("username", ""), record.get("password", ""),
+                record.get("uri", ""), record.get("notes", ""),
+            ))
+        self.api_request("POST", "/api/ciphers/import", {
+            "ciphers": ciphers, "folders": folders, "folderRelationships": relationships,
+        })
+        # No ids in the response: pick up the new ciphers and folders
+        self._vault = self._sync_vault(self.revision_date())
+        self._vault_dirty = True
+
+    # Folders: names are encrypted like cipher names and indexed by HMAC in
+    # vault["folder_names"], so lookups need neither a request nor a scan.
+
+    def find_folder(self, name: str):
+        with self.vault() as vault:
+            folder_id = vault["folder_names"].get(self._name_mac(name))
+            return vault["folders"].get(folder_id) if folder_id else None
+
+    def get_folder(self, name: str):
+        """Return {"id", "name", "ciphers": <count>} for a folder, or None."""
+        with self.vault() as vault:
+            folder = self.find_folder(name)
+            if not folder:
+                return None
+            folder_id = _id_of(folder)
+            count = sum(1 for c in vault["ciphers"].values() if _folder_of(c) == folder_id)
+            return {"id": folder_id, "name": name, "ciphers": count}
+
+    def create_folder(self, name: str):
+        with self.vault():
+            return self._ensure_folder(name)
+
+    def _ensure_folder(self, name):
+        existing = self.find_folder(name)
         if existing:
-            cipher_id = existing["id"]
-            self.api_request("PUT", f"/api/ciphers/{cipher_id}", cipher_data)
-            return {"action": "updated", "id": cipher_id}
+            return {"action": "unchanged", "id": _id_of(existing)}
+        resp = self.api_request("POST", "/api/folders",
+                                {"name": encrypt_string(name, self.sym_key)})
+        self._record_folder(name, resp)
+        return {"action": "created", "id": _id_of(resp)}
+
+    def rename_folder(self, name: str, new_name: str):
+        """Rename a folder; "unchanged" if only new_name exists already."""
+        with self.vault():
+            folder = self.find_folder(name)
+            if not folder:
+                target = self.find_folder(new_name)
+                if target:
+                    return {"action": "unchanged", "id": _id_of(target)}
+                raise RuntimeError(f"folder not found: {name}")
+            folder_id = _id_of(folder)
+            resp = self.api_request("PUT", f"/api/folders/{folder_id}",
+                                    {"name": encrypt_string(new_name, self.sym_key)})
+            self._vault["folder_names"].pop(self._name_mac(name), None)
+            self._record_folder(new_name, resp or dict(folder, id=folder_id))
+            return {"action": "updated", "id": folder_id}
+
+    def archive_folder(self, name: str, prefix="[ARCHIV]", name_prefix=""):
+        """Rename folder name to "<prefix> <name>" and file the customer's
+        ciphers in it.
+
+        Ciphers whose decrypted name starts with name_prefix but live
+        elsewhere (stored before the folder existed) are moved into the
+        archive folder with one bulk /api/ciphers/move request.
+        """
+        archived = f"{prefix} {name}"
+        with self.vault() as vault:
+            if self.find_folder(name):
+                result = self.rename_folder(name, archived)
+            else:
+                result = self._ensure_folder(archived)
+            folder_id = result["id"]
+            moved = []
+            if name_prefix:
+                ciphers = [c for c in vault["ciphers"].values()
+                           if _folder_of(c) != folder_id]
+                names = decrypt_strings([_name_of(c) for c in ciphers], self.sym_key,
+                                        self.workers)
+                moved = [_id_of(c) for c, n in zip(ciphers, names)
+                         if n is not None and n.startswith(name_prefix)]
+            self.move_ciphers(moved, folder_id)
+            action = "updated" if moved or result["action"] != "unchanged" else "unchanged"
+            return {"action": action, "id": folder_id, "name": archived,
+                    "moved": len(moved)}
+
+    def move_ciphers(self, cipher_ids, folder_id):
+        """Move ciphers into a folder (None: no folder) in one request."""
+        if not cipher_ids:
+            return
+        with self.vault() as vault:
+            self.api_request("PUT", "/api/ciphers/move",
+                             {"ids": list(cipher_ids), "folderId": folder_id})
+            for cipher_id in cipher_ids:
+                cipher = vault["ciphers"].get(cipher_id)
+                if cipher is not None:
+                    cipher.pop("FolderId", None)
+                    cipher["folderId"] = folder_id
+            self._vault_dirty = True
+
+    def _record_folder(self, name, folder):
+        folder_id = _id_of(folder)
+        self._vault["folders"][folder_id] = folder
+        self._vault["folder_names"][self._name_mac(name)] = folder_id
+        self._vault_dirty = True
+
+    # Key rotation: the service password is derived from the admin token,
+    # so a new admin token means a new password. Left to itself,
+    # ensure_service_user() would delete the user with every cipher and
+    # register it again. rotate() keeps the account instead: one pass
+    # re-encrypts all ciphers, folders and the private key under a fresh
+    # symmetric key, one bulk key-rotation request submits them, and one
+    # password change moves the account to the new token's password.
+
+    def rotate(self, new_admin_token, check=False):
+        """Re-key the service user for new_admin_token, keeping its vault.
+
+        This client's admin token is the old one; only the service user's
+        login is needed, not the admin panel, so it works after ADMIN_TOKEN
+        was already changed on the server. Returns {"action": "rotated" or
+        "unchanged", "ciphers", "folders"}. check proves that everything
+        decrypts and writes nothing.
+
+        Safe to repeat: once rotated, only the new password logs in, which
+        reports "unchanged". A run that stopped between key rotation and
+        password change still logs in with the old password and rotates
+        again.
+        """
+        new = VaultwardenClient(self.url, new_admin_token, cache_dir=self.cache_dir)
+        if new.service_password == self.service_password:
+            raise ValueError("new admin token is the current one")
+        try:
+            self._check_login()
+        except VaultwardenHTTPError as e:
+            if not is_auth_failure(e):
+                raise
+            try:
+                new._check_login()
+            except VaultwardenHTTPError as new_error:
+                if not is_auth_failure(new_error):
+                    raise
+                raise RuntimeError(f"Service user logs in with neither the old nor the "
+                                   f"new admin token: {e}")
+            log.info("service user already uses the new admin token")
+            return {"action": "unchanged", "ciphers": None, "folders": None}
+
+        with METRICS.phase("cipher_fetch"):
+            sync = self.api_request("GET", "/api/sync?excludeDomains=true") or {}
+        profile = sync.get("profile", sync.get("Profile")) or {}
+        if sync.get("sends", sync.get("Sends")):
+            raise RuntimeError("Service user has Sends; rotate() does not re-encrypt them")
+        # Organization ciphers are under the organization's key, not ours
+        ciphers = [c for c in sync.get("ciphers", sync.get("Ciphers")) or []
+                   if not c.get("organizationId", c.get("OrganizationId"))]
+        folders = [{"id": _id_of(f), "name": _name_of(f)}
+                   for f in sync.get("folders", sync.get("Folders")) or []]
+        if not profile.get("privateKey", profile.get("PrivateKey")):
+            raise RuntimeError("Sync returned no private key for the service user")
+
+        # Everything to re-encrypt in one structure, so that one bulk call
+        # (worker processes for large vaults) covers the whole vault
+        parts = [[self._rotation_part(c) for c in ciphers], folders,
+                 profile.get("privateKey", profile.get("PrivateKey"))]
+        strings = []
+        _map_encrypted(parts, lambda value: strings.append(value) or value)
+        new_key = os.urandom(64)
+        rotated = iter(reencrypt_strings(strings, self.sym_key, new_key, self.workers))
+        cipher_parts, folders, private_key = _map_encrypted(parts, lambda _: next(rotated))
+        ciphers = [dict(_rotation_view(c), **part) for c, part in zip(ciphers, cipher_parts)]
+        result = {"action": "rotated", "ciphers": len(ciphers), "folders": len(folders)}
+        log.info(f"re-encrypted {len(strings)} strings in {len(ciphers)} ciphers and "
+                 f"{len(folders)} folders")
+        if check:
+            return result
+
+        kdf = self._kdf_params()
+        old_master = make_master_key(self.service_password, SERVICE_EMAIL, **kdf)
+        old_hash = make_master_password_hash(self.service_password, old_master)
+        # Step 1: new key, still wrapped with the old password
+        with METRICS.phase("write"):
+            result["endpoint"] = self._submit_rotation(
+                old_hash, kdf, encrypt_aes_cbc(new_key, *stretch_key(old_master)),
+                private_key, _id_of(profile), ciphers, folders,
+            )
+        # The rotation reset the security stamp: log in again, which also
+        # proves the server hands out the new key
+        self._drop_session()
+        self._password_login(old_master)
+        if self.sym_key != new_key:
+            raise RuntimeError("Key rotation was accepted, but login returns a different key")
+
+        # Step 2: new password, wrapping the same new key
+        new_master = make_master_key(new.service_password, SERVICE_EMAIL, **kdf)
+        with METRICS.phase("write"):
+            self._http("POST", "/api/accounts/password", {
+                "masterPasswordHash": old_hash,
+                "newMasterPasswordHash": make_master_password_hash(new.service_password,
+                                                                   new_master),
+                "masterPasswordHint": None,
+                "key": encrypt_aes_cbc(new_key, *stretch_key(new_master)),
+            }, {"Authorization": f"Bearer {self.access_token}"})
+
+        # The old token's caches are useless now; start the new one's
+        state = self._vault_file()
+        if state:
+            with state.locked():
+                state.clear()
+        self._drop_session()
+        with new.session.locked() if new.session else contextlib.nullcontext():
+            new._save_session(new._password_login(new_master))
+        if new.sym_key != new_key:
+            raise RuntimeError("Password change was accepted, but login returns a different key")
+        new.transport.close()
+        return result
+
+    def _rotation_part(self, cipher):
+        """The encrypted values of a cipher that are under the user key.
+
+        A cipher with its own key ("key", wrapped with the user key) keeps
+        its fields and attachments under that key: only the key moves.
+        Otherwise every field does, and attachment keys would too, which
+        the rotation endpoints do not update.
+        """
+        item_key = cipher.get("key", cipher.get("Key"))
+        if item_key:
+            return {"key": item_key}
+        if cipher.get("attachments", cipher.get("Attachments")):
+            raise RuntimeError(f"Cipher {_id_of(cipher)} has attachments without a cipher "
+                               f"key; rotate() cannot re-encrypt them")
+        return _rotation_view(cipher)
+
+    def _submit_rotation(self, old_hash, kdf, protected_key, private_key, user_id,
+                         ciphers, folders):
+        """POST the re-encrypted account; returns the endpoint that took it.
+
+        Vaultwarden 1.34+ only has rotate-user-account-keys (which also
+        wants the unchanged public key), older versions only accounts/key.
+        """
+        headers = {"Authorization": f"Bearer {self.access_token}"}
+        try:
+            public = self._http("GET", f"/api/users/{user_id}/public-key", headers=dict(headers))
+            self._http("POST", "/api/accounts/key-management/rotate-user-account-keys", {
+                "oldMasterKeyAuthenticationHash": old_hash,
+                "accountUnlockData": {
+                    "masterPasswordUnlockData": {
+                        "kdfType": kdf["kdf"],
+                        "kdfIterations": kdf["iterations"],
+                        "kdfMemory": kdf["memory"],
+                        "kdfParallelism": kdf["parallelism"],
+                        "email": SERVICE_EMAIL,
+                        "masterKeyAuthenticationHash": old_hash,
+                        "masterKeyEncryptedUserKey": protected_key,
+                    },
+                    "emergencyAccessUnlockData": [],
+                    "organizationAccountRecoveryUnlockData": [],
+                    "passkeyUnlockData": [],
+                },
+                "accountKeys": {
+                    "userKeyEncryptedAccountPrivateKey": private_key,
+                    "accountPublicKey": (public or {}).get("publicKey",
+                                                           (public or {}).get("PublicKey")),
+                },
+                "accountData": {"ciphers": ciphers, "folders": folders, "sends": []},
+            }, dict(headers))
+            return "rotate-user-account-keys"
+        except VaultwardenHTTPError as e:
+            if e.status not in (404, 405):
+                raise
+            log.debug(f"rotate-user-account-keys unavailable, using accounts/key: {e}")
+        self._http("POST", "/api/accounts/key", {
+            "masterPasswordHash": old_hash,
+            "key": protected_key,
+            "privateKey": private_key,
+            "ciphers": ciphers,
+            "folders": folders,
+            "sends": [],
+            "emergencyAccessKeys": [],
+            "resetPasswordKeys": [],
+        }, dict(headers))
+        return "accounts/key"
+
+    def export(self, export_dir):
+        """Write the vault to export_dir as encrypted shards (see VaultExport).
+
+        Read-only on the server: log in with ensure_login() first, never
+        ensure_service_user(). An unchanged account revision costs one
+        request and nothing else. Otherwise only shards whose folder or
+        ciphers changed since the last export are decrypted and rewritten;
+        the others keep their bytes, so restic deduplicates them.
+        """
+        export = VaultExport(export_dir, self.admin_token, self.cache_dir or CACHE_DIR)
+        with export.manifest.locked():
+            manifest = export.manifest.load() or {}
+            if manifest.get("format") != EXPORT_FORMAT:
+                manifest = {}
+            shards = manifest.get("shards", {})
+            revision = self.revision_date()
+            if manifest.get("revision") == revision and export.complete(shards):
+                log.debug("export current, nothing to write")
+                return {"action": "unchanged", "shards": len(shards), "written": 0,
+                        "removed": 0, "ciphers": sum(s["count"] for s in shards.values())}
+            with self.vault() as vault:
+                folders = dict(vault["folders"])
+                groups = {folder_id: [] for folder_id in folders}
+                for cipher in vault["ciphers"].values():
+                    groups.setdefault(_folder_of(cipher), []).append(cipher)
+                revision = vault["revision"]
+            files = {}
+            written = 0
+            for folder_id, ciphers in groups.items():
+                name = export.shard_name(folder_id)
+                fingerprint = export.fingerprint(folders.get(folder_id), ciphers)
+                files[name] = {"fingerprint": fingerprint, "count": len(ciphers)}
+                previous = shards.get(name)
+                if (previous and previous["fingerprint"] == fingerprint
+                        and os.path.exists(export.shard(name).path)):
+                    continue
+                export.shard(name).save(self._export_shard(folders.get(folder_id), ciphers))
+                written += 1
+            removed = export.prune(files)
+            export.manifest.save({"format": EXPORT_FORMAT, "revision": revision,
+                                  "shards": files})
+        return {"action": "exported", "shards": len(files), "written": written,
+                "removed": removed, "ciphers": sum(len(c) for c in groups.values())}
+
+    def _export_shard(self, folder, ciphers):
+        """One folder's decrypted credentials, sorted by name and id."""
+        records = []
+        with METRICS.phase("decrypt"):
+            for cipher in ciphers:
+                try:
+                    record = dict(name=self._decrypt_field(_name_of(cipher)),
+                                  **self._login_fields(cipher))
+                except (ValueError, IndexError) as e:
+                    # Keep the backup going; the cipher is listed, not lost silently
+                    log.warning(f"cipher {_id_of(cipher)} not exported: {e}")
+                    record = {"name": None, "error": str(e)}
+                records.append(dict(record, id=_id_of(cipher),
+                                    revisionDate=_revision_of(cipher)))
+            shard = {"folder": None, "credentials": records}
+            try:
+                if folder:
+                    shard["folder"] = self._decrypt_field(_name_of(folder))
+            except (ValueError, IndexError) as e:
+                log.warning(f"folder {_id_of(folder)} name not exported: {e}")
+                shard.update(folderId=_id_of(folder), error=str(e))
+        records.sort(key=lambda r: (r["name"] or "", r["id"]))
+        return shard
+
+
+# ISO-8601 date-times as rendered by ansible_facts.date_time.iso8601 & co.
+_TIMESTAMP_RE = re.compile(
+    r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?"
+)
+
+
+_ISO_DATETIME_RE = re.compile(
+    r"(\d{4})-(\d{2})-(\d{2})(?:[T ](\d{2}):(\d{2})(?::(\d{2})(?:\.(\d+))?)?)?"
+    r"\s*(Z|[+-]\d{2}:?\d{2})?"
+)
+
+
+def _parse_timestamp(value):
+    """ISO-8601 date or date-time -> epoch seconds; None if unparseable.
+
+    Without an offset the time is taken as UTC. Handwritten instead of
+    datetime.fromisoformat, which before 3.11 rejects "Z" and the
+    7-digit fractions Bitwarden servers may send.
+    """
+    m = _ISO_DATETIME_RE.fullmatch((value or "").strip())
+    if not m:
+        return None
+    year, month, day, hour, minute, second, fraction, offset = m.groups()
+    try:
+        ts = calendar.timegm((int(year), int(month), int(day),
+                              int(hour or 0), int(minute or 0), int(second or 0)))
+    except ValueError:  # month 13 and the like
+        return None
+    ts += float(f"0.{fraction}") if fraction else 0
+    if offset and offset != "Z":
+        sign = -1 if offset[0] == "-" else 1
+        digits = offset[1:].replace(":", "")
+        ts -= sign * (int(digits[:2]) * 3600 + int(digits[2:]) * 60)
+    return ts
+
+
+def _id_of(obj):
+    return obj.get("id", obj.get("Id", ""))
+
+
+def _revision_of(obj):
+    return obj.get("revisionDate", obj.get("RevisionDate"))
+
+
+def _name_of(obj):
+    return obj.get("name", obj.get("Name", ""))
+
+
+def _folder_of(obj):
+    return obj.get("folderId", obj.get("FolderId"))
+
+
+# "<encType>.<iv>|<ct>[|<mac>]", the shape of every encrypted value
+_ENCRYPTED_RE = re.compile(r"\d+\.[A-Za-z0-9+/=]+\|")
+
+# Sync-only cipher members; the rotation endpoints do not take them
+_SERVER_CIPHER_FIELDS = ("attachments", "Attachments", "data", "Data", "object", "Object",
+                         "edit", "Edit", "viewPassword", "ViewPassword", "permissions",
+                         "Permissions", "collectionIds", "CollectionIds")
+
+
+def _map_encrypted(obj, fn):
+    """Copy of a JSON value with fn applied to every encrypted string in it."""
+    if isinstance(obj, dict):
+        return {k: _map_encrypted(v, fn) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_map_encrypted(v, fn) for v in obj]
+    if isinstance(obj, str) and _ENCRYPTED_RE.match(obj):
+        return fn(obj)
+    return obj
+
+
+def _rotation_view(cipher):
+    """A synced cipher as the key-rotation endpoints take it."""
+    view = {k: v for k, v in cipher.items() if k not in _SERVER_CIPHER_FIELDS}
+    # Vaultwarden refuses the rotation if the cipher changed since the sync
+    view["lastKnownRevisionDate"] = _revision_of(cipher)
+    return view
+
+
+# --- Vault Export ---
+# `--action export` keeps a backup-friendly copy of the service vault in a
+# directory (pre-backup.sh, before the restic snapshot): one file per
+# folder, i.e. per customer, plus manifest.enc with the account revision
+# and an HMAC fingerprint of each shard's folder and cipher revisions.
+# Everything is encrypted like the local state files, with keys derived
+# from the admin token: a restore needs the token, not the server
+# (`--action read-export`). After `--action rotate`, older exports still
+# need the old token. The export lock lives in the cache directory, so the
+# backed-up directory holds nothing but shards and manifest.
+
+EXPORT_FORMAT = 1
+
+
+class VaultExport:
+    def __init__(self, export_dir, admin_token, lock_dir=CACHE_DIR):
+        self.dir = export_dir
+        self.enc_key, self.mac_key = derive_state_keys(admin_token.encode(),
+                                                       b"loco-vault-export")
+        lock_id = hashlib.sha256(os.path.abspath(export_dir).encode()).hexdigest()[:16]
+        self.manifest = EncryptedStateFile(
+            os.path.join(self.dir, "manifest.enc"), self.enc_key, self.mac_key,
+            lock_path=os.path.join(lock_dir, f"vw-export-{lock_id}.lock"),
+        )
+
+    def shard(self, name):
+        return EncryptedStateFile(os.path.join(self.dir, name), self.enc_key, self.mac_key)
+
+    def shard_name(self, folder_id):
+        """File name of a folder's shard: stable across renames, reveals nothing."""
+        digest = hmac.new(self.mac_key, (folder_id or "").encode(), hashlib.sha256)
+        return f"shard-{digest.hexdigest()[:20]}.enc"
+
+    def fingerprint(self, folder, ciphers):
+        """Changes whenever the shard's plaintext would."""
+        state = [[_id_of(folder), _name_of(folder)] if folder else None,
+                 sorted([_id_of(c), _revision_of(c) or ""] for c in ciphers)]
+        return hmac.new(self.mac_key, json.dumps(state).encode(), hashlib.sha256).hexdigest()
+
+    def complete(self, shards):
+        return all(os.path.exists(self.shard(name).path) for name in shards)
+
+    def prune(self, keep):
+        """Delete shards of folders that no longer exist; returns how many."""
+        with contextlib.suppress(FileNotFoundError):
+            # Lock file of earlier versions, which kept it next to the manifest
+            os.unlink(self.manifest.path + ".lock")
+        try:
+            names = os.listdir(self.dir)
+        except FileNotFoundError:
+            return 0  # empty vault, first export: no shard written yet
+        removed = 0
+        for name in names:
+            if name.startswith("shard-") and name.endswith(".enc") and name not in keep:
+                os.unlink(os.path.join(self.dir, name))
+                removed += 1
+        return removed
+
+
+def read_export(export_dir, admin_token):
+    """Decrypt an export: {"revision", "shards": [{"folder", "credentials"}]}."""
+    export = VaultExport(export_dir, admin_token)
+    manifest = export.manifest.load()
+    if not manifest:
+        raise RuntimeError(f"No export in {export_dir} readable with this admin token")
+    shards = []
+    for name, meta in sorted(manifest["shards"].items()):
+        shard = export.shard(name).load()
+        if shard is None or len(shard["credentials"]) != meta["count"]:
+            raise RuntimeError(f"{export.shard(name).path}: missing, unreadable or "
+                               f"not the exported version")
+        shards.append(shard)
+    shards.sort(key=lambda s: (s["folder"] is None, s["folder"] or ""))
+    return {"revision": manifest["revision"], "shards": shards}
+
+
+# --- Credential Daemon ---
+# `--action serve` logs in once and answers JSON requests on a Unix socket,
+# one request and one response per line: {"ok": true, "result": ...} or
+# {"ok": false, "error": "..."}. The symmetric key and the vault index stay
+# in memory only; the vault is revalidated against the account revision on
+# every request. Each request carries url and admin_token; a daemon serving
+# another target answers with reason "target" and the caller runs locally.
+
+DAEMON_IDLE_TIMEOUT = 900  # seconds without a connection before exiting
+DAEMON_ACTIONS = ("store", "batch", "import", "get", "list", "create-folder",
+                  "rename-folder", "get-folder", "archive-folder")
+READ_ACTIONS = ("get", "list", "get-folder")
+
+
+def execute(client, request):
+    """Run one DAEMON_ACTIONS request with a client; return the result."""
+    action = request.get("action", "store")
+    name = request.get("name")
+    folder = request.get("folder")
+    if action == "store":
+        if not name:
+            raise ValueError("name required for store action")
+        return client.store_credential(
+            name, request.get("username", ""), request.get("password", ""),
+            request.get("uri", ""), request.get("notes", ""),
+            request.get("ignore_timestamps", False), folder, request.get("check", False),
+        )
+    if action == "batch":
+        return client.store_credentials(request.get("records") or [])
+    if action == "import":
+        return client.import_credentials(request.get("records") or [])
+    if action == "get":
+        if request.get("names"):
+            return client.get_credentials(request["names"])
+        if not name:
+            raise ValueError("name or names required for get action")
+        return client.get_credential(name)
+    if action == "list":
+        return list(client.iter_ciphers(
+            request.get("name_prefix") or "", folder, request.get("modified_since"),
+            request.get("limit"), chunk_size=None,
+        ))
+    if action.endswith("-folder") and not folder:
+        raise ValueError(f"folder required for {action} action")
+    if action == "create-folder":
+        return client.create_folder(folder)
+    if action == "get-folder":
+        return client.get_folder(folder)
+    if action == "rename-folder":
+        if not request.get("new_name"):
+            raise ValueError("new_name required for rename-folder action")
+        return client.rename_folder(folder, request["new_name"])
+    if action == "archive-folder":
+        return client.archive_folder(folder, request.get("archive_prefix") or "[ARCHIV]",
+                                     request.get("name_prefix") or "")
+    raise ValueError(f"unsupported action: {action}")
+
+
+def login_for(client, request):
+    """Log the client in for request; only writes may recover the service user.
+
+    Reads and check runs only log in: neither may change the server.
+    """
+    if request.get("action", "store") in READ_ACTIONS or request.get("check"):
+        client.ensure_login()
+    else:
+        client.ensure_service_user()  # includes login verification
+
+
+def daemon_request(socket_path, request, timeout=None):
+    """Send one request to a `serve` daemon; None if none is listening.
+
+    timeout defaults to the read timeout set by configure_http().
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(READ_TIMEOUT if timeout is None else timeout)
+    with sock:
+        try:
+            sock.connect(socket_path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            return None
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        with sock.makefile("rb") as stream:
+            line = stream.readline()
+    if not line:
+        raise RuntimeError(f"daemon on {socket_path} closed the connection")
+    return json.loads(line)
+
+
+def forward(socket_path, request):
+    """Run request on the daemon at socket_path if it serves this target.
+
+    Returns (True, result) when the daemon answered, (False, None) when the
+    caller has to do the work itself. Daemon-side errors are raised.
+    """
+    if not socket_path:
+        return False, None
+    with METRICS.phase("daemon"):
+        response = daemon_request(socket_path, request)
+    if response is None or response.get("reason") == "target":
+        return False, None
+    if not response.get("ok"):
+        raise RuntimeError(response.get("error", "daemon request failed"))
+    log.debug(f"served by daemon on {socket_path}")
+    return True, response.get("result")
+
+
+class CredentialDaemon:
+    def __init__(self, client, socket_path, idle_timeout=DAEMON_IDLE_TIMEOUT):
+        self.client = client
+        self.socket_path = socket_path
+        self.idle_timeout = idle_timeout
+        self.running = False
+
+    def start(self, detach=False):
+        """Log in, bind the socket and serve until idle or shut down.
+
+        Returns a status dict for the caller. With detach the process forks
+        after login and bind, so errors still reach the caller; the parent
+        prints the status and exits while the child serves.
+        """
+        probe = {"action": "ping", "url": self.client.url,
+                 "admin_token": self.client.admin_token}
+        response = daemon_request(self.socket_path, probe, CONNECT_TIMEOUT)
+        if response is not None:
+            if not response.get("ok"):
+                raise RuntimeError(f"{self.socket_path} is served by another daemon: "
+                                   f"{response.get('error')}")
+            return {"status": "running", "socket": self.socket_path,
+                    "pid": response["result"]["pid"]}
+
+        self.client.ensure_service_user()  # includes login verification
+        self.client.list_ciphers()  # warm the vault index
+        METRICS.emit("ok")  # startup run: login and vault download
+
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.socket_path)  # stale socket, nobody answered
+        os.makedirs(os.path.dirname(self.socket_path) or ".", mode=0o700, exist_ok=True)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o177)  # socket file 0600 from the start
+        try:
+            server.bind(self.socket_path)
+        finally:
+            os.umask(umask)
+        server.listen(16)
+        server.settimeout(self.idle_timeout)
+
+        if detach:
+            pid = os.fork()
+            if pid:
+                print(json.dumps({"status": "started", "socket": self.socket_path,
+                                  "pid": pid}))
+                sys.stdout.flush()
+                os._exit(0)  # the child owns socket file and connections now
+            os.setsid()
+            devnull = os.open(os.devnull, os.O_RDWR)
+            for fd in (0, 1, 2):
+                os.dup2(devnull, fd)
+            os.close(devnull)
+
+        self.running = True
+        try:
+            while self.running:
+                try:
+                    conn, _ = server.accept()
+                except socket.timeout:
+                    log.debug("daemon idle, exiting")
+                    break
+                self._serve_connection(conn)
+        finally:
+            server.close()
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(self.socket_path)
+            self.client.transport.close()
+        return {"status": "stopped", "socket": self.socket_path}
+
+    def _serve_connection(self, conn):
+        conn.settimeout(READ_TIMEOUT)
+        with conn, conn.makefile("rwb") as stream:
+            try:
+                for line in stream:
+                    stream.write(json.dumps(self.handle(line)).encode() + b"\n")
+                    stream.flush()
+                    if not self.running:
+                        break
+            except OSError as e:
+                log.warning(f"daemon connection dropped: {e}")
+
+    def handle(self, line):
+        """Answer one request line; never raises."""
+        try:
+            request = json.loads(line)
+            if not self._same_target(request):
+                return {"ok": False, "reason": "target",
+                        "error": f"daemon serves {self.client.url} with another token"}
+            action = request.get("action")
+            if action == "ping":
+                return {"ok": True, "result": {"pid": os.getpid()}}
+            if action == "shutdown":
+                self.running = False
+                return {"ok": True, "result": {"status": "stopped"}}
+            if action not in DAEMON_ACTIONS:
+                raise ValueError(f"unsupported action: {action}")
+            METRICS.reset(action)
+            try:
+                result = execute(self.client, request)
+            except Exception:
+                METRICS.emit("error")
+                raise
+            METRICS.emit("ok")
+            return {"ok": True, "result": result}
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+
+    def _same_target(self, request):
+        url = (request.get("url") or "").rstrip("/")
+        token = (request.get("admin_token") or "").encode()
+        return (url == self.client.url
+                and hmac.compare_digest(token, self.client.admin_token.encode()))
+
+
+# --- Multiple Targets ---
+# One request against several Vaultwardens, e.g. the master admin vault and
+# the customer's own. Each target gets its own client (login, session and
+# vault cache files, locks); all run concurrently on threads, so the wall
+# time is that of the slowest target. The policy decides when the run as a
+# whole fails: "all" targets must succeed, "any" one suffices, or
+# "best-effort" (never fails; see the per-target results).
+
+TARGET_POLICIES = ("all", "any", "best-effort")
+TARGET_THREADS = 8
+TARGET_ACTIONS = DAEMON_ACTIONS + ("setup", "status")
+
+
+def run_target(request, cache_dir=CACHE_DIR, socket_path=None, wait=0):
+    """Run one request (with its own url/admin_token) end to end."""
+    action = request.get("action", "store")
+    if wait > 0:
+        wait_ready(request["url"], wait)
+    if action != "status":
+        served, result = forward(socket_path, request)
+        if served:
+            return result
+    client = VaultwardenClient(request["url"], request["admin_token"], cache_dir=cache_dir)
+    # No decryption processes: forking from a threaded process can deadlock
+    client.workers = 1
+    try:
+        if action == "status":
+            return client.status()
+        login_for(client, request)
+        if action == "setup":
+            return {"status": "ok", "message": "Service user ready"}
+        return execute(client, request)
+    finally:
+        client.transport.close()
+
+
+def run_targets(targets, request, policy="all", cache_dir=CACHE_DIR, socket_path=None,
+                wait=0):
+    """Run request against every target concurrently.
+
+    targets: [{"url": ..., "admin_token": ...}, ...]; a target may override
+    other request fields too. wait: --wait-ready seconds per target.
+    Returns (ok, results) with one result per target, in order:
+    {"url", "ok", "seconds", "result" | "error"}.
+    """
+    if policy not in TARGET_POLICIES:
+        raise ValueError(f"unknown target policy: {policy}")
+    action = request.get("action", "store")
+    if action not in TARGET_ACTIONS:
+        raise ValueError(f"action {action} does not support several targets")
+    requests = []
+    for pos, target in enumerate(targets):
+        if not target.get("url") or not target.get("admin_token"):
+            raise ValueError(f"target {pos}: url and admin_token are required")
+        requests.append(dict(request, **target))
+    crypto_backend()  # probe once here, not racing in the threads
+
+    def one(req):
+        t0 = time.perf_counter()
+        entry = {"url": req["url"].rstrip("/")}
+        try:
+            entry.update(ok=True, result=run_target(req, cache_dir, socket_path, wait))
+        except Exception as e:
+            log.warning(f"{entry['url']}: {e}")
+            entry.update(ok=False, error=str(e))
+        entry["seconds"] = round(time.perf_counter() - t0, 3)
+        return entry
+
+    import concurrent.futures
+    threads = max(1, min(TARGET_THREADS, len(requests)))
+    with concurrent.futures.ThreadPoolExecutor(threads) as pool:
+        results = list(pool.map(one, requests))
+    succeeded = sum(1 for entry in results if entry["ok"])
+    if policy == "all":
+        ok = succeeded == len(results)
+    elif policy == "any":
+        ok = succeeded > 0
+    else:
+        ok = True
+    return ok, results
+
+
+# --- In-Process Use ---
+# The Ansible plugins in plugins/ import this file instead of running it.
+# Clients are shared per (url, admin token) for the life of the importing
+# process, so every lookup after the first reuses login, key and vault view.
+
+_shared_clients = {}
+
+
+def shared_client(url: str, admin_token: str, cache_dir=CACHE_DIR, recover=True):
+    """Return a logged-in client for url/admin_token, reused within the process.
+
+    recover=False (lookups, check mode) only logs in: a rejected login
+    fails instead of re-registering the service user.
+    """
+    key = (url.rstrip("/"), hashlib.sha256(admin_token.encode()).hexdigest())
+    client = _shared_clients.get(key)
+    if client is None:
+        client = VaultwardenClient(url, admin_token, cache_dir=cache_dir)
+        if recover:
+            client.ensure_service_user()  # includes login verification
         else:
-            resp = self.api_request("POST", "/api/ciphers", cipher_data)
-            return {"action": "created", "id": resp.get("id", resp.get("Id", ""))}
+            client.ensure_login()
+        _shared_clients[key] = client
+    return client
+
+
+# --- CLI ---
+
+def load_requests(path):
+    """Read request records from a JSON object, a JSON array or JSONL.
+
+    A JSON object with a "records" list is a batch whose top-level keys
+    (url, admin_token, ...) are defaults for every record.
+    """
+    with open(path) as f:
+        text = f.read().strip()
+    if not text:
+        return {}, []
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        data = [json.loads(line) for line in text.splitlines() if line.strip()]
+    if isinstance(data, list):
+        return {}, data
+    if isinstance(data.get("records"), list):
+        defaults = {k: v for k, v in data.items() if k != "records"}
+        return defaults, data["records"]
+    return {}, [data]
+
+
+def run_batch(args, defaults, records):
+    """Store all records, one client (one login) per Vaultwarden target.
+
+    With action "import" new ciphers are created through the import
+    endpoint. Prints one JSON result per record (JSONL) in input order and
+    returns the number of failed records.
+    """
+    action = "import" if defaults.get("action", args.action) == "import" else "batch"
+    groups = {}
+    for pos, record in enumerate(records):
+        record = dict(defaults, **record)
+        target = (record.get("url") or args.url, record.get("admin_token") or args.admin_token)
+        if not target[0] or not target[1]:
+            raise RuntimeError(f"record {pos}: url and admin_token are required")
+        groups.setdefault(target, []).append((pos, record))
+
+    results = [None] * len(records)
+    for (url, admin_token), items in groups.items():
+        request = {"action": action, "url": url, "admin_token": admin_token,
+                   "records": [record for _, record in items]}
+        try:
+            if args.wait_ready > 0:
+                wait_ready(url, args.wait_ready)
+            served, stored = forward(args.socket, request)
+            if not served:
+                client = VaultwardenClient(url, admin_token, cache_dir=args.cache_dir)
+                client.workers = args.workers
+                client.ensure_service_user()  # includes login verification
+                stored = execute(client, request)
+        except Exception as e:
+            stored = [{"action": "failed", "error": str(e), "name": record.get("name", "")}
+                      for _, record in items]
+        for (pos, _), result in zip(items, stored):
+            results[pos] = result
+
+    for result in results:
+        print(json.dumps(result))
+    return sum(1 for r in results if r["action"] == "failed")
 
 
 def main():
@@ -842,59 +3120,322 @@ def main():
     parser.add_argument("--url", help="Vaultwarden URL")
     parser.add_argument("--admin-token", help="Admin token")
     parser.add_argument(
-        "--action", choices=["store", "list", "setup"], default="store"
+        "--action", default="store",
+        choices=["store", "batch", "import", "get", "list", "setup", "status", "rotate",
+                 "export", "read-export", "serve", "shutdown", "create-folder",
+                 "rename-folder", "get-folder", "archive-folder"],
+    )
+    parser.add_argument(
+        "--new-admin-token",
+        help="rotate: the admin token to move the service user to (--admin-token "
+             "is the old one)",
+    )
+    parser.add_argument(
+        "--name", help='Credential name (get: several via "names" in --from-file)',
     )
-    parser.add_argument("--name", help="Credential name")
     parser.add_argument("--username", default="", help="Username")
     parser.add_argument("--password", default="", help="Password")
     parser.add_argument("--uri", default="", help="URI")
     parser.add_argument("--notes", default="", help="Notes")
-    parser.add_argument("--from-file", help="Read parameters from JSON file")
+    parser.add_argument(
+        "--folder",
+        help="store: folder to file the credential in (created if missing); "
+             "list: only ciphers in this folder; *-folder actions: the folder to act on",
+    )
+    parser.add_argument("--new-name", help="rename-folder: new folder name")
+    parser.add_argument(
+        "--archive-prefix", default="[ARCHIV]",
+        help='archive-folder: prefix of the archived folder name (default "[ARCHIV]")',
+    )
+    parser.add_argument(
+        "--name-prefix", default="",
+        help="archive-folder: also move ciphers whose name starts with this; "
+             "list: only ciphers whose name starts with this",
+    )
+    parser.add_argument(
+        "--modified-since",
+        help="list: only ciphers changed at or after this ISO-8601 date/time (UTC "
+             "unless an offset is given)",
+    )
+    parser.add_argument("--limit", type=int, help="list: at most this many ciphers")
+    parser.add_argument(
+        "--format", choices=["json", "jsonl"], default="json",
+        help="list: one indented JSON array (default) or one JSON object per "
+             "line, streamed as the names are decrypted",
+    )
+    parser.add_argument(
+        "--export-dir",
+        help="export: directory to keep the encrypted per-folder export in; "
+             "read-export: the export to decrypt (needs only --admin-token)",
+    )
+    parser.add_argument(
+        "--ignore-timestamps", action="store_true",
+        help="store: ISO-8601 timestamps in notes do not make a cipher differ",
+    )
+    parser.add_argument(
+        "--check", action="store_true",
+        help="store: report created/updated/unchanged without writing anything; "
+             "rotate: decrypt and re-encrypt everything, but do not submit it",
+    )
+    parser.add_argument(
+        "--from-file",
+        help="Read parameters from a JSON file (object, array or JSONL; "
+             "several records imply --action batch)",
+    )
+    parser.add_argument(
+        "--no-session-cache", dest="cache_dir", action="store_const", const=None,
+        default=CACHE_DIR,
+        help=f"Do not read or write the encrypted session cache in {CACHE_DIR}",
+    )
+    parser.add_argument(
+        "--crypto-backend", choices=CRYPTO_BACKENDS, default=_crypto_choice,
+        help="AES/RSA implementation: libcrypto via ctypes, pure Python, or "
+             "auto (libcrypto if loadable). Default: $VW_CRYPTO_BACKEND or auto",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=0,
+        help="Processes for bulk decryption (list, vault sync). "
+             f"0 = auto: all cores from {PARALLEL_MIN_ITEMS} ciphers on",
+    )
+    parser.add_argument(
+        "--connect-timeout", type=float, default=CONNECT_TIMEOUT,
+        help=f"Seconds to open a connection (default {CONNECT_TIMEOUT})",
+    )
+    parser.add_argument(
+        "--read-timeout", type=float, default=READ_TIMEOUT,
+        help=f"Seconds to wait for a response (default {READ_TIMEOUT})",
+    )
+    parser.add_argument(
+        "--retries", type=int, default=HTTP_RETRIES,
+        help="Retries with exponential backoff on connection errors, 429 and 5xx; "
+             "non-idempotent requests only when nothing reached the server "
+             f"(default {HTTP_RETRIES})",
+    )
+    parser.add_argument(
+        "--wait-ready", type=float, default=0, metavar="SECONDS",
+        help="Poll /alive until Vaultwarden answers, at most SECONDS, before "
+             "doing anything else (default 0: do not wait)",
+    )
+    parser.add_argument(
+        "--socket", default=os.environ.get("VW_CREDENTIALS_SOCKET"),
+        help="Unix socket of a `serve` daemon. store/batch/list are sent there "
+             "if a daemon for the same target answers, otherwise run locally. "
+             "Default: $VW_CREDENTIALS_SOCKET",
+    )
+    parser.add_argument(
+        "--idle-timeout", type=int, default=DAEMON_IDLE_TIMEOUT,
+        help=f"serve: exit after this many idle seconds (default {DAEMON_IDLE_TIMEOUT})",
+    )
+    parser.add_argument(
+        "--detach", action="store_true",
+        help="serve: fork into the background once logged in and listening",
+    )
+    parser.add_argument(
+        "--log-level", choices=["debug", "info", "warning", "error"],
+        default=os.environ.get("VW_LOG_LEVEL", "warning"),
+        help="stderr log level (default: $VW_LOG_LEVEL or warning)",
+    )
+    parser.add_argument(
+        "--metrics", default=os.environ.get("VW_METRICS"),
+        help='Per-run JSON record: "stderr", "syslog" or a file to append to '
+             "(default: $VW_METRICS, none)",
+    )
+    parser.add_argument(
+        "--metrics-textfile", default=os.environ.get("VW_METRICS_TEXTFILE"),
+        help="node-exporter textfile (.prom) with the last run per action "
+             "(default: $VW_METRICS_TEXTFILE, none)",
+    )
+    parser.add_argument(
+        "--target-policy", choices=TARGET_POLICIES, default="all",
+        help='With "targets" in --from-file: fail unless all succeed (default), '
+             "unless any succeeds, or never (best-effort)",
+    )
+    parser.set_defaults(names=None, targets=None)
     args = parser.parse_args()
+    logging.basicConfig(stream=sys.stderr, format="%(levelname)s: %(message)s",
+                        level=getattr(logging, args.log_level.upper()))
+    METRICS.destination = args.metrics
+    METRICS.textfile = args.metrics_textfile
+    METRICS.reset(args.action)
+    set_crypto_backend(args.crypto_backend)
+    configure_http(args.connect_timeout, args.read_timeout, args.retries)
+
+    status = "error"
+    try:
+        run(parser, args)
+        status = "ok"
+    finally:
+        if args.action != "serve":  # the daemon records its own runs
+            METRICS.emit(status)
 
+
+def run(parser, args):
     if args.from_file:
-        with open(args.from_file) as f:
-            data = json.load(f)
+        defaults, records = load_requests(args.from_file)
+        data = dict(defaults, **records[0]) if len(records) == 1 else defaults
+        action = data.get("action", args.action)
+        METRICS.action = action
+        if len(records) != 1 or action in ("batch", "import"):
+            failed = run_batch(args, dict(defaults, action=action), records)
+            if failed:
+                raise RuntimeError(f"{failed} of {len(records)} credentials failed")
+            return
         args.url = data.get("url", args.url)
         args.admin_token = data.get("admin_token", args.admin_token)
+        args.new_admin_token = data.get("new_admin_token", args.new_admin_token)
         args.action = data.get("action", args.action)
         args.name = data.get("name", args.name)
+        args.names = data.get("names")
         args.username = data.get("username", args.username or "")
         args.password = data.get("password", args.password or "")
         args.uri = data.get("uri", args.uri or "")
         args.notes = data.get("notes", args.notes or "")
-
-    if not args.url or not args.admin_token:
+        args.ignore_timestamps = data.get("ignore_timestamps", args.ignore_timestamps)
+        args.check = data.get("check", args.check)
+        args.folder = data.get("folder", args.folder)
+        args.new_name = data.get("new_name", args.new_name)
+        args.archive_prefix = data.get("archive_prefix", args.archive_prefix)
+        args.name_prefix = data.get("name_prefix", args.name_prefix)
+        args.modified_since = data.get("modified_since", args.modified_since)
+        args.limit = data.get("limit", args.limit)
+        args.export_dir = data.get("export_dir", args.export_dir)
+        args.targets = data.get("targets")
+        args.target_policy = data.get("target_policy", args.target_policy)
+
+    if args.action in ("batch", "import"):
+        parser.error(f"--action {args.action} requires --from-file")
+
+    if args.action in ("export", "read-export") and not args.export_dir:
+        parser.error(f"--export-dir required for {args.action} action")
+
+    if args.action == "read-export":
+        if not args.admin_token:
+            parser.error("--admin-token required for read-export action")
+        print_result(args, read_export(args.export_dir, args.admin_token))
+        return
+
+    if not args.targets and (not args.url or not args.admin_token):
         parser.error("--url and --admin-token are required")
 
-    client = VaultwardenClient(args.url, args.admin_token)
+    if args.target_policy not in TARGET_POLICIES:
+        parser.error(f"target_policy must be one of {', '.join(TARGET_POLICIES)}")
+
+    if args.action == "store" and not args.name:
+        parser.error("--name required for store action")
+
+    if args.action == "get" and not (args.name or args.names):
+        parser.error("--name required for get action")
+
+    if args.action == "rotate" and (not args.new_admin_token or args.targets):
+        parser.error("--new-admin-token required for rotate action (one target)")
+
+    if args.limit is not None and args.limit < 1:
+        parser.error("--limit must be at least 1")
+
+    if args.action in ("serve", "shutdown") and not args.socket:
+        parser.error(f"--socket required for {args.action} action")
+
+    if args.wait_ready > 0 and args.action != "shutdown" and not args.targets:
+        wait_ready(args.url, args.wait_ready)
+
+    request = {
+        "action": args.action, "url": args.url, "admin_token": args.admin_token,
+        "name": args.name, "names": args.names,
+        "username": args.username, "password": args.password,
+        "uri": args.uri, "notes": args.notes,
+        "ignore_timestamps": args.ignore_timestamps, "check": args.check,
+        "folder": args.folder,
+        "new_name": args.new_name, "archive_prefix": args.archive_prefix,
+        "name_prefix": args.name_prefix, "modified_since": args.modified_since,
+        "limit": args.limit,
+    }
+
+    if args.targets:
+        ok, results = run_targets(args.targets, request, args.target_policy,
+                                  args.cache_dir, args.socket, args.wait_ready)
+        print(json.dumps({"ok": ok, "policy": args.target_policy, "targets": results}))
+        if not ok:
+            failed = sum(1 for entry in results if not entry["ok"])
+            raise RuntimeError(f"{failed} of {len(results)} targets failed "
+                               f"(policy {args.target_policy})")
+        return
+
+    if args.action == "shutdown":
+        response = daemon_request(args.socket, request)
+        if response is not None and not response.get("ok"):
+            raise RuntimeError(response.get("error", "shutdown refused"))
+        status = "not running" if response is None else "stopped"
+        print(json.dumps({"status": status, "socket": args.socket}))
+        return
+
+    if args.action in DAEMON_ACTIONS:
+        served, result = forward(args.socket, request)
+        if served:
+            print_result(args, result)
+            return
 
-    if args.action == "setup":
-        client.ensure_service_user()  # includes login verification
-        print(json.dumps({"status": "ok", "message": "Service user ready"}))
+    # serve keeps the key in memory only: no session or vault cache files
+    cache_dir = None if args.action == "serve" else args.cache_dir
+    client = VaultwardenClient(args.url, args.admin_token, cache_dir=cache_dir)
+    client.workers = args.workers
 
-    elif args.action == "list":
-        client.ensure_service_user()  # includes login verification
-        ciphers = client.list_ciphers()
-        items = []
-        for c in ciphers:
-            try:
-                name = decrypt_aes_cbc(
-                    c["name"], client.sym_key[:32], client.sym_key[32:]
-                ).decode()
-            except Exception:
-                name = "(encrypted)"
-            items.append({"id": c["id"], "name": name})
-        print(json.dumps(items, indent=2))
+    if args.action == "serve":
+        daemon = CredentialDaemon(client, args.socket, args.idle_timeout)
+        print(json.dumps(daemon.start(detach=args.detach)))
 
-    elif args.action == "store":
-        if not args.name:
-            parser.error("--name required for store action")
+    elif args.action == "setup":
         client.ensure_service_user()  # includes login verification
-        result = client.store_credential(
-            args.name, args.username, args.password, args.uri, args.notes
-        )
-        print(json.dumps(result))
+        print(json.dumps({"status": "ok", "message": "Service user ready",
+                          "crypto_backend": crypto_backend().describe()}))
+
+    elif args.action == "status":
+        print(json.dumps(client.status()))
+
+    elif args.action == "rotate":
+        if args.socket and not args.check:
+            # A daemon would go on writing with the old key
+            daemon_request(args.socket, dict(request, action="shutdown"))
+        print(json.dumps(client.rotate(args.new_admin_token, check=args.check)))
+
+    elif args.action == "export":
+        # Never ensure_service_user(): re-registering after a rejected
+        # login would empty the vault, and the export would then prune
+        # the previous shards
+        client.ensure_login()
+        print(json.dumps(client.export(args.export_dir)))
+
+    elif args.action == "list" and args.format == "jsonl":
+        client.ensure_login()
+        print_result(args, client.iter_ciphers(
+            args.name_prefix, args.folder, args.modified_since, args.limit,
+        ))
+
+    else:
+        login_for(client, request)
+        print_result(args, execute(client, request))
+
+
+def print_result(args, result):
+    """Print an action result; list output as indented JSON or JSONL.
+
+    The JSON list keeps its {id, name} records; folderId and revisionDate
+    are only in JSONL. A decrypted export is printed indented.
+    """
+    try:
+        if args.action == "read-export":
+            print(json.dumps(result, indent=2), flush=True)
+        elif args.action != "list":
+            print(json.dumps(result), flush=True)
+        elif args.format == "json":
+            print(json.dumps([{"id": r["id"], "name": r["name"]} for r in result],
+                             indent=2), flush=True)
+        else:
+            for record in result:
+                print(json.dumps(record), flush=True)
+    except BrokenPipeError:
+        # Reader went away (`| head`): stop quietly like other filters;
+        # stdout is pointed at /dev/null so the exit flush cannot fail.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,97 @@
+# tests/conftest.py
+# Fixtures for the vw-credentials.py tests: the script imported as a module
+# and a fresh in-process mock Vaultwarden (scripts/bench/mock_vaultwarden.py)
+# per test. Run from the repository root: python -m pytest -q
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+BENCH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts", "bench")
+sys.path.insert(0, os.path.normpath(BENCH_DIR))
+
+import mock_vaultwarden  # noqa: E402
+from benchlib import load_script  # noqa: E402
+
+ADMIN_TOKEN = "test-admin-token"
+# Mock routes that change ciphers or folders
+WRITES = ("POST /api/ciphers", "PUT /api/ciphers/{id}", "POST /api/ciphers/import",
+          "PUT /api/ciphers/move", "POST /api/ciphers/move", "POST /api/folders",
+          "PUT /api/folders/{id}")
+
+
+def writes(mock):
+    """Cipher and folder writes the mock has served so far."""
+    counts = mock.stats()["requests"]
+    return sum(counts.get(route, 0) for route in WRITES)
+
+
+@pytest.fixture(scope="session")
+def vw():
+    module = load_script(module_name="vw_credentials_test")
+    # Decryption workers pickle functions by module name, as with the
+    # plugins' loader (plugins/module_utils/loco_vw.py)
+    sys.modules[module.__name__] = module
+    return module
+
+
+@pytest.fixture
+def mock():
+    server_mock = mock_vaultwarden.MockVaultwarden(ADMIN_TOKEN)
+    server, url = mock_vaultwarden.start_in_thread(server_mock)
+    server_mock.url = url
+    yield server_mock
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path / "cache")
+
+
+@pytest.fixture
+def make_client(vw, mock, cache_dir):
+    """Client factory; every client is closed at teardown."""
+    clients = []
+
+    def make(admin_token=ADMIN_TOKEN, cache=True, workers=1):
+        client = vw.VaultwardenClient(mock.url, admin_token,
+                                      cache_dir=cache_dir if cache else None)
+        client.workers = workers
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.transport.close()
+
+
+@pytest.fixture
+def client(make_client):
+    """A logged-in client with session and vault cache."""
+    client = make_client()
+    client.ensure_service_user()
+    return client
+
+
+@pytest.fixture
+def run_script(vw, cache_dir):
+    """Run vw-credentials.py with request (a dict, or a list sent as JSONL)
+    on stdin and the test's cache dir; returns the CompletedProcess."""
+
+    def run(request, *options):
+        if isinstance(request, list):
+            text = "\n".join(json.dumps(record) for record in request)
+        else:
+            text = json.dumps(request)
+        return subprocess.run(
+            [sys.executable, vw.__file__, "--from-file", "/dev/stdin", *options],
+            input=text, capture_output=True, text=True, timeout=120,
+            env=dict(os.environ, VW_CREDENTIALS_CACHE_DIR=cache_dir),
+        )
+
+    return run
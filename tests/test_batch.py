@@ -0,0 +1,46 @@
+# tests/test_batch.py
+# Batch store: one login per target, results in input order, and a failing
+# record or target fails only its own records.
+
+import json
+
+from conftest import ADMIN_TOKEN
+
+TOKEN = "POST /identity/connect/token"
+
+
+def test_failed_record_does_not_abort_batch(client):
+    results = client.store_credentials([
+        {"name": "a", "username": "admin", "password": "1"},
+        {"username": "admin", "password": "2"},
+        {"name": "b", "username": "admin", "password": "3"},
+    ])
+    assert [r["action"] for r in results] == ["created", "failed", "created"]
+    assert results[1]["error"] == "record has no name"
+    assert client.get_credential("b")["password"] == "3"
+
+
+def test_batch_logs_in_once(mock, client, run_script):
+    logins = mock.stats()["requests"][TOKEN]
+    records = [{"url": mock.url, "admin_token": ADMIN_TOKEN, "name": f"app{i}",
+                "username": "admin", "password": str(i)} for i in range(5)]
+    proc = run_script(records, "--no-session-cache")
+    assert proc.returncode == 0, proc.stderr
+    results = [json.loads(line) for line in proc.stdout.splitlines()]
+    assert [(r["name"], r["action"]) for r in results] == [
+        (f"app{i}", "created") for i in range(5)]
+    assert mock.stats()["requests"][TOKEN] == logins + 1
+
+
+def test_unreachable_target_fails_only_its_records(mock, run_script):
+    good = {"url": mock.url, "admin_token": ADMIN_TOKEN, "username": "admin"}
+    bad = {"url": "http://127.0.0.1:9", "admin_token": ADMIN_TOKEN, "username": "admin"}
+    records = [dict(good, name="first", password="1"),
+               dict(bad, name="lost", password="2"),
+               dict(good, name="last", password="3")]
+    proc = run_script(records, "--retries", "0", "--no-session-cache")
+    results = [json.loads(line) for line in proc.stdout.splitlines()]
+    assert [(r["name"], r["action"]) for r in results] == [
+        ("first", "created"), ("lost", "failed"), ("last", "created")]
+    assert proc.returncode == 1
+    assert "1 of 3 credentials failed" in proc.stderr
@@ -0,0 +1,73 @@
+# tests/test_cache.py
+# Vault cache: no download while the account revision is unchanged, one
+# sync after any change, and never a view that misses another writer's
+# cipher.
+
+import glob
+import os
+
+import pytest
+
+SYNC = "GET /api/sync"
+
+
+def syncs(mock):
+    return mock.stats()["requests"].get(SYNC, 0)
+
+
+def server_ciphers(mock):
+    return mock.stats()["ciphers"]
+
+
+def test_vault_cache_skips_sync_while_revision_unchanged(mock, client, make_client):
+    client.store_credential("app", "admin", "secret")
+    first = make_client()
+    first.ensure_login()
+    assert first.get_credential("app")["password"] == "secret"
+    before = syncs(mock)
+    reader = make_client()
+    reader.ensure_login()
+    assert reader.get_credential("app")["password"] == "secret"
+    assert syncs(mock) == before
+
+
+def test_vault_cache_resyncs_after_foreign_write(mock, client, make_client):
+    client.store_credential("app", "admin", "secret")
+    # A writer without cache changes the revision behind the cached view
+    writer = make_client(cache=False)
+    writer.ensure_login()
+    writer.store_credential("app", "admin", "changed")
+    before = syncs(mock)
+    assert client.get_credential("app")["password"] == "changed"
+    assert syncs(mock) == before + 1
+    assert client.get_credential("app")["password"] == "changed"
+    assert syncs(mock) == before + 1
+
+
+def test_write_interleaved_with_unlocked_writer(mock, client, make_client):
+    # The other writer takes no cache lock (daemon, --no-session-cache, web
+    # UI): its cipher lands between our write and the end of our block
+    other = make_client(cache=False)
+    other.ensure_login()
+    with client.vault():
+        client.store_credential("x", "admin", "1")
+        other.store_credential("y", "admin", "2")
+    fresh = make_client()
+    fresh.ensure_login()
+    assert fresh.store_credential("y", "admin", "2")["action"] == "unchanged"
+    assert client.store_credential("y", "admin", "2")["action"] == "unchanged"
+    assert server_ciphers(mock) == 2
+
+
+@pytest.mark.parametrize("damage", [b"", b"{not json", b'{"v": 1, "data": "AAAA"}'])
+def test_damaged_vault_cache_resyncs(mock, client, make_client, cache_dir, damage):
+    client.store_credential("app", "admin", "secret")
+    client.get_credential("app")  # synced view saved
+    (path,) = glob.glob(os.path.join(cache_dir, "vw-vault-*.json"))
+    with open(path, "wb") as f:
+        f.write(damage)
+    before = syncs(mock)
+    reader = make_client()
+    reader.ensure_login()
+    assert reader.get_credential("app")["password"] == "secret"
+    assert syncs(mock) == before + 1
@@ -0,0 +1,136 @@
+# tests/test_crypto.py
+# Known answers for the crypto primitives, on every available backend. The
+# vectors are the ones scripts/bench/crypto_bench.py checks before timing.
+
+import base64
+import hashlib
+import hmac
+
+import pytest
+
+import crypto_bench as kat
+
+
+def libcrypto(vw):
+    try:
+        return vw.LibcryptoCrypto()
+    except OSError as e:
+        pytest.skip(f"libcrypto not available: {e}")
+
+
+@pytest.fixture(params=["python", "libcrypto"])
+def backend(request, vw):
+    """Each backend in turn, active for the module-level helpers too."""
+    instance = vw.PythonCrypto() if request.param == "python" else libcrypto(vw)
+    vw.set_crypto_backend(request.param)
+    yield instance
+    vw.set_crypto_backend("auto")
+
+
+def test_aes_fips197_single_block(backend):
+    ct = backend.aes_cbc_encrypt(kat.FIPS197_PT, kat.FIPS197_KEY, bytes(16))
+    assert ct[:16] == kat.FIPS197_CT
+
+
+def test_aes_cbc_sp800_38a(backend):
+    ct = backend.aes_cbc_encrypt(kat.SP800_PT, kat.SP800_KEY, kat.SP800_IV)
+    # Four vector blocks, then one block of PKCS#7 padding
+    assert ct[:64] == kat.SP800_CT and len(ct) == 80
+    assert backend.aes_cbc_decrypt(ct, kat.SP800_KEY, kat.SP800_IV) == kat.SP800_PT
+
+
+def test_aes_bad_padding_rejected(backend):
+    ct = backend.aes_cbc_encrypt(kat.SP800_PT, kat.SP800_KEY, kat.SP800_IV)
+    with pytest.raises(ValueError):
+        backend.aes_cbc_decrypt(ct[:64], kat.SP800_KEY, kat.SP800_IV)
+
+
+def test_cipher_string_known_answer(vw, backend):
+    mac_key = bytes(range(32, 64))
+    ct = backend.aes_cbc_encrypt(kat.SP800_PT, kat.SP800_KEY, kat.SP800_IV)
+    mac = hmac.new(mac_key, kat.SP800_IV + ct, hashlib.sha256).digest()
+
+    def cipher_string(mac):
+        return "2." + "|".join(base64.b64encode(p).decode() for p in (kat.SP800_IV, ct, mac))
+
+    assert vw.decrypt_aes_cbc(cipher_string(mac), kat.SP800_KEY, mac_key) == kat.SP800_PT
+    with pytest.raises(ValueError):
+        vw.decrypt_aes_cbc(cipher_string(bytes([mac[0] ^ 1]) + mac[1:]),
+                           kat.SP800_KEY, mac_key)
+    round_trip = vw.encrypt_aes_cbc(kat.SP800_PT, kat.SP800_KEY, mac_key)
+    assert vw.decrypt_aes_cbc(round_trip, kat.SP800_KEY, mac_key) == kat.SP800_PT
+
+
+
+def test_rsa_2048_key_pair(backend):
+    public, private = backend.generate_rsa_2048()
+    assert kat.check_rsa(public, private)
+
+
+def test_rsa_number_theory(vw):
+    assert vw._small_primes(30) == [3, 5, 7, 11, 13, 17, 19, 23, 29]
+    # 2^127 - 1 is prime; 561 and 41041 are Carmichael numbers
+    assert vw._is_probable_prime(2 ** 127 - 1)
+    assert not any(vw._is_probable_prime(n) for n in (1, 561, 41041, (2 ** 61 - 1) ** 2))
+    assert vw._modinv(17, 3120) == 2753
+    g, x, y = vw._extended_gcd(240, 46)
+    assert g == 2 and 240 * x + 46 * y == 2
+    p = vw._gen_prime(256)
+    assert p.bit_length() == 256 and p >> 254 == 3 and p % 65537 != 1
+    assert vw._is_probable_prime(p)
+
+
+def test_key_expansion_fips197(vw):
+    words = vw._key_expansion(kat.SP800_KEY)
+    for i, word in kat.KEY_EXPANSION_WORDS.items():
+        assert words[i] == word
+
+
+
+
+def test_backends_interoperate(vw):
+    native, python = libcrypto(vw), vw.PythonCrypto()
+    for size in (0, 15, 16, 1000):
+        data = (bytes(range(256)) * 4)[:size]
+        ct = native.aes_cbc_encrypt(data, kat.SP800_KEY, kat.SP800_IV)
+        assert ct == python.aes_cbc_encrypt(data, kat.SP800_KEY, kat.SP800_IV)
+        assert python.aes_cbc_decrypt(ct, kat.SP800_KEY, kat.SP800_IV) == data
+
+
+def test_auto_falls_back_to_python(vw, monkeypatch):
+    def unavailable():
+        raise OSError("libcrypto.so.3: cannot open shared object file")
+
+    monkeypatch.setattr(vw, "LibcryptoCrypto", unavailable)
+    try:
+        vw.set_crypto_backend("auto")
+        assert vw.crypto_backend().name == "python"
+        vw.set_crypto_backend("libcrypto")
+        with pytest.raises(RuntimeError, match="libcrypto backend unavailable"):
+            vw.crypto_backend()
+    finally:
+        vw.set_crypto_backend("auto")
+
+
+def test_key_schedule_cache_keeps_keys_apart(vw):
+    other = bytes(range(32))
+    first = vw._py_aes_cbc_encrypt(kat.SP800_PT, kat.SP800_KEY, kat.SP800_IV)
+    vw._py_aes_cbc_encrypt(kat.SP800_PT, other, kat.SP800_IV)
+    assert vw._py_aes_cbc_encrypt(kat.SP800_PT, kat.SP800_KEY, kat.SP800_IV) == first
+    assert vw._key_schedule(kat.SP800_KEY) is vw._key_schedule(kat.SP800_KEY)
+
+
+@pytest.mark.parametrize("password, salt, iterations, dk", kat.PBKDF2_VECTORS)
+def test_pbkdf2_rfc7914(vw, password, salt, iterations, dk):
+    assert vw.pbkdf2(password, salt, iterations) == dk
+
+
+@pytest.mark.parametrize("prk, info, length, okm", kat.HKDF_VECTORS)
+def test_hkdf_expand_rfc5869(vw, prk, info, length, okm):
+    assert vw.hkdf_expand(prk, info, length) == okm
+
+
+def test_stretch_key_pinned(vw):
+    master_key, enc, mac = kat.STRETCH_KEY_VECTOR
+    assert vw.stretch_key(master_key) == (enc, mac)
+
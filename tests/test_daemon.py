@@ -0,0 +1,94 @@
+# tests/test_daemon.py
+# The credential daemon: serves only its own url and admin token, answers
+# forwarded CLI requests without a login of their own, and keeps its
+# in-memory view honest about writers it does not know of.
+
+import json
+import os
+import stat
+import threading
+import time
+
+import pytest
+
+from conftest import ADMIN_TOKEN
+
+TOKEN = "POST /identity/connect/token"
+
+
+@pytest.fixture
+def daemon(vw, mock, make_client, tmp_path):
+    """A daemon serving the mock from a thread; shut down at teardown."""
+    daemon = vw.CredentialDaemon(make_client(cache=False), str(tmp_path / "vw.sock"),
+                                 idle_timeout=60)
+    thread = threading.Thread(target=daemon.start, daemon=True)
+    thread.start()
+    ping = {"action": "ping", "url": mock.url, "admin_token": ADMIN_TOKEN}
+    deadline = time.monotonic() + 30
+    while vw.daemon_request(daemon.socket_path, ping) is None:
+        assert thread.is_alive() and time.monotonic() < deadline, "daemon did not start"
+        time.sleep(0.05)
+    yield daemon
+    vw.daemon_request(daemon.socket_path, dict(ping, action="shutdown"))
+    thread.join(10)
+
+
+def call(vw, daemon, mock, **request):
+    return vw.daemon_request(daemon.socket_path,
+                             dict(request, url=mock.url, admin_token=ADMIN_TOKEN))
+
+
+def test_socket_private_and_other_token_refused(vw, mock, daemon):
+    assert stat.S_IMODE(os.stat(daemon.socket_path).st_mode) == 0o600
+    request = {"action": "get", "url": mock.url, "admin_token": "other", "name": "x"}
+    response = vw.daemon_request(daemon.socket_path, request)
+    assert (response["ok"], response["reason"]) == (False, "target")
+    # The caller then runs the request itself
+    assert vw.forward(daemon.socket_path, request) == (False, None)
+    request = dict(request, admin_token=ADMIN_TOKEN, url=mock.url + "/other")
+    assert vw.forward(daemon.socket_path, request) == (False, None)
+
+
+def test_errors_reported_not_fatal(vw, mock, daemon):
+    assert call(vw, daemon, mock, action="rotate")["error"] == "unsupported action: rotate"
+    assert call(vw, daemon, mock, action="store")["error"] == "name required for store action"
+    assert call(vw, daemon, mock, action="get", name="missing") == {"ok": True, "result": None}
+
+
+def test_cli_requests_forwarded(mock, daemon, run_script):
+    logins = mock.stats()["requests"][TOKEN]
+    request = {"url": mock.url, "admin_token": ADMIN_TOKEN, "action": "store",
+               "name": "app", "username": "admin", "password": "secret"}
+    proc = run_script(request, "--socket", daemon.socket_path, "--log-level", "debug")
+    assert proc.returncode == 0, proc.stderr
+    assert json.loads(proc.stdout)["action"] == "created"
+    assert "served by daemon" in proc.stderr
+    proc = run_script(dict(request, action="get"), "--socket", daemon.socket_path)
+    assert json.loads(proc.stdout)["password"] == "secret"
+    # Neither run logged in: the daemon's session did the work
+    assert mock.stats()["requests"][TOKEN] == logins
+
+
+def test_view_after_write_resyncs(vw, mock, make_client, daemon):
+    other = make_client(cache=False)
+    other.ensure_login()
+    store = {"action": "store", "url": mock.url, "admin_token": ADMIN_TOKEN,
+             "username": "admin", "password": "1"}
+    # Another writer's cipher lands while the daemon handles its own store
+    with daemon.client.vault():
+        assert daemon.handle(json.dumps(dict(store, name="x")))["ok"]
+        other.store_credential("y", "admin", "1")
+    result = call(vw, daemon, mock, **dict(store, name="y"))["result"]
+    assert result["action"] == "unchanged"
+    assert mock.stats()["ciphers"] == 2
+
+
+def test_shutdown_from_cli(vw, mock, daemon, run_script):
+    request = {"url": mock.url, "admin_token": ADMIN_TOKEN, "action": "shutdown"}
+    proc = run_script(request, "--socket", daemon.socket_path)
+    assert json.loads(proc.stdout)["status"] == "stopped"
+    deadline = time.monotonic() + 10
+    while os.path.exists(daemon.socket_path) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not os.path.exists(daemon.socket_path)
+    assert vw.daemon_request(daemon.socket_path, request) is None
@@ -0,0 +1,69 @@
+# tests/test_decrypt_pool.py
+# Bulk decryption in worker processes: same results in the same order as
+# in-process, used only from PARALLEL_MIN_ITEMS items on.
+
+import concurrent.futures
+
+import pytest
+
+KEY = bytes(range(64))
+
+
+@pytest.fixture
+def pools(monkeypatch):
+    """Count the worker pools started (decrypt_strings imports lazily)."""
+    started = []
+
+    class CountingPool(concurrent.futures.ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            started.append(kwargs.get("max_workers"))
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor", CountingPool)
+    return started
+
+
+def strings(vw, count):
+    out = [vw.encrypt_string(f"Kunde {i:04d} — App Admin", KEY) for i in range(count)]
+    out[7], out[300] = None, "2.garbage|garbage|garbage"
+    return out
+
+
+def test_pool_matches_in_process(vw, pools):
+    cipher_strings = strings(vw, 600)
+    single = vw.decrypt_strings(cipher_strings, KEY, workers=1)
+    assert pools == []
+    assert vw.decrypt_strings(cipher_strings, KEY, workers=3) == single
+    assert pools == [3]
+    assert single[6] == "Kunde 0006 — App Admin"
+    assert single[7] is None and single[300] is None
+
+
+def test_auto_workers_start_at_threshold(vw, pools, monkeypatch):
+    monkeypatch.setattr(vw.os, "cpu_count", lambda: 2)
+    vw.decrypt_strings(strings(vw, vw.PARALLEL_MIN_ITEMS - 1), KEY)
+    assert pools == []
+    vw.decrypt_strings(strings(vw, vw.PARALLEL_MIN_ITEMS), KEY)
+    assert pools == [2]
+
+
+def test_pool_reencrypt_rejects_undecryptable(vw, pools):
+    cipher_strings = strings(vw, 600)[8:]  # garbage at 292
+    new_key = bytes(range(64, 128))
+    rotated = vw.reencrypt_strings(cipher_strings[:292], KEY, new_key, workers=2)
+    assert vw.decrypt_strings(rotated, new_key, workers=1) == \
+        vw.decrypt_strings(cipher_strings[:292], KEY, workers=1)
+    with pytest.raises(ValueError):
+        vw.reencrypt_strings(cipher_strings, KEY, new_key, workers=2)
+
+
+def test_list_on_large_vault_uses_pool(vw, mock, client, pools):
+    mock.seed(700, folders=10)
+    client.workers = 1
+    expected = list(client.iter_ciphers(chunk_size=None))
+    assert pools == []
+    client.workers = 2
+    listed = vw.execute(client, {"action": "list"})
+    assert pools == [2]
+    assert listed == expected and len(listed) == 700
+    assert "(encrypted)" not in {r["name"] for r in listed}
@@ -0,0 +1,85 @@
+# tests/test_export.py
+# Incremental encrypted export: unchanged vault -> nothing written, one
+# changed folder -> one shard rewritten, readable with the admin token
+# alone, and never a write to the server.
+
+import os
+import subprocess
+import sys
+
+from conftest import ADMIN_TOKEN
+
+NEW_TOKEN = "test-admin-token-new"
+DELETE = "POST /admin/users/{id}/delete"
+
+
+def shard_bytes(export_dir):
+    return {name: open(os.path.join(export_dir, name), "rb").read()
+            for name in os.listdir(export_dir)}
+
+
+def test_export_incremental(vw, client, tmp_path, cache_dir):
+    export_dir = str(tmp_path / "export")
+    for kunde in ("kunde1", "kunde2"):
+        client.store_credential(f"{kunde} — App", "admin", "pw", folder=kunde)
+    client.store_credential("loose", "admin", "pw")
+    first = client.export(export_dir)
+    assert (first["ciphers"], first["shards"], first["written"]) == (3, 3, 3)
+    before = shard_bytes(export_dir)
+    assert client.export(export_dir)["action"] == "unchanged"
+    client.store_credential("kunde2 — App", "admin", "new", folder="kunde2")
+    assert client.export(export_dir)["written"] == 1
+    after = shard_bytes(export_dir)
+    assert sum(before[name] != after[name] for name in before) == 2  # shard + manifest
+    # The lock lives in the cache directory, not in the backed-up one
+    assert not any(name.endswith(".lock") for name in after)
+    assert any(name.startswith("vw-export-") for name in os.listdir(cache_dir))
+
+    exported = vw.read_export(export_dir, ADMIN_TOKEN)
+    folders = [shard["folder"] for shard in exported["shards"]]
+    assert folders == ["kunde1", "kunde2", None]
+    assert exported["shards"][1]["credentials"][0]["password"] == "new"
+
+
+def test_export_with_changed_token_keeps_user(mock, client, run_script, tmp_path):
+    export_dir = str(tmp_path / "export")
+    client.store_credential("app", "admin", "secret")
+    client.export(export_dir)
+    before = shard_bytes(export_dir)
+    mock.admin_token = NEW_TOKEN
+    request = {"url": mock.url, "admin_token": NEW_TOKEN, "action": "export",
+               "export_dir": export_dir}
+    proc = run_script(request, "--no-session-cache")
+    assert proc.returncode != 0 and "--action rotate" in proc.stderr
+    assert mock.stats()["requests"].get(DELETE, 0) == 0
+    assert shard_bytes(export_dir) == before
+
+
+def test_read_export_into_closed_pipe(vw, mock, client, tmp_path, cache_dir):
+    export_dir = str(tmp_path / "export")
+    client.import_credentials([{"name": f"kunde{i} — App", "username": "admin",
+                                "password": "x" * 40, "folder": f"kunde{i % 20}"}
+                               for i in range(400)])
+    client.export(export_dir)
+    proc = subprocess.Popen(
+        [sys.executable, vw.__file__, "--action", "read-export", "--export-dir", export_dir,
+         "--admin-token", ADMIN_TOKEN],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        env=dict(os.environ, VW_CREDENTIALS_CACHE_DIR=cache_dir),
+    )
+    assert proc.stdout.readline().strip() == b"{"
+    proc.stdout.close()
+    assert proc.wait(60) == 0
+    assert proc.stderr.read() == b""
+
+
+def test_empty_export_and_wrong_token(vw, client, tmp_path):
+    export_dir = str(tmp_path / "export")
+    assert client.export(export_dir)["shards"] == 0  # manifest only
+    assert vw.read_export(export_dir, ADMIN_TOKEN)["shards"] == []
+    proc = subprocess.run(
+        [sys.executable, vw.__file__, "--action", "read-export", "--export-dir", export_dir,
+         "--admin-token", "wrong"],
+        capture_output=True, text=True,
+    )
+    assert proc.returncode == 1 and "readable with this admin token" in proc.stderr
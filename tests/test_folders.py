@@ -0,0 +1,46 @@
+# tests/test_folders.py
+# Folder create, rename and archive are idempotent; archiving moves a
+# customer's stray ciphers in with one bulk request.
+
+from conftest import writes
+
+MOVES = ("PUT /api/ciphers/move", "POST /api/ciphers/move")
+
+
+def moves(mock):
+    counts = mock.stats()["requests"]
+    return sum(counts.get(route, 0) for route in MOVES)
+
+
+def test_create_twice(mock, client):
+    assert client.create_folder("kunde1")["action"] == "created"
+    before = writes(mock)
+    assert client.create_folder("kunde1")["action"] == "unchanged"
+    assert writes(mock) == before
+
+
+def test_rename_twice(client):
+    created = client.create_folder("kunde1")
+    assert client.rename_folder("kunde1", "kunde-eins") == {"action": "updated",
+                                                           "id": created["id"]}
+    assert client.rename_folder("kunde1", "kunde-eins")["action"] == "unchanged"
+    assert client.get_folder("kunde1") is None
+
+
+def test_archive_twice(mock, client):
+    client.create_folder("kunde1")
+    client.store_credential("kunde1 — Nextcloud", "admin", "a", folder="kunde1")
+    # Stored before the folder existed: archive moves them in
+    for app in ("Paperless", "Gitea"):
+        client.store_credential(f"kunde1 — {app}", "admin", "b")
+    client.store_credential("kunde2 — Gitea", "admin", "c")
+    first = client.archive_folder("kunde1", name_prefix="kunde1 — ")
+    assert (first["action"], first["moved"]) == ("updated", 2)
+    assert moves(mock) == 1
+    before = writes(mock)
+    second = client.archive_folder("kunde1", name_prefix="kunde1 — ")
+    assert (second["action"], second["moved"]) == ("unchanged", 0)
+    assert writes(mock) == before
+    assert client.get_folder("[ARCHIV] kunde1")["ciphers"] == 3
+    assert client.get_folder("kunde1") is None
+    assert client.find_cipher("kunde2 — Gitea")["folderId"] is None
@@ -0,0 +1,45 @@
+# tests/test_import.py
+# import_credentials: new records in one POST /api/ciphers/import, known
+# names through the normal update path, a repeat changes nothing.
+
+from conftest import writes
+
+IMPORT = "POST /api/ciphers/import"
+
+
+def records(count, password="pw"):
+    return [{"name": f"kunde{i} — App", "username": "admin", "password": f"{password}{i}",
+             "folder": f"kunde{i % 3}"} for i in range(count)]
+
+
+def test_import_twice(mock, client):
+    first = client.import_credentials(records(12))
+    assert {r["action"] for r in first} == {"created"}
+    assert mock.stats()["requests"].get(IMPORT) == 1
+    before = writes(mock)
+    second = client.import_credentials(records(12))
+    assert {r["action"] for r in second} == {"unchanged"}
+    assert writes(mock) == before
+    assert client.get_credential("kunde5 — App")["password"] == "pw5"
+    assert client.get_folder("kunde2")["ciphers"] == 4
+
+
+def test_import_mixes_new_and_existing(mock, client):
+    client.import_credentials(records(3))
+    mixed = records(2, password="new") + records(5)[2:]
+    results = client.import_credentials(mixed)
+    assert [r["action"] for r in results] == ["updated", "updated", "unchanged",
+                                              "created", "created"]
+    assert mock.stats()["requests"].get(IMPORT) == 2
+    assert mock.stats()["ciphers"] == 5
+    assert client.get_credential("kunde0 — App")["password"] == "new0"
+
+
+def test_repeated_name_within_import(mock, client):
+    results = client.import_credentials([
+        {"name": "app", "username": "admin", "password": "1"},
+        {"name": "app", "username": "admin", "password": "2"},
+    ])
+    assert [r["action"] for r in results] == ["created", "updated"]
+    assert mock.stats()["ciphers"] == 1
+    assert client.get_credential("app")["password"] == "2"
@@ -0,0 +1,83 @@
+# tests/test_list.py
+# list filters (name prefix, folder, modified-since, limit) and output
+# formats, including a reader that stops early.
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ADMIN_TOKEN
+
+
+@pytest.fixture
+def stored(client):
+    for kunde in ("kunde1", "kunde2"):
+        for app in ("Nextcloud", "Gitea", "Paperless"):
+            client.store_credential(f"{kunde} — {app}", "admin", "pw", folder=kunde)
+    client.store_credential("loose", "admin", "pw")
+    return client
+
+
+def names(records):
+    return sorted(r["name"] for r in records)
+
+
+def test_filters(stored):
+    listing = list(stored.iter_ciphers())
+    assert len(listing) == 7
+    assert set(listing[0]) == {"id", "name", "folderId", "revisionDate"}
+    assert names(stored.iter_ciphers("kunde2 — ")) == [
+        "kunde2 — Gitea", "kunde2 — Nextcloud", "kunde2 — Paperless"]
+    assert names(stored.iter_ciphers(folder="kunde1")) == [
+        "kunde1 — Gitea", "kunde1 — Nextcloud", "kunde1 — Paperless"]
+    assert names(stored.iter_ciphers("kunde1 — G", folder="kunde1")) == ["kunde1 — Gitea"]
+    assert list(stored.iter_ciphers(folder="kunde9")) == []
+    assert len(list(stored.iter_ciphers(modified_since="2000-01-01"))) == 7
+    assert list(stored.iter_ciphers(modified_since="2999-01-01T00:00:00+02:00")) == []
+    assert len(list(stored.iter_ciphers("kunde", limit=4, chunk_size=2))) == 4
+    with pytest.raises(ValueError, match="not an ISO-8601 date"):
+        stored.iter_ciphers(modified_since="yesterday")
+
+
+def test_modified_since_skips_decryption(vw, stored, monkeypatch):
+    stored.find_folder("kunde1")  # sync outside the count
+    decrypted = []
+    real = vw.decrypt_strings
+
+    def counting(strings, *args, **kwargs):
+        decrypted.extend(strings)
+        return real(strings, *args, **kwargs)
+
+    monkeypatch.setattr(vw, "decrypt_strings", counting)
+    assert list(stored.iter_ciphers(modified_since="2999-01-01")) == []
+    assert list(stored.iter_ciphers(folder="kunde1")) and len(decrypted) == 3
+
+
+def test_cli_formats(mock, stored, run_script):
+    request = {"url": mock.url, "admin_token": ADMIN_TOKEN, "action": "list",
+               "name_prefix": "kunde1 — "}
+    proc = run_script(request)
+    assert proc.returncode == 0, proc.stderr
+    listing = json.loads(proc.stdout)
+    assert names(listing) == ["kunde1 — Gitea", "kunde1 — Nextcloud", "kunde1 — Paperless"]
+    assert all(set(r) == {"id", "name"} for r in listing)
+    proc = run_script(dict(request, limit=2), "--format", "jsonl")
+    lines = [json.loads(line) for line in proc.stdout.splitlines()]
+    assert len(lines) == 2 and all("folderId" in r for r in lines)
+
+
+def test_reader_stopping_early(vw, mock, client, cache_dir):
+    mock.seed(300)
+    proc = subprocess.Popen(
+        [sys.executable, vw.__file__, "--url", mock.url, "--admin-token", ADMIN_TOKEN,
+         "--action", "list", "--format", "jsonl"],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        env=dict(os.environ, VW_CREDENTIALS_CACHE_DIR=cache_dir),
+    )
+    assert json.loads(proc.stdout.readline())["name"]
+    proc.stdout.close()
+    assert proc.wait(60) == 0
+    assert proc.stderr.read() == b""
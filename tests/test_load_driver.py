@@ -0,0 +1,33 @@
+# tests/test_load_driver.py
+# The onboarding load harness end to end, small: every mode completes
+# without failures, and a replay of the same onboarding changes nothing.
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import BENCH_DIR
+
+
+@pytest.mark.parametrize("options", [
+    ["--mode", "store"],
+    ["--mode", "import", "--vault-sizes", "0,50"],
+    ["--mode", "store", "--daemon"],
+], ids=["store", "import", "daemon"])
+def test_replay_is_unchanged(options):
+    proc = subprocess.run(
+        [sys.executable, os.path.join(BENCH_DIR, "load_driver.py"), "--customers", "2",
+         "--credentials", "2", "--forks", "2", "--replays", "2"] + options,
+        capture_output=True, text=True, timeout=300,
+    )
+    assert proc.returncode == 0, proc.stderr
+    reports = [json.loads(line) for line in proc.stdout.splitlines()]
+    assert [r["replay"] for r in reports] == [1, 2] * (len(reports) // 2)
+    for report in reports:
+        assert report["failures"] == 0
+        expected = "created" if report["replay"] == 1 else "unchanged"
+        assert report["actions"] == {expected: 4}
+        assert report["server"]["requests"].get("POST /admin/users/{id}/delete", 0) == 0
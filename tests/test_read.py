@@ -0,0 +1,64 @@
+# tests/test_read.py
+# Read-back: get by name or names, one client per target in-process, and
+# reads never re-register the service user when its login is rejected.
+
+import json
+
+import pytest
+
+from conftest import ADMIN_TOKEN
+
+NEW_TOKEN = "test-admin-token-new"
+DELETE = "POST /admin/users/{id}/delete"
+
+
+def test_get_names_in_order(client):
+    client.store_credential("a", "admin", "1", uri="https://a.example", notes="n")
+    client.store_credential("b", "root", "2")
+    results = client.get_credentials(["b", "missing", "a"])
+    assert [(r["name"], r["found"]) for r in results] == [
+        ("b", True), ("missing", False), ("a", True)]
+    assert results[2]["password"] == "1" and results[2]["uri"] == "https://a.example"
+    assert results[1] == {"name": "missing", "found": False}
+
+
+def test_shared_client_reused(vw, mock, client, cache_dir, monkeypatch):
+    monkeypatch.setattr(vw, "_shared_clients", {})
+    logins = mock.stats()["requests"]["POST /identity/connect/token"]
+    first = vw.shared_client(mock.url, ADMIN_TOKEN, cache_dir, recover=False)
+    assert vw.shared_client(mock.url + "/", ADMIN_TOKEN, cache_dir) is first
+    assert mock.stats()["requests"]["POST /identity/connect/token"] == logins
+    first.transport.close()
+
+
+def test_lookup_client_never_recovers(vw, mock, client, cache_dir, monkeypatch):
+    monkeypatch.setattr(vw, "_shared_clients", {})
+    mock.admin_token = NEW_TOKEN
+    with pytest.raises(vw.VaultwardenHTTPError, match="not re-registering"):
+        vw.shared_client(mock.url, NEW_TOKEN, cache_dir, recover=False)
+    assert mock.stats()["requests"].get(DELETE, 0) == 0
+    assert vw._shared_clients == {}
+
+
+@pytest.mark.parametrize("action", ["get", "list", "get-folder"])
+def test_read_with_changed_token_keeps_user(mock, client, run_script, action):
+    client.store_credential("app", "admin", "secret", folder="kunde1")
+    # ADMIN_TOKEN changed without --action rotate: reads must fail, not
+    # delete the service user with its vault and register it again
+    mock.admin_token = NEW_TOKEN
+    request = {"url": mock.url, "admin_token": NEW_TOKEN, "action": action,
+               "name": "app", "folder": "kunde1"}
+    proc = run_script(request, "--no-session-cache")
+    assert proc.returncode != 0 and "--action rotate" in proc.stderr
+    assert mock.stats()["requests"].get(DELETE, 0) == 0
+    mock.admin_token = ADMIN_TOKEN
+    assert client.get_credential("app")["password"] == "secret"
+
+
+def test_cli_get(mock, client, run_script):
+    client.store_credential("app", "admin", "secret")
+    request = {"url": mock.url, "admin_token": ADMIN_TOKEN, "action": "get",
+               "names": ["app", "other"]}
+    proc = run_script(request)
+    assert proc.returncode == 0, proc.stderr
+    assert [r["found"] for r in json.loads(proc.stdout)] == [True, False]
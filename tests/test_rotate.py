@@ -0,0 +1,54 @@
+# tests/test_rotate.py
+# Key rotation to a new admin token keeps every cipher and folder; a
+# repeat reports "unchanged", check mode writes nothing.
+
+import pytest
+
+NEW_TOKEN = "test-admin-token-new"
+DELETE = "POST /admin/users/{id}/delete"
+
+
+def test_rotate_twice(mock, client, make_client):
+    client.store_credential("app", "admin", "secret", folder="kunde1")
+    assert client.rotate(NEW_TOKEN)["action"] == "rotated"
+    again = make_client().rotate(NEW_TOKEN)
+    assert again["action"] == "unchanged"
+    mock.admin_token = NEW_TOKEN
+    rotated = make_client(NEW_TOKEN)
+    rotated.ensure_login()
+    assert rotated.get_credential("app")["password"] == "secret"
+    assert rotated.get_folder("kunde1")["ciphers"] == 1
+    assert mock.stats()["requests"].get(DELETE, 0) == 0
+
+
+def test_rotate_check_writes_nothing(mock, client, make_client):
+    client.store_credential("app", "admin", "secret")
+    before = mock.stats()["requests"]
+    result = client.rotate(NEW_TOKEN, check=True)
+    assert result["ciphers"] == 1
+    after = mock.stats()["requests"]
+    for route in ("POST /api/accounts/key-management/rotate-user-account-keys",
+                  "POST /api/accounts/key", "POST /api/accounts/password"):
+        assert after.get(route, 0) == before.get(route, 0)
+    # The old token still logs in
+    make_client(cache=False).ensure_login()
+
+
+def test_rotate_on_server_without_bulk_endpoint(mock, client, make_client):
+    client.store_credential("app", "admin", "secret")
+    mock.inject = [{"route": "POST /api/accounts/key-management/rotate-user-account-keys",
+                    "status": 404, "rate": 1.0}]
+    assert client.rotate(NEW_TOKEN)["action"] == "rotated"
+    assert mock.stats()["requests"]["POST /api/accounts/key"] == 1
+    mock.inject = []
+    rotated = make_client(NEW_TOKEN)
+    rotated.ensure_login()
+    assert rotated.get_credential("app")["password"] == "secret"
+
+
+def test_old_token_no_longer_logs_in(vw, mock, client, make_client):
+    client.store_credential("app", "admin", "secret")
+    client.rotate(NEW_TOKEN)
+    with pytest.raises(vw.VaultwardenHTTPError):
+        make_client(cache=False).ensure_login()
+    assert mock.stats()["users"] == 1
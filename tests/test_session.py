@@ -0,0 +1,51 @@
+# tests/test_session.py
+# Session cache: a cached access token is reused, an expired one renewed
+# with the refresh token, a rejected one replaced by a password login, and
+# the file is useless without the admin token it was written for.
+
+import glob
+import os
+
+TOKEN = "POST /identity/connect/token"
+PRELOGIN = ("POST /identity/accounts/prelogin", "POST /api/accounts/prelogin")
+
+
+def requests(mock, *routes):
+    counts = mock.stats()["requests"]
+    return sum(counts.get(route, 0) for route in routes)
+
+
+def test_session_reused_by_next_client(mock, client, make_client):
+    logins = requests(mock, TOKEN)
+    second = make_client()
+    second.ensure_login()
+    assert requests(mock, TOKEN) == logins
+    assert second.access_token == client.access_token
+
+
+def test_expired_access_token_refreshed_without_kdf(mock, client, make_client):
+    cached = client.session.load()
+    client.session.save(dict(cached, access_expires=0))
+    logins, prelogins = requests(mock, TOKEN), requests(mock, *PRELOGIN)
+    second = make_client()
+    second.ensure_login()
+    assert requests(mock, TOKEN) == logins + 1
+    assert requests(mock, *PRELOGIN) == prelogins
+    assert second.access_token != cached["access_token"]
+    assert second.session.load()["refresh_expires"] == cached["refresh_expires"]
+
+
+def test_rejected_token_logs_in_again(mock, client, make_client):
+    client.store_credential("app", "admin", "secret")
+    second = make_client()
+    second.ensure_login()
+    mock.tokens.clear()  # server restart: every access token is void
+    logins = requests(mock, TOKEN)
+    assert second.get_credential("app")["password"] == "secret"
+    assert requests(mock, TOKEN) == logins + 1
+
+
+def test_session_unreadable_with_other_token(vw, client, cache_dir):
+    (path,) = glob.glob(os.path.join(cache_dir, "vw-session-*.json"))
+    enc_key, mac_key = vw.derive_state_keys(b"another-token", b"loco-session-cache")
+    assert vw.EncryptedStateFile(path, enc_key, mac_key).load() is None
@@ -0,0 +1,47 @@
+# tests/test_store.py
+# store_credential writes only what differs: a repeated store is
+# "unchanged" and sends nothing, check mode reports without writing.
+
+from conftest import writes
+
+
+def test_store_twice(mock, client):
+    first = client.store_credential("app", "admin", "secret", uri="https://app.example")
+    before = writes(mock)
+    second = client.store_credential("app", "admin", "secret", uri="https://app.example")
+    assert (first["action"], second["action"]) == ("created", "unchanged")
+    assert writes(mock) == before
+
+
+def test_changed_field_updates_in_place(mock, client):
+    first = client.store_credential("app", "admin", "secret")
+    second = client.store_credential("app", "admin", "secret", notes="rotated")
+    assert (second["action"], second["id"]) == ("updated", first["id"])
+    assert client.get_credential("app")["notes"] == "rotated"
+    assert mock.stats()["ciphers"] == 1
+
+
+def test_store_ignores_timestamps(mock, client):
+    client.store_credential("app", "admin", "secret",
+                            notes="Deployed: 2026-01-01T10:00:00Z", ignore_timestamps=True)
+    again = client.store_credential("app", "admin", "secret",
+                                    notes="Deployed: 2026-02-01T12:30:00Z",
+                                    ignore_timestamps=True)
+    assert again["action"] == "unchanged"
+    assert client.get_credential("app")["notes"] == "Deployed: 2026-01-01T10:00:00Z"
+    changed = client.store_credential("app", "admin", "other",
+                                      notes="Deployed: 2026-02-01T12:30:00Z",
+                                      ignore_timestamps=True)
+    assert changed["action"] == "updated"
+
+
+def test_check_mode_writes_nothing(mock, client):
+    before = writes(mock)
+    assert client.store_credential("app", "admin", "secret", check=True)["action"] == "created"
+    assert writes(mock) == before
+    client.store_credential("app", "admin", "secret")
+    before = writes(mock)
+    assert client.store_credential("app", "admin", "new", check=True)["action"] == "updated"
+    assert client.store_credential("app", "admin", "secret", check=True)["action"] == "unchanged"
+    assert writes(mock) == before
+    assert client.get_credential("app")["password"] == "secret"
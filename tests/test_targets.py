@@ -0,0 +1,84 @@
+# tests/test_targets.py
+# One request against several Vaultwardens: per-target results in order,
+# and the policy deciding whether the run as a whole failed.
+
+import json
+
+import pytest
+
+import mock_vaultwarden
+from conftest import ADMIN_TOKEN
+
+DEAD = "http://127.0.0.1:9"
+
+
+@pytest.fixture
+def second_mock():
+    server_mock = mock_vaultwarden.MockVaultwarden(ADMIN_TOKEN)
+    server, server_mock.url = mock_vaultwarden.start_in_thread(server_mock)
+    yield server_mock
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def no_retries(vw, monkeypatch):
+    monkeypatch.setattr(vw, "HTTP_RETRIES", 0)
+
+
+def targets(*urls):
+    return [{"url": url, "admin_token": ADMIN_TOKEN} for url in urls]
+
+
+STORE = {"action": "store", "name": "app", "username": "admin", "password": "secret"}
+
+
+@pytest.mark.parametrize("policy, dead, ok", [
+    ("all", False, True),
+    ("all", True, False),
+    ("any", True, True),
+    ("best-effort", True, True),
+])
+def test_policy(vw, mock, second_mock, cache_dir, no_retries, policy, dead, ok):
+    urls = [mock.url, DEAD, second_mock.url] if dead else [mock.url, second_mock.url]
+    result, entries = vw.run_targets(targets(*urls), STORE, policy, cache_dir)
+    assert result is ok
+    assert [e["url"] for e in entries] == urls
+    assert [e["ok"] for e in entries] == [url != DEAD for url in urls]
+    assert all(e["result"]["action"] == "created" for e in entries if e["ok"])
+    assert mock.stats()["ciphers"] == second_mock.stats()["ciphers"] == 1
+
+
+def test_any_fails_when_every_target_fails(vw, cache_dir, no_retries):
+    ok, entries = vw.run_targets(targets(DEAD, DEAD + "0"), STORE, "any", cache_dir)
+    assert not ok and all("error" in e for e in entries)
+
+
+def test_target_overrides_request_fields(vw, mock, second_mock, cache_dir):
+    custom = targets(mock.url, second_mock.url)
+    custom[1]["password"] = "other"
+    ok, _ = vw.run_targets(custom, STORE, "all", cache_dir)
+    assert ok
+    get = {"action": "get", "name": "app"}
+    _, entries = vw.run_targets(targets(mock.url, second_mock.url), get, "all", cache_dir)
+    assert [e["result"]["password"] for e in entries] == ["secret", "other"]
+
+
+def test_rejected_requests(vw, mock):
+    with pytest.raises(ValueError, match="unknown target policy"):
+        vw.run_targets(targets(mock.url), STORE, "most")
+    with pytest.raises(ValueError, match="does not support several targets"):
+        vw.run_targets(targets(mock.url), {"action": "rotate"})
+    with pytest.raises(ValueError, match="target 1: url and admin_token are required"):
+        vw.run_targets(targets(mock.url) + [{"url": mock.url}], STORE)
+
+
+def test_cli_exit_status(mock, run_script):
+    request = dict(STORE, targets=targets(mock.url, DEAD))
+    proc = run_script(request, "--retries", "0")
+    assert proc.returncode == 1 and "1 of 2 targets failed (policy all)" in proc.stderr
+    report = json.loads(proc.stdout)
+    assert (report["ok"], report["policy"]) == (False, "all")
+    proc = run_script(dict(request, target_policy="any"), "--retries", "0")
+    assert proc.returncode == 0, proc.stderr
+    assert [t["ok"] for t in json.loads(proc.stdout)["targets"]] == [True, False]
@@ -0,0 +1,86 @@
+# tests/test_transport.py
+# Retry rules: idempotent requests are repeated on 429/5xx and connection
+# errors, a POST only when the server cannot have processed it; backoff
+# honours Retry-After; --wait-ready polls /alive until a deadline.
+
+import socket
+
+import pytest
+
+from mock_vaultwarden import parse_inject
+
+
+@pytest.fixture
+def retries(vw, monkeypatch):
+    """Backoff delays requested by the transport (none are slept)."""
+    delays = []
+
+    def no_wait(attempt, retry_after=None):
+        delays.append((attempt, retry_after))
+        return 0
+
+    monkeypatch.setattr(vw, "backoff_delay", no_wait)
+    return delays
+
+
+def served(mock, route):
+    return mock.stats()["requests"].get(route, 0)
+
+
+@pytest.mark.parametrize("method, route, status, attempts", [
+    ("GET", "GET /alive", 502, 3),
+    ("GET", "GET /alive", 404, 1),
+    ("POST", "POST /api/ciphers", 502, 1),
+    ("POST", "POST /api/ciphers", 503, 3),
+    ("POST", "POST /api/ciphers", 429, 3),
+])
+def test_retry_rules(vw, mock, retries, method, route, status, attempts):
+    mock.inject = [parse_inject(f"{route}={status}")]
+    transport = vw.HTTPTransport(retries=2)
+    path = route.split(" ", 1)[1]
+    got, _, _ = transport.request(method, mock.url + path, b"{}" if method == "POST" else None)
+    transport.close()
+    assert got == status
+    assert served(mock, route) == attempts
+    assert len(retries) == attempts - 1
+
+
+def test_retry_recovers(vw, mock, retries, monkeypatch):
+    transport = vw.HTTPTransport(retries=3)
+    mock.inject = [parse_inject("GET /alive=503")]
+    real = transport._request
+
+    def heal(*args):
+        if len(retries) == 2:
+            mock.inject = []
+        return real(*args)
+
+    monkeypatch.setattr(transport, "_request", heal)
+    assert transport.request("GET", mock.url + "/alive")[0] == 200
+    assert served(mock, "GET /alive") == 3
+    transport.close()
+
+
+def test_connect_failure_retried_for_any_method(vw, retries):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]  # closed again: connection refused
+    transport = vw.HTTPTransport(connect_timeout=1, retries=2)
+    with pytest.raises(ConnectionRefusedError):
+        transport.request("POST", f"http://127.0.0.1:{port}/api/ciphers", b"{}")
+    assert len(retries) == 2
+
+
+def test_backoff_delay(vw):
+    assert vw.backoff_delay(1, "2") == 2.0
+    assert vw.backoff_delay(1, "3600") == vw.RETRY_BACKOFF_MAX
+    for attempt in range(1, 10):
+        ceiling = min(vw.RETRY_BACKOFF_MAX, vw.RETRY_BACKOFF * 2 ** (attempt - 1))
+        assert 0 <= vw.backoff_delay(attempt, "Wed, 21 Oct 2026 07:28:00 GMT") <= ceiling
+
+
+def test_wait_ready(vw, mock):
+    assert vw.wait_ready(mock.url, 5) < 5
+    mock.inject = [parse_inject("GET /alive=503")]
+    with pytest.raises(RuntimeError, match="not ready after 0.5s: HTTP 503"):
+        vw.wait_ready(mock.url, 0.5)